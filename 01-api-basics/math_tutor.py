@@ -20,6 +20,7 @@ def main():
         system=[{"type": "text", "text": math_system}],
         max_tokens=200,
         stream=True,
+        echo=True,
     )
     
     print(f"Math Tutor: {response['answer']}")
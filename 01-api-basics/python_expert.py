@@ -20,7 +20,8 @@ def main():
         "Write a Python function that checks a string for duplicate characters.",
         system=python_system,
         max_tokens=300,
-        stream=True  # Enable streaming to see code appear line by line
+        stream=True,  # Enable streaming to see code appear line by line
+        echo=True,
     )
     
     print(f"Tokens used: streaming mode")
@@ -30,7 +31,8 @@ def main():
     print("\n👤 Question: Now write a function to remove all duplicate characters from a string.")
     response2 = chat.send_message(
         "Now write a function to remove all duplicate characters from a string.",
-        stream=True  # Watch the code being written!
+        stream=True,  # Watch the code being written!
+        echo=True,
     )
 
 if __name__ == "__main__":
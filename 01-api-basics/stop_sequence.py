@@ -14,6 +14,7 @@ def main():
         system=[{"type": "text", "text": "You are a helpful assistant."}],
         max_tokens=200,
         stream=True,
+        echo=True,
         stop_sequences=[", 5"]  # Stop when reaching 5
     )
 
@@ -15,6 +15,7 @@ def main():
         system=[{"type": "text", "text": "You are a helpful assistant."}],
         max_tokens=200,
         stream=True,
+        echo=True,
         stop_sequences=["```"]  # Stop when reaching the end of the code block
 
     )
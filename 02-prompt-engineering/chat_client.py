@@ -1,25 +1,244 @@
 # chat_client.py
 from dotenv import load_dotenv
+import asyncio
+import json
 import os
-from anthropic import Anthropic
+import threading
+import time
+from anthropic import Anthropic, AsyncAnthropic
 
-class AnthropicChat:
-    def __init__(self):
-        """Initialize the chat client with API key and default settings."""
+_shared_client = None
+_shared_async_client = None
+_client_lock = threading.Lock()
+_env_loaded = False
+
+CACHE_POLICIES = ("off", "system", "auto")
+MAX_CACHE_BREAKPOINTS = 4
+# Shortest prefix (in tokens) each model family will cache; others use DEFAULT_MIN_CACHE_TOKENS
+MIN_CACHE_TOKENS = {
+    "claude-3-haiku": 2048,
+    "claude-3-5-haiku": 2048,
+}
+DEFAULT_MIN_CACHE_TOKENS = 1024
+
+
+def _load_env():
+    """Load .env once per process instead of once per chat instance."""
+    global _env_loaded
+    if not _env_loaded:
         load_dotenv()
-        self.api_key = os.getenv("ANTHROPIC_API_KEY")
-        self._check_api_key()
+        _env_loaded = True
+
+
+def get_shared_client():
+    """Return the process-wide Anthropic client so every chat reuses one connection pool."""
+    global _shared_client
+    with _client_lock:
+        if _shared_client is None:
+            _load_env()
+            _shared_client = Anthropic()
+    return _shared_client
+
+
+def get_shared_async_client():
+    """Return the process-wide AsyncAnthropic client so every async chat reuses one connection pool."""
+    global _shared_async_client
+    with _client_lock:
+        if _shared_async_client is None:
+            _load_env()
+            _shared_async_client = AsyncAnthropic()
+    return _shared_async_client
+
+
+def _estimate_tokens(value):
+    """Rough token count of a prompt fragment (about four characters per token)."""
+    text = value if isinstance(value, str) else json.dumps(value, ensure_ascii=False)
+    return len(text) // 4
+
+
+def min_cache_tokens_for(model):
+    """Minimum cacheable prefix length for a model name (matched by family prefix)."""
+    for family, tokens in MIN_CACHE_TOKENS.items():
+        if model.startswith(family):
+            return tokens
+    return DEFAULT_MIN_CACHE_TOKENS
+
+
+def _with_cache_control(content):
+    """Copy of a content value (string or block list) with its last block marked for caching."""
+    if isinstance(content, str):
+        content = [{"type": "text", "text": content}]
+    blocks = list(content)
+    blocks[-1] = {**blocks[-1], "cache_control": {"type": "ephemeral"}}
+    return blocks
+
+
+class AnthropicChat:
+    def __init__(self, client=None, cache=None, cache_policy="off", min_cache_tokens=None, history=None, metrics=None):
+        """Initialize the chat client with API key and default settings.
         
-        self.client = Anthropic()
+        Uses the shared pooled client unless a client is injected. Pass a
+        ResponseCache to reuse responses for byte-identical requests.
+
+        cache_policy controls prompt-caching breakpoints: "off" (the
+        default) sends no cache_control, "system" marks tools and the
+        system prompt, and "auto" also marks the conversation so far. A
+        breakpoint is only placed once the prefix it closes reaches
+        min_cache_tokens, since shorter prefixes cannot be cached; by
+        default that is the current model's minimum (min_cache_tokens_for).
+
+        Pass a HistoryManager as history to keep long conversations within
+        a token budget, and a metrics sink (see metrics.py) to receive
+        per-request latency, time-to-first-token and token usage.
+        """
+        if cache_policy not in CACHE_POLICIES:
+            raise ValueError(f"cache_policy must be one of {CACHE_POLICIES}")
+        if client is None:
+            _load_env()
+            self.api_key = os.getenv("ANTHROPIC_API_KEY")
+            self._check_api_key()
+            client = self._default_client()
+        else:
+            self.api_key = getattr(client, "api_key", None)
+        
+        self.client = client
+        self.cache = cache
+        self.cache_policy = cache_policy
+        self.min_cache_tokens = min_cache_tokens
+        self.history = history
+        self.metrics = metrics
+        self.last_metrics = None
+        self.last_response = None
         self.model = "claude-3-haiku-20240307"
 
         self.messages = []
     
+    def _default_client(self):
+        """Return the shared client used when none is injected."""
+        return get_shared_client()
+
+    def _lookup_cache(self, system, max_tokens, stop_sequences, use_cache, tools=None):
+        """Return (cache_key, cached_response) for the current request."""
+        if self.cache is None or not use_cache:
+            return None, None
+        key = self.cache.make_key(self.model, system, self.messages, max_tokens, stop_sequences, tools)
+        cached = self.cache.get(key)
+        if cached is not None:
+            self.add_assistant_message(cached['answer'])
+        return key, cached
+
+    def _begin_request(self, system, max_tokens, stop_sequences, use_cache, tools, stream):
+        """Start timing and check the cache; returns (start, cache_key, cached, request).
+
+        A cache hit is recorded in the metrics and last_response right away.
+        """
+        start = time.perf_counter()
+        cache_key, cached = self._lookup_cache(system, max_tokens, stop_sequences, use_cache, tools)
+        if cached is not None:
+            self._record_metrics(cached, stream, start, cached=True)
+            self.last_response = cached
+            return start, cache_key, cached, None
+        return start, cache_key, None, self._request_kwargs(system, max_tokens, stop_sequences, tools)
+
+    def _finish_stream(self, chunks, final_message, cache_key, start, first_token):
+        """Record a completed stream in the history, cache and metrics; returns the response dict."""
+        answer = "".join(chunks)
+        self.add_assistant_message(answer)
+        result = self._build_result(answer, final_message.usage)
+        self._store_cache(cache_key, result)
+        self._record_metrics(result, True, start, first_token)
+        self.last_response = result
+        return result
+
+    def _store_cache(self, key, response):
+        """Save a fresh response under its request key."""
+        if key is not None:
+            self.cache.set(key, response)
+
+    def _request_kwargs(self, system, max_tokens, stop_sequences, tools):
+        """Build the messages API arguments, adding cache_control per cache_policy.
+
+        Breakpoints go, in prefix order, on the last tool, the system
+        prompt and (for "auto") the latest message plus the end of the
+        previous turn, so the next call can read what this one writes.
+        self.messages itself is never modified.
+        """
+        kwargs = {
+            "model": self.model,
+            "max_tokens": max_tokens,
+            "messages": self.messages,
+            "stop_sequences": stop_sequences,
+        }
+        if system is not None:
+            kwargs["system"] = system
+        if tools:
+            kwargs["tools"] = tools
+        if self.cache_policy == "off":
+            return kwargs
+
+        min_tokens = self.min_cache_tokens or min_cache_tokens_for(self.model)
+        breakpoints = 0
+        prefix_tokens = 0
+        if tools:
+            prefix_tokens += _estimate_tokens(tools)
+            if prefix_tokens >= min_tokens:
+                kwargs["tools"] = list(tools[:-1]) + [{**tools[-1], "cache_control": {"type": "ephemeral"}}]
+                breakpoints += 1
+        if system:
+            prefix_tokens += _estimate_tokens(system)
+            if prefix_tokens >= min_tokens:
+                kwargs["system"] = _with_cache_control(system)
+                breakpoints += 1
+        if self.cache_policy == "auto" and self.messages:
+            messages = list(self.messages)
+            ends = [len(messages) - 1]
+            if len(messages) >= 3:
+                ends.append(len(messages) - 3)  # where the previous turn's request ended
+            for end in ends:
+                if breakpoints >= MAX_CACHE_BREAKPOINTS:
+                    break
+                if prefix_tokens + _estimate_tokens(messages[: end + 1]) < min_tokens:
+                    break
+                messages[end] = {**messages[end], "content": _with_cache_control(messages[end]["content"])}
+                breakpoints += 1
+            kwargs["messages"] = messages
+        return kwargs
+
+    def _build_result(self, answer, usage=None):
+        """Response dict with token usage, including prompt-cache reads and writes."""
+        return {
+            'answer': answer,
+            'input_tokens': getattr(usage, 'input_tokens', 0) or 0,
+            'output_tokens': getattr(usage, 'output_tokens', 0) or 0,
+            'cache_creation_input_tokens': getattr(usage, 'cache_creation_input_tokens', 0) or 0,
+            'cache_read_input_tokens': getattr(usage, 'cache_read_input_tokens', 0) or 0,
+        }
+
+    def _record_metrics(self, result, stream, start, first_token=None, cached=False):
+        """Build the per-request metrics event, keep it as last_metrics and pass it to the sink."""
+        end = time.perf_counter()
+        latency = end - start
+        # Streaming throughput is measured from the first token, excluding queueing and prefill
+        generation = end - first_token if first_token is not None else latency
+        event = {
+            'model': self.model,
+            'stream': stream,
+            'cached': cached,
+            'latency_s': latency,
+            'ttft_s': first_token - start if first_token is not None else None,
+            'tokens_per_s': result['output_tokens'] / generation if generation > 0 and not cached else None,
+            'input_tokens': result.get('input_tokens', 0),
+            'output_tokens': result.get('output_tokens', 0),
+            'cache_creation_input_tokens': result.get('cache_creation_input_tokens', 0),
+            'cache_read_input_tokens': result.get('cache_read_input_tokens', 0),
+        }
+        self.last_metrics = event
+        if self.metrics is not None:
+            self.metrics.record(event)
+
     def _check_api_key(self):
         """Check if API key is loaded properly."""
-        if self.api_key:
-            print("API key loaded")
-        else:
+        if not self.api_key:
             print("API key not found")
             raise ValueError("ANTHROPIC_API_KEY not found in environment variables")
     
@@ -32,52 +251,175 @@ class AnthropicChat:
         """Add an assistant message to the conversation."""
         self.messages.append({"role": "assistant", "content": [{"type": "text", "text": text}]})
 
-    def send_message(self, user_input=None, system=None, max_tokens=100, stream=False, stop_sequences=[]):
-        """Send a message and get response."""
+    def send_message(self, user_input=None, system=None, max_tokens=100, stream=False, stop_sequences=[], use_cache=True, tools=None, echo=False, sink=None):
+        """Send a message and get response.
+        
+        With stream=True each text chunk is passed to sink(chunk) as it
+        arrives, and printed to the console only if echo is set.
+        """
+        if stream:
+            if echo:
+                print("Assistant: ", end="", flush=True)
+            for text_chunk in self.stream_message(user_input, system, max_tokens, stop_sequences, use_cache, tools):
+                if sink is not None:
+                    sink(text_chunk)
+                if echo:
+                    print(text_chunk, end="", flush=True)
+            if echo:
+                print()  # New line after streaming
+            return self.last_response
+
         if user_input is not None:
             self.add_user_message(str(user_input))
+        if self.history is not None:
+            self.messages = self.history.compact(self.messages)
 
-        if stream: 
-            print("Assistant: ", end="", flush=True)
-            full_answer = ""
-
-            with self.client.messages.stream(
-                model=self.model,
-                max_tokens=max_tokens,
-                messages=self.messages,
-                system=system, # type: ignore
-                stop_sequences=stop_sequences
-            ) as stream:
-                for text_chunk in stream.text_stream:
-                    print(text_chunk, end="", flush=True)
-                    full_answer += text_chunk 
+        start, cache_key, cached, request = self._begin_request(system, max_tokens, stop_sequences, use_cache, tools, stream=False)
+        if cached is not None:
+            return cached
 
-            print()  # New line after streaming
-            self.add_assistant_message(full_answer)
-            return {
-                'answer': full_answer,
-                'input_tokens': 0,
-                'output_tokens': 0
-            }
+        response = self.client.messages.create(**request)
+        
+        answer = "".join(block.text for block in response.content if block.type == "text")
+        self.add_assistant_message(answer)
+        
+        result = self._build_result(answer, response.usage)
+        self._store_cache(cache_key, result)
+        self._record_metrics(result, False, start)
+        self.last_response = result
+        return result
 
-        else:
-            response = self.client.messages.create(
-                model=self.model,
-                max_tokens=max_tokens,
-                messages=self.messages,
-                system=system, # type: ignore
-                stop_sequences=stop_sequences 
-            )
-            
-            answer = response.content[0].text # type: ignore
-            self.add_assistant_message(answer)
-            
-            return {
-                'answer': answer,
-                'input_tokens': response.usage.input_tokens,
-                'output_tokens': response.usage.output_tokens
-            }
+    def stream_message(self, user_input=None, system=None, max_tokens=100, stop_sequences=[], use_cache=True, tools=None):
+        """Yield the answer's text chunks as they arrive.
+        
+        The response is only read as fast as the caller consumes chunks, so
+        a slow consumer applies back-pressure instead of buffering the whole
+        answer. Chunks are collected in a list and joined once at the end;
+        the response dict is left in last_response when the generator is
+        exhausted, and last_response is None if it is closed early.
+        """
+        if user_input is not None:
+            self.add_user_message(str(user_input))
+        if self.history is not None:
+            self.messages = self.history.compact(self.messages)
+
+        start, cache_key, cached, request = self._begin_request(system, max_tokens, stop_sequences, use_cache, tools, stream=True)
+        if cached is not None:
+            yield cached['answer']
+            return
+
+        chunks = []
+        first_token = None
+        finished = False
+        try:
+            with self.client.messages.stream(**request) as stream:
+                for text_chunk in stream.text_stream:
+                    if first_token is None:
+                        first_token = time.perf_counter()
+                    chunks.append(text_chunk)
+                    yield text_chunk
+                final_message = stream.get_final_message()
+            self._finish_stream(chunks, final_message, cache_key, start, first_token)
+            finished = True
+        finally:
+            if not finished:
+                # Closed early or failed: don't leave the previous response behind
+                self.last_response = None
     
     def clear_conversation(self):
         """Clear the conversation history."""
-        self.messages = []
\ No newline at end of file
+        self.messages = []
+        if self.history is not None:
+            self.history.reset()
+
+
+class AsyncAnthropicChat(AnthropicChat):
+    """AnthropicChat variant whose send_message is a coroutine."""
+
+    def _default_client(self):
+        """Return the shared async client used when none is injected."""
+        return get_shared_async_client()
+
+    async def _begin_request_async(self, system, max_tokens, stop_sequences, use_cache, tools, stream):
+        """_begin_request with the response-cache lookup (SQLite I/O) run off the event loop."""
+        if self.cache is None or not use_cache:
+            return self._begin_request(system, max_tokens, stop_sequences, use_cache, tools, stream)
+        return await asyncio.to_thread(self._begin_request, system, max_tokens, stop_sequences, use_cache, tools, stream)
+
+    async def _store_cache_async(self, key, response):
+        if key is not None:
+            await asyncio.to_thread(self.cache.set, key, response)
+
+    async def send_message(self, user_input=None, system=None, max_tokens=100, stream=False, stop_sequences=[], use_cache=True, tools=None, echo=False, sink=None):
+        """Send a message and get response without blocking the event loop.
+
+        With stream=True each text chunk is passed to sink(chunk) as it
+        arrives; if sink is a coroutine function it is awaited before the
+        next chunk is read, so a slow consumer (e.g. a socket) applies
+        back-pressure. Console printing happens only if echo is set.
+        """
+        if stream:
+            awaitable_sink = asyncio.iscoroutinefunction(sink)
+            if echo:
+                print("Assistant: ", end="", flush=True)
+            async for text_chunk in self.stream_message(user_input, system, max_tokens, stop_sequences, use_cache, tools):
+                if awaitable_sink:
+                    await sink(text_chunk)
+                elif sink is not None:
+                    sink(text_chunk)
+                if echo:
+                    print(text_chunk, end="", flush=True)
+            if echo:
+                print()  # New line after streaming
+            return self.last_response
+
+        if user_input is not None:
+            self.add_user_message(str(user_input))
+        if self.history is not None:
+            self.messages = await asyncio.to_thread(self.history.compact, self.messages)
+
+        start, cache_key, cached, request = await self._begin_request_async(system, max_tokens, stop_sequences, use_cache, tools, stream=False)
+        if cached is not None:
+            return cached
+
+        response = await self.client.messages.create(**request)
+
+        answer = "".join(block.text for block in response.content if block.type == "text")
+        self.add_assistant_message(answer)
+
+        result = self._build_result(answer, response.usage)
+        await self._store_cache_async(cache_key, result)
+        self._record_metrics(result, False, start)
+        self.last_response = result
+        return result
+
+    async def stream_message(self, user_input=None, system=None, max_tokens=100, stop_sequences=[], use_cache=True, tools=None):
+        """Async generator of the answer's text chunks, with the same back-pressure as the sync version."""
+        if user_input is not None:
+            self.add_user_message(str(user_input))
+        if self.history is not None:
+            self.messages = await asyncio.to_thread(self.history.compact, self.messages)
+
+        start, cache_key, cached, request = await self._begin_request_async(system, max_tokens, stop_sequences, use_cache, tools, stream=True)
+        if cached is not None:
+            yield cached['answer']
+            return
+
+        chunks = []
+        first_token = None
+        finished = False
+        try:
+            async with self.client.messages.stream(**request) as stream:
+                async for text_chunk in stream.text_stream:
+                    if first_token is None:
+                        first_token = time.perf_counter()
+                    chunks.append(text_chunk)
+                    yield text_chunk
+                final_message = await stream.get_final_message()
+            result = self._finish_stream(chunks, final_message, None, start, first_token)
+            await self._store_cache_async(cache_key, result)
+            finished = True
+        finally:
+            if not finished:
+                # Closed early or failed: don't leave the previous response behind
+                self.last_response = None
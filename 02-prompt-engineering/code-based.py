@@ -2,8 +2,84 @@ import json
 import sys
 import re
 import ast
+import time
+import random
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
 sys.path.append('..')
-from chat_client import AnthropicChat
+from anthropic import RateLimitError
+from chat_client import AnthropicChat, get_shared_client
+from response_cache import ResponseCache
+from metrics import JSONLMetricsSink, MultiSink, PrometheusTextMetrics
+from eval_report import ResultWriter, ScoreSummary, iter_results, write_html_report
+
+# Set in __main__; shared by every chat so re-runs reuse identical responses
+response_cache = None
+# Where AnthropicChat places prompt-caching breakpoints ("off", "system" or "auto")
+prompt_cache_policy = "off"
+# Set in __main__; receives latency and token usage of every request
+metrics = None
+# Set in __main__ to the shared client with SDK retries off, so call_with_backoff
+# is the only retry layer and rate-limit backoff is shared across workers
+client = None
+
+
+class RateLimiter:
+    """Thread-safe limiter that spaces requests evenly across all workers
+    
+    Without requests_per_minute requests are not spaced, but a pause still
+    holds back every worker. For as long as the pause lasted, requests
+    afterwards are released resume_spacing seconds apart, so the workers
+    don't all retry at once.
+    """
+
+    def __init__(self, requests_per_minute=None, resume_spacing=0.25):
+        self.interval = 60.0 / requests_per_minute if requests_per_minute else 0.0
+        self.resume_spacing = resume_spacing
+        self._next_slot = time.monotonic()
+        self._ramp_until = 0.0
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Block until the next request slot is available"""
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot)
+            interval = self.interval
+            if slot < self._ramp_until:
+                interval = max(interval, self.resume_spacing)
+            self._next_slot = slot + interval
+        if slot > now:
+            time.sleep(slot - now)
+
+    def pause(self, seconds):
+        """Push back every worker's next slot, e.g. after a 429"""
+        with self._lock:
+            resume = time.monotonic() + seconds
+            if resume > self._next_slot:
+                self._next_slot = resume
+                self._ramp_until = resume + seconds
+
+
+def call_with_backoff(fn, *args, rate_limiter=None, max_retries=5, base_delay=1.0, **kwargs):
+    """Call fn, retrying rate-limited requests with exponential backoff"""
+    for attempt in range(max_retries + 1):
+        if rate_limiter:
+            rate_limiter.acquire()
+        try:
+            return fn(*args, **kwargs)
+        except RateLimitError as e:
+            if attempt == max_retries:
+                raise
+            retry_after = e.response.headers.get("retry-after")
+            delay = float(retry_after) if retry_after else base_delay * (2 ** attempt)
+            delay += random.uniform(0, base_delay)
+            print(f"Rate limited, retrying in {delay:.1f}s (attempt {attempt + 1}/{max_retries})")
+            if rate_limiter:
+                rate_limiter.pause(delay)
+            else:
+                time.sleep(delay)
 
 
 def validate_json(content):
@@ -129,22 +205,23 @@ Please solve the following task:
     return prompt
 
 
-def run_prompt(test_case):
+def run_prompt(test_case, stream=True):
     prompt = create_enhanced_prompt(test_case)
-    chat = AnthropicChat()
+    chat = AnthropicChat(client=client, cache=response_cache, cache_policy=prompt_cache_policy, metrics=metrics)
     chat.add_user_message(prompt)
     answer = chat.send_message(
         user_input=None,
         system=[{"type": "text", "text": "You are a helpful assistant."}],
         max_tokens=200,
-        stream=True,
+        stream=stream,
+        echo=stream,
     )
     return answer
 
 
-def grade_by_model(test_case, output):
-    """Grade using AI model evaluation"""
-    eval_prompt = f"""
+def create_eval_prompt(test_case, output):
+    """Create the prompt asking the model to grade a solution"""
+    return f"""
     You are an expert code reviewer. Evaluate this AI-generated solution.
     
     Task: {test_case["task"]}
@@ -157,8 +234,13 @@ def grade_by_model(test_case, output):
     - "reasoning": A concise explanation of your assessment
     - "score": A number between 1-10
     """
+
+
+def grade_by_model(test_case, output):
+    """Grade using AI model evaluation"""
+    eval_prompt = create_eval_prompt(test_case, output)
     
-    chat = AnthropicChat()
+    chat = AnthropicChat(client=client, cache=response_cache, cache_policy=prompt_cache_policy, metrics=metrics)
     chat.add_user_message(eval_prompt)
     chat.add_assistant_message("```json")
     evaluation = chat.send_message(
@@ -168,10 +250,12 @@ def grade_by_model(test_case, output):
         stream=False,
         stop_sequences=[]
     )
-    
+    return parse_model_evaluation(evaluation.get('answer', ''))
+
+
+def parse_model_evaluation(answer_text):
+    """Parse the grader's JSON answer, falling back to a minimal grade"""
     try:
-        answer_text = evaluation.get('answer', '')
-        
         if answer_text:
             cleaned = answer_text.strip()
             json_match = re.search(r'\{.*\}', cleaned, re.DOTALL)
@@ -217,18 +301,16 @@ def merge_scores(model_grade, code_grade):
     }
 
 
-def run_test_case(test_case):
-    """Run a single test case with both model and code evaluation"""
-    # Validate test case has required fields
+def ensure_test_case_type(test_case):
+    """Default a missing 'type' field to 'unknown'"""
     if "type" not in test_case:
         print(f"Warning: Test case missing 'type' field: {test_case.get('task', 'Unknown task')}")
         test_case["type"] = "unknown"
-    
-    output = run_prompt(test_case)
-    
-    # Get both evaluations
-    model_grade = grade_by_model(test_case, output)
-    code_grade = code_grader(output, test_case)
+
+
+def build_result(test_case, output, model_grade):
+    """Combine the model grade with code validation into a result record"""
+    code_grade = code_grader(output["answer"], test_case)
     merged_score = merge_scores(model_grade, code_grade)
     
     return {
@@ -241,408 +323,336 @@ def run_test_case(test_case):
     }
 
 
-def run_eval(dataset):
-    """Run evaluation on entire dataset"""
-    results = []
-    for i, test_case in enumerate(dataset):
-        print(f"Running test case {i+1}/{len(dataset)}")
-        result = run_test_case(test_case)
-        results.append(result)
+def build_failed_result(test_case, error):
+    """Result record for a test case whose calls failed after backoff; it scores 0 and keeps the error"""
+    error_text = f"{type(error).__name__}: {error}"
+    model_grade = {
+        "score": 0,
+        "reasoning": f"Test case failed: {error_text}",
+        "strengths": [],
+        "weaknesses": ["Test case failed"]
+    }
+    code_grade = {"score": 0, "feedback": f"Not run: {error_text}"}
+    merged_score = merge_scores(model_grade, code_grade)
+    
+    return {
+        "output": {"answer": ""},
+        "test_case": test_case,
+        "model_evaluation": model_grade,
+        "code_evaluation": code_grade,
+        "merged_score": merged_score,
+        "final_score": merged_score["final_score"],
+        "error": error_text
+    }
+
+
+def run_test_case(test_case, stream=True, rate_limiter=None):
+    """Run a single test case with both model and code evaluation"""
+    ensure_test_case_type(test_case)
     
-    # Calculate average scores
-    avg_final_score = sum(r["final_score"] for r in results) / len(results)
-    avg_model_score = sum(r["model_evaluation"]["score"] for r in results) / len(results)
-    avg_code_score = sum(r["code_evaluation"]["score"] for r in results) / len(results)
+    output = call_with_backoff(run_prompt, test_case, stream=stream, rate_limiter=rate_limiter)
+    model_grade = call_with_backoff(grade_by_model, test_case, output, rate_limiter=rate_limiter)
+    return build_result(test_case, output, model_grade)
+
+
+def run_message_batch(client, requests, poll_interval=30, max_batch_size=100000):
+    """Submit requests as Message Batches and wait for every result
     
-    print(f"\n=== SCORE SUMMARY ===")
-    print(f"Average Final Score: {avg_final_score:.2f}")
-    print(f"Average Model Score: {avg_model_score:.2f}")
-    print(f"Average Code Validation Score: {avg_code_score:.2f}")
+    requests is a list of {"custom_id", "params"} dicts. Returns a dict
+    mapping custom_id to the response Message, or None if that request
+    did not succeed.
+    """
+    batch_ids = []
+    for start in range(0, len(requests), max_batch_size):
+        batch = client.messages.batches.create(requests=requests[start:start + max_batch_size])
+        print(f"Submitted batch {batch.id} with {len(requests[start:start + max_batch_size])} requests")
+        batch_ids.append(batch.id)
     
+    results = {}
+    for batch_id in batch_ids:
+        batch = client.messages.batches.retrieve(batch_id)
+        while batch.processing_status != "ended":
+            counts = batch.request_counts
+            print(f"Batch {batch_id}: {counts.processing} processing, {counts.succeeded} succeeded, {counts.errored} errored")
+            time.sleep(poll_interval)
+            batch = client.messages.batches.retrieve(batch_id)
+        
+        for entry in client.messages.batches.results(batch_id):
+            if entry.result.type == "succeeded":
+                results[entry.custom_id] = entry.result.message
+            else:
+                print(f"Request {entry.custom_id} did not succeed: {entry.result.type}")
+                results[entry.custom_id] = None
     return results
 
 
-def generate_html_report(results):
-    """Generate an HTML report from evaluation results"""
-    
-    # Calculate summary statistics
-    total_tests = len(results)
-    avg_final_score = sum(r["final_score"] for r in results) / total_tests if total_tests > 0 else 0
-    avg_model_score = sum(r["model_evaluation"]["score"] for r in results) / total_tests if total_tests > 0 else 0
-    avg_code_score = sum(r["code_evaluation"]["score"] for r in results) / total_tests if total_tests > 0 else 0
-    
-    # Count by type
-    type_counts = {}
-    for result in results:
-        content_type = result['test_case'].get('type', 'unknown')
-        type_counts[content_type] = type_counts.get(content_type, 0) + 1
-    
-    html_content = f"""
-<!DOCTYPE html>
-<html lang="en">
-<head>
-    <meta charset="UTF-8">
-    <meta name="viewport" content="width=device-width, initial-scale=1.0">
-    <title>Evaluation Report</title>
-    <style>
-        body {{
-            font-family: 'Segoe UI', Tahoma, Geneva, Verdana, sans-serif;
-            margin: 0;
-            padding: 20px;
-            background-color: #f5f7fa;
-        }}
-        .container {{
-            max-width: 1200px;
-            margin: 0 auto;
-            background: white;
-            border-radius: 10px;
-            box-shadow: 0 4px 6px rgba(0, 0, 0, 0.1);
-            overflow: hidden;
-        }}
-        .header {{
-            background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
-            color: white;
-            padding: 30px;
-            text-align: center;
-        }}
-        .header h1 {{
-            margin: 0;
-            font-size: 2.5em;
-            font-weight: 300;
-        }}
-        .header p {{
-            margin: 10px 0 0 0;
-            opacity: 0.9;
-        }}
-        .summary {{
-            padding: 30px;
-            background: #f8fafc;
-            border-bottom: 1px solid #e2e8f0;
-        }}
-        .summary-grid {{
-            display: grid;
-            grid-template-columns: repeat(auto-fit, minmax(200px, 1fr));
-            gap: 20px;
-            margin-bottom: 20px;
-        }}
-        .summary-card {{
-            background: white;
-            padding: 20px;
-            border-radius: 8px;
-            box-shadow: 0 2px 4px rgba(0, 0, 0, 0.1);
-            text-align: center;
-        }}
-        .summary-card h3 {{
-            margin: 0 0 10px 0;
-            color: #4a5568;
-            font-size: 0.9em;
-            text-transform: uppercase;
-            letter-spacing: 1px;
-        }}
-        .summary-card .value {{
-            font-size: 2em;
-            font-weight: bold;
-            color: #2d3748;
-        }}
-        .type-breakdown {{
-            display: flex;
-            gap: 10px;
-            flex-wrap: wrap;
-        }}
-        .type-badge {{
-            background: #4299e1;
-            color: white;
-            padding: 5px 15px;
-            border-radius: 20px;
-            font-size: 0.9em;
-        }}
-        .results {{
-            padding: 0;
-        }}
-        .test-case {{
-            border-bottom: 1px solid #e2e8f0;
-            padding: 25px;
-            transition: background-color 0.3s;
-        }}
-        .test-case:hover {{
-            background: #f7fafc;
-        }}
-        .test-case:last-child {{
-            border-bottom: none;
-        }}
-        .test-header {{
-            display: flex;
-            justify-content: space-between;
-            align-items: center;
-            margin-bottom: 15px;
-        }}
-        .test-number {{
-            background: #4a5568;
-            color: white;
-            padding: 5px 15px;
-            border-radius: 20px;
-            font-weight: bold;
-            font-size: 0.9em;
-        }}
-        .test-type {{
-            background: #38b2ac;
-            color: white;
-            padding: 5px 15px;
-            border-radius: 20px;
-            font-size: 0.9em;
-            text-transform: uppercase;
-        }}
-        .task-description {{
-            background: #edf2f7;
-            padding: 15px;
-            border-radius: 6px;
-            margin-bottom: 20px;
-            font-style: italic;
-            color: #4a5568;
-        }}
-        .scores {{
-            display: grid;
-            grid-template-columns: repeat(auto-fit, minmax(150px, 1fr));
-            gap: 15px;
-            margin-bottom: 20px;
-        }}
-        .score-item {{
-            text-align: center;
-            padding: 15px;
-            background: white;
-            border: 2px solid #e2e8f0;
-            border-radius: 8px;
-        }}
-        .score-item.final {{
-            border-color: #38b2ac;
-            background: #e6fffa;
-        }}
-        .score-value {{
-            font-size: 1.8em;
-            font-weight: bold;
-            color: #2d3748;
-        }}
-        .score-label {{
-            font-size: 0.8em;
-            color: #718096;
-            text-transform: uppercase;
-            letter-spacing: 1px;
-        }}
-        .details {{
-            display: grid;
-            grid-template-columns: 1fr 1fr;
-            gap: 20px;
-            margin-top: 20px;
-        }}
-        .detail-section {{
-            background: #f7fafc;
-            padding: 15px;
-            border-radius: 6px;
-        }}
-        .detail-section h4 {{
-            margin: 0 0 10px 0;
-            color: #4a5568;
-            font-size: 1em;
-        }}
-        .detail-section p {{
-            margin: 5px 0;
-            color: #718096;
-            line-height: 1.4;
-        }}
-        .strengths, .weaknesses {{
-            list-style: none;
-            padding: 0;
-        }}
-        .strengths li {{
-            background: #c6f6d5;
-            color: #22543d;
-            padding: 8px 12px;
-            margin: 5px 0;
-            border-radius: 4px;
-            border-left: 4px solid #38a169;
-        }}
-        .weaknesses li {{
-            background: #fed7d7;
-            color: #742a2a;
-            padding: 8px 12px;
-            margin: 5px 0;
-            border-radius: 4px;
-            border-left: 4px solid #e53e3e;
-        }}
-        .output-section {{
-            grid-column: 1 / -1;
-            background: #2d3748;
-            color: #e2e8f0;
-            padding: 15px;
-            border-radius: 6px;
-            font-family: 'Monaco', 'Courier New', monospace;
-            font-size: 0.9em;
-            white-space: pre-wrap;
-            overflow-x: auto;
-        }}
-        .toggle-output {{
-            background: #4299e1;
-            color: white;
-            border: none;
-            padding: 8px 16px;
-            border-radius: 4px;
-            cursor: pointer;
-            font-size: 0.9em;
-            margin-bottom: 10px;
-        }}
-        .toggle-output:hover {{
-            background: #3182ce;
-        }}
-        .output-content {{
-            display: none;
-        }}
-        @media (max-width: 768px) {{
-            .details {{
-                grid-template-columns: 1fr;
-            }}
-            .scores {{
-                grid-template-columns: 1fr;
-            }}
-            .summary-grid {{
-                grid-template-columns: 1fr;
-            }}
-        }}
-    </style>
-</head>
-<body>
-    <div class="container">
-        <div class="header">
-            <h1>AI Evaluation Report</h1>
-            <p>Comprehensive analysis of {total_tests} test cases</p>
-        </div>
-        
-        <div class="summary">
-            <div class="summary-grid">
-                <div class="summary-card">
-                    <h3>Final Average Score</h3>
-                    <div class="value">{avg_final_score:.1f}/10</div>
-                </div>
-                <div class="summary-card">
-                    <h3>Model Score</h3>
-                    <div class="value">{avg_model_score:.1f}/10</div>
-                </div>
-                <div class="summary-card">
-                    <h3>Code Score</h3>
-                    <div class="value">{avg_code_score:.1f}/10</div>
-                </div>
-                <div class="summary-card">
-                    <h3>Total Tests</h3>
-                    <div class="value">{total_tests}</div>
-                </div>
-            </div>
-            <div class="type-breakdown">
-                {"".join([f'<span class="type-badge">{type_name}: {count}</span>' for type_name, count in type_counts.items()])}
-            </div>
-        </div>
-        
-        <div class="results">
-"""
+def message_text(message):
+    """Joined text blocks of a response Message, or "" for a failed request"""
+    if message is None:
+        return ""
+    return "".join(block.text for block in message.content if block.type == "text")
 
-    for i, result in enumerate(results, 1):
-        test_case = result['test_case']
-        model_eval = result['model_evaluation']
-        code_eval = result['code_evaluation']
-        
-        strengths_html = "".join([f"<li>{strength}</li>" for strength in model_eval['strengths']])
-        weaknesses_html = "".join([f"<li>{weakness}</li>" for weakness in model_eval['weaknesses']])
-        
-        html_content += f"""
-            <div class="test-case">
-                <div class="test-header">
-                    <span class="test-number">Test {i}</span>
-                    <span class="test-type">{test_case.get('type', 'unknown')}</span>
-                </div>
-                
-                <div class="task-description">
-                    <strong>Task:</strong> {test_case['task']}
-                </div>
-                
-                <div class="scores">
-                    <div class="score-item final">
-                        <div class="score-value">{result['final_score']}</div>
-                        <div class="score-label">Final Score</div>
-                    </div>
-                    <div class="score-item">
-                        <div class="score-value">{model_eval['score']}</div>
-                        <div class="score-label">Model Score</div>
-                    </div>
-                    <div class="score-item">
-                        <div class="score-value">{code_eval['score']}</div>
-                        <div class="score-label">Code Score</div>
-                    </div>
-                </div>
-                
-                <div class="details">
-                    <div class="detail-section">
-                        <h4>Model Reasoning</h4>
-                        <p>{model_eval['reasoning']}</p>
-                    </div>
-                    
-                    <div class="detail-section">
-                        <h4>Code Validation</h4>
-                        <p>{code_eval['feedback']}</p>
-                    </div>
-                    
-                    {"<div class='detail-section'><h4>Strengths</h4><ul class='strengths'>" + strengths_html + "</ul></div>" if model_eval['strengths'] else ""}
-                    
-                    {"<div class='detail-section'><h4>Weaknesses</h4><ul class='weaknesses'>" + weaknesses_html + "</ul></div>" if model_eval['weaknesses'] else ""}
-                    
-                    <div class="output-section">
-                        <button class="toggle-output" onclick="toggleOutput({i})">Toggle Output</button>
-                        <div class="output-content" id="output-{i}">AI Output:
-{result['output']}</div>
-                    </div>
-                </div>
-            </div>
-"""
 
-    html_content += """
-        </div>
-    </div>
-    
-    <script>
-        function toggleOutput(testId) {
-            const output = document.getElementById('output-' + testId);
-            if (output.style.display === 'none' || output.style.display === '') {
-                output.style.display = 'block';
-            } else {
-                output.style.display = 'none';
-            }
+def record_batch_metrics(model, result, cached=False):
+    """Send one batch response's token usage to the metrics sink"""
+    if metrics is None:
+        return
+    metrics.record({
+        'model': model,
+        'stream': False,
+        'batch': True,
+        'cached': cached,
+        'latency_s': None,
+        'ttft_s': None,
+        'tokens_per_s': None,
+        'input_tokens': result.get('input_tokens', 0),
+        'output_tokens': result.get('output_tokens', 0),
+        'cache_creation_input_tokens': result.get('cache_creation_input_tokens', 0),
+        'cache_read_input_tokens': result.get('cache_read_input_tokens', 0),
+    })
+
+
+def run_cached_batch(chat, requests, poll_interval=30):
+    """Run batch requests through the response cache and metrics sink like live calls
+    
+    requests is a list of {"custom_id", "params"} dicts. Requests already
+    in response_cache are answered from it and only the rest are
+    submitted; fresh responses are stored back. Returns a dict mapping
+    custom_id to a response dict (as send_message returns), or None.
+    Metrics events carry token usage but no latency, since a batch's
+    wall time says nothing about any one request.
+    """
+    responses, keys, pending = {}, {}, []
+    for request in requests:
+        params = request["params"]
+        key = None
+        if response_cache is not None:
+            key = response_cache.make_key(
+                params["model"], params.get("system"), params["messages"], params["max_tokens"], params.get("stop_sequences")
+            )
+            cached = response_cache.get(key)
+            if cached is not None:
+                responses[request["custom_id"]] = cached
+                record_batch_metrics(chat.model, cached, cached=True)
+                continue
+        keys[request["custom_id"]] = key
+        pending.append(request)
+    
+    if pending:
+        for custom_id, message in run_message_batch(chat.client, pending, poll_interval).items():
+            if message is None:
+                responses[custom_id] = None
+                continue
+            result = chat._build_result(message_text(message), message.usage)
+            if keys.get(custom_id) is not None:
+                response_cache.set(keys[custom_id], result)
+            record_batch_metrics(chat.model, result)
+            responses[custom_id] = result
+    return responses
+
+
+def run_eval_batch(dataset, client=None, poll_interval=30):
+    """Run evaluation through the Message Batches API
+    
+    All run_prompt requests go out as one batch, then all grade_by_model
+    requests as a second batch. Results are joined back to test cases by
+    custom_id. Requests are built exactly like the live path's, so both
+    share response_cache entries. Pass client to use a stand-in for the
+    batches endpoints (e.g. FakeAnthropic in benchmarks/synthetic.py).
+    """
+    chat = AnthropicChat(client=client)
+    model = chat.model
+    system = [{"type": "text", "text": "You are a helpful assistant."}]
+    for test_case in dataset:
+        ensure_test_case_type(test_case)
+    
+    prompt_requests = [
+        {
+            "custom_id": f"prompt-{i}",
+            "params": {
+                "model": model,
+                "max_tokens": 200,
+                "system": system,
+                "messages": [{"role": "user", "content": [{"type": "text", "text": create_enhanced_prompt(test_case)}]}],
+            },
         }
-    </script>
-</body>
-</html>
-"""
+        for i, test_case in enumerate(dataset)
+    ]
+    prompt_responses = run_cached_batch(chat, prompt_requests, poll_interval)
+    
+    outputs = [prompt_responses.get(f"prompt-{i}") or chat._build_result("") for i in range(len(dataset))]
     
-    return html_content
+    grade_requests = [
+        {
+            "custom_id": f"grade-{i}",
+            "params": {
+                "model": model,
+                "max_tokens": 500,
+                "system": system,
+                "messages": [
+                    {"role": "user", "content": [{"type": "text", "text": create_eval_prompt(test_case, outputs[i])}]},
+                    {"role": "assistant", "content": [{"type": "text", "text": "```json"}]},
+                ],
+            },
+        }
+        for i, test_case in enumerate(dataset)
+    ]
+    grade_responses = run_cached_batch(chat, grade_requests, poll_interval)
+    
+    results = []
+    for i, test_case in enumerate(dataset):
+        grade = grade_responses.get(f"grade-{i}")
+        model_grade = parse_model_evaluation(grade['answer'] if grade else "")
+        results.append(build_result(test_case, outputs[i], model_grade))
+    
+    print_score_summary(results)
+    return results
+
+
+def run_eval(dataset, concurrency=1, requests_per_minute=None, writer=None):
+    """Run evaluation on entire dataset
+    
+    With concurrency > 1 test cases run on a bounded thread pool; results
+    keep the dataset order. All workers share one RateLimiter, so a 429
+    pauses every worker rather than only the one that hit it;
+    requests_per_minute additionally caps their combined request rate.
+    
+    Pass a ResultWriter as writer to stream each result to disk as soon
+    as its test case finishes. Results are then not kept in memory and
+    the writer's ScoreSummary is returned instead of the list.
+    
+    A test case that still fails after backoff (auth error, server error,
+    grader exception) is recorded with build_failed_result instead of
+    aborting the run, so the finished results are kept.
+    """
+    rate_limiter = RateLimiter(requests_per_minute)
+    results = [None] * len(dataset) if writer is None else None
+    
+    failures = 0
+    
+    def record(i, result):
+        if writer is None:
+            results[i] = result
+        else:
+            writer.write(i, result)
+    
+    def record_failure(i, error):
+        nonlocal failures
+        failures += 1
+        print(f"Test case {i+1} failed: {type(error).__name__}: {error}")
+        record(i, build_failed_result(dataset[i], error))
+    
+    if concurrency <= 1:
+        for i, test_case in enumerate(dataset):
+            print(f"Running test case {i+1}/{len(dataset)}")
+            try:
+                result = run_test_case(test_case, rate_limiter=rate_limiter)
+            except Exception as e:
+                record_failure(i, e)
+                continue
+            record(i, result)
+    else:
+        start_time = time.monotonic()
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            # Streaming output would interleave across workers, so it is disabled here
+            futures = {
+                executor.submit(run_test_case, test_case, stream=False, rate_limiter=rate_limiter): i
+                for i, test_case in enumerate(dataset)
+            }
+            for completed, future in enumerate(as_completed(futures), 1):
+                # Popping drops the future's reference to its result once it is recorded
+                i = futures.pop(future)
+                try:
+                    result = future.result()
+                except Exception as e:
+                    record_failure(i, e)
+                else:
+                    record(i, result)
+                elapsed = time.monotonic() - start_time
+                rate = completed / elapsed if elapsed > 0 else 0
+                eta = (len(dataset) - completed) / rate if rate > 0 else 0
+                print(f"Completed {completed}/{len(dataset)} test cases ({rate:.1f}/s, ETA {eta:.0f}s)")
+    
+    if failures:
+        print(f"{failures}/{len(dataset)} test cases failed and were scored 0")
+    if writer is not None:
+        print_score_summary(writer.summary)
+        return writer.summary
+    print_score_summary(results)
+    return results
+
+
+def print_score_summary(results):
+    """Print average final, model and code scores
+    
+    results is a list of results or an already aggregated ScoreSummary.
+    """
+    summary = results if isinstance(results, ScoreSummary) else ScoreSummary.of(results)
+    
+    print(f"\n=== SCORE SUMMARY ===")
+    print(f"Average Final Score: {summary.avg_final_score:.2f}")
+    print(f"Average Model Score: {summary.avg_model_score:.2f}")
+    print(f"Average Code Validation Score: {summary.avg_code_score:.2f}")
 
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the code-based evaluation")
+    parser.add_argument("--concurrency", type=int, default=1, help="Number of test cases to run in parallel")
+    parser.add_argument("--rpm", type=int, default=None, help="Maximum API requests per minute across all workers")
+    parser.add_argument("--cache-path", default="response_cache.sqlite", help="SQLite file used to cache model responses")
+    parser.add_argument("--no-cache", action="store_true", help="Always call the API instead of reusing cached responses")
+    parser.add_argument("--prompt-cache", choices=["off", "system", "auto"], default="off", help="Where to place prompt-caching breakpoints")
+    parser.add_argument("--metrics-path", default="evaluation_metrics.jsonl", help="JSONL file that receives one metrics event per request")
+    parser.add_argument("--prometheus-path", default="evaluation_metrics.prom", help="File for the run's aggregated metrics in Prometheus text format")
+    parser.add_argument("--batch", action="store_true", help="Run through the Message Batches API instead of live calls")
+    parser.add_argument("--results-path", default="evaluation_results.jsonl", help="JSONL file that receives each result as its test case finishes")
+    parser.add_argument("--report-dir", default="evaluation_report", help="Directory for the paginated HTML report")
+    parser.add_argument("--page-size", type=int, default=100, help="Test cases per HTML report page")
+    args = parser.parse_args()
+    prompt_cache_policy = args.prompt_cache
+    client = get_shared_client().with_options(max_retries=0)
+    run_metrics = PrometheusTextMetrics()
+    metrics_log = JSONLMetricsSink(args.metrics_path)
+    metrics = MultiSink(run_metrics, metrics_log)
+    
+    if not args.no_cache:
+        response_cache = ResponseCache(args.cache_path)
+    
     with open("dataset.json", "r") as f:
         dataset = json.load(f)
     
-    results = run_eval(dataset)
-    
-    # Save JSON results
-    with open("evaluation_results.json", "w") as f:
-        json.dump(results, f, indent=2)
+    writer = ResultWriter(args.results_path)
+    try:
+        if args.batch:
+            # Batches finish together, so their results are written at the end
+            for i, result in enumerate(run_eval_batch(dataset, client=client)):
+                writer.write(i, result)
+        else:
+            run_eval(dataset, concurrency=args.concurrency, requests_per_minute=args.rpm, writer=writer)
+    finally:
+        writer.close()
+        metrics_log.close()
+    results_summary = writer.summary
     
-    # Generate and save HTML report
-    html_report = generate_html_report(results)
-    with open("evaluation_report.html", "w", encoding='utf-8') as f:
-        f.write(html_report)
+    # Render the HTML report page by page from the JSONL file
+    report_index = write_html_report(iter_results(args.results_path), args.report_dir, page_size=args.page_size)
     
     print(f"\n✅ Evaluation complete!")
-    print(f"📊 JSON results saved to: evaluation_results.json")
-    print(f"📄 HTML report saved to: evaluation_report.html")
+    print(f"📊 JSONL results saved to: {args.results_path}")
+    print(f"📄 HTML report saved to: {report_index}")
     
     # Print console summary
-    total_tests = len(results)
-    avg_final_score = sum(r["final_score"] for r in results) / total_tests if total_tests > 0 else 0
-    print(f"🎯 Average Final Score: {avg_final_score:.2f}/10 ({total_tests} tests)")
-    print("\nOpen evaluation_report.html in your browser to view the detailed report!")
\ No newline at end of file
+    print(f"🎯 Average Final Score: {results_summary.avg_final_score:.2f}/10 ({results_summary.count} tests)")
+    if response_cache:
+        stats = response_cache.stats()
+        print(f"💾 Response cache: {stats['hits']} hits, {stats['misses']} misses")
+    print(f"🧠 Prompt cache: {results_summary.cache_read_input_tokens} input tokens read, {results_summary.cache_creation_input_tokens} written")
+    summary = run_metrics.summary()
+    if summary["latency_s"]["count"]:
+        print(f"⏱️  Latency: p50 {summary['latency_s']['p50']:.2f}s, p95 {summary['latency_s']['p95']:.2f}s")
+    if summary["ttft_s"]["count"]:
+        print(f"⚡ Time to first token: p50 {summary['ttft_s']['p50']:.2f}s, p95 {summary['ttft_s']['p95']:.2f}s")
+    print(f"💰 Tokens: {summary['input_tokens']} in, {summary['output_tokens']} out over {summary['requests']} requests")
+    run_metrics.write(args.prometheus_path)
+    print(f"📈 Metrics saved to: {args.metrics_path}, {args.prometheus_path}")
+    print(f"\nOpen {report_index} in your browser to view the detailed report!")
\ No newline at end of file
@@ -0,0 +1,156 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+
+def make_message(text, input_tokens=10, output_tokens=5, **usage):
+    """Messages API response with one text block and the given token usage."""
+    return SimpleNamespace(
+        content=[SimpleNamespace(type="text", text=text)],
+        usage=SimpleNamespace(input_tokens=input_tokens, output_tokens=output_tokens, **usage),
+    )
+
+
+class FakeStream:
+    def __init__(self, message, chunk_chars):
+        self._message = message
+        self._chunk_chars = chunk_chars
+        self.produced = 0
+        self.closed = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.closed = True
+
+    @property
+    def text_stream(self):
+        text = self._message.content[0].text
+        for start in range(0, len(text), self._chunk_chars):
+            self.produced += 1
+            yield text[start : start + self._chunk_chars]
+
+    def get_final_message(self):
+        return self._message
+
+
+class FakeBatches:
+    """messages.batches stand-in; a batch ends after `polls` retrieves.
+
+    Requests whose reply raises come back as "errored" results.
+    """
+
+    def __init__(self, client, polls=2):
+        self._client = client
+        self.polls = polls
+        self.created = []
+        self._retrieves = {}
+
+    def create(self, requests):
+        batch_id = f"msgbatch_{len(self.created) + 1}"
+        self.created.append(list(requests))
+        self._retrieves[batch_id] = 0
+        return self._batch(batch_id)
+
+    def retrieve(self, batch_id):
+        self._retrieves[batch_id] += 1
+        return self._batch(batch_id)
+
+    def results(self, batch_id):
+        for request in self.created[int(batch_id.split("_")[1]) - 1]:
+            try:
+                result = SimpleNamespace(type="succeeded", message=self._client.respond(request["params"]))
+            except Exception:
+                result = SimpleNamespace(type="errored", message=None)
+            yield SimpleNamespace(custom_id=request["custom_id"], result=result)
+
+    def _batch(self, batch_id):
+        ended = self._retrieves[batch_id] >= self.polls
+        counts = SimpleNamespace(processing=0 if ended else 1, succeeded=0, errored=0)
+        return SimpleNamespace(id=batch_id, processing_status="ended" if ended else "in_progress", request_counts=counts)
+
+
+class FakeMessages:
+    def __init__(self, client):
+        self._client = client
+        self.batches = FakeBatches(client)
+
+    def create(self, **request):
+        self._client.record(request)
+        return self._client.respond(request)
+
+    def stream(self, **request):
+        self._client.record(request)
+        stream = FakeStream(self._client.respond(request), self._client.chunk_chars)
+        self._client.streams.append(stream)
+        return stream
+
+
+class FakeClient:
+    """Stand-in for anthropic.Anthropic that records every request.
+
+    `reply(request)` returns the answer text; by default it echoes the
+    last user message.
+    """
+
+    api_key = "test-key"
+
+    def __init__(self, reply=None, chunk_chars=4):
+        self.requests = []
+        self.streams = []
+        self.chunk_chars = chunk_chars
+        self._reply = reply or (lambda request: "echo: " + request["messages"][-1]["content"][0]["text"])
+        self.messages = FakeMessages(self)
+
+    def record(self, request):
+        # AnthropicChat keeps appending to the list it sent, so snapshot it
+        self.requests.append({**request, "messages": list(request["messages"])})
+
+    def respond(self, request):
+        return make_message(self._reply(request))
+
+
+class FakeAsyncStream(FakeStream):
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        self.closed = True
+
+    @property
+    async def text_stream(self):
+        for chunk in super().text_stream:
+            await asyncio.sleep(0)
+            yield chunk
+
+    async def get_final_message(self):
+        return self._message
+
+
+class FakeAsyncMessages(FakeMessages):
+    async def create(self, **request):
+        self._client.record(request)
+        await asyncio.sleep(self._client.latency)
+        return self._client.respond(request)
+
+    def stream(self, **request):
+        self._client.record(request)
+        stream = FakeAsyncStream(self._client.respond(request), self._client.chunk_chars)
+        self._client.streams.append(stream)
+        return stream
+
+
+class FakeAsyncClient(FakeClient):
+    """Stand-in for anthropic.AsyncAnthropic; create() waits `latency` seconds."""
+
+    def __init__(self, reply=None, chunk_chars=4, latency=0.0):
+        super().__init__(reply, chunk_chars)
+        self.latency = latency
+        self.messages = FakeAsyncMessages(self)
+
+
+@pytest.fixture
+def fake_client():
+    return FakeClient()
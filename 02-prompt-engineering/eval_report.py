@@ -0,0 +1,654 @@
+# eval_report.py
+import hashlib
+import html
+import json
+import os
+import threading
+
+REPORT_CSS = """
+        body {
+            font-family: 'Segoe UI', Tahoma, Geneva, Verdana, sans-serif;
+            margin: 0;
+            padding: 20px;
+            background-color: #f5f7fa;
+        }
+        .container {
+            max-width: 1200px;
+            margin: 0 auto;
+            background: white;
+            border-radius: 10px;
+            box-shadow: 0 4px 6px rgba(0, 0, 0, 0.1);
+            overflow: hidden;
+        }
+        .header {
+            background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
+            color: white;
+            padding: 30px;
+            text-align: center;
+        }
+        .header h1 {
+            margin: 0;
+            font-size: 2.5em;
+            font-weight: 300;
+        }
+        .header p {
+            margin: 10px 0 0 0;
+            opacity: 0.9;
+        }
+        .summary {
+            padding: 30px;
+            background: #f8fafc;
+            border-bottom: 1px solid #e2e8f0;
+        }
+        .summary-grid {
+            display: grid;
+            grid-template-columns: repeat(auto-fit, minmax(200px, 1fr));
+            gap: 20px;
+            margin-bottom: 20px;
+        }
+        .summary-card {
+            background: white;
+            padding: 20px;
+            border-radius: 8px;
+            box-shadow: 0 2px 4px rgba(0, 0, 0, 0.1);
+            text-align: center;
+        }
+        .summary-card h3 {
+            margin: 0 0 10px 0;
+            color: #4a5568;
+            font-size: 0.9em;
+            text-transform: uppercase;
+            letter-spacing: 1px;
+        }
+        .summary-card .value {
+            font-size: 2em;
+            font-weight: bold;
+            color: #2d3748;
+        }
+        .type-breakdown {
+            display: flex;
+            gap: 10px;
+            flex-wrap: wrap;
+        }
+        .type-badge {
+            background: #4299e1;
+            color: white;
+            padding: 5px 15px;
+            border-radius: 20px;
+            font-size: 0.9em;
+        }
+        .results {
+            padding: 0;
+        }
+        .test-case {
+            border-bottom: 1px solid #e2e8f0;
+            padding: 25px;
+            transition: background-color 0.3s;
+        }
+        .test-case:hover {
+            background: #f7fafc;
+        }
+        .test-case:last-child {
+            border-bottom: none;
+        }
+        .test-header {
+            display: flex;
+            justify-content: space-between;
+            align-items: center;
+            margin-bottom: 15px;
+        }
+        .test-number {
+            background: #4a5568;
+            color: white;
+            padding: 5px 15px;
+            border-radius: 20px;
+            font-weight: bold;
+            font-size: 0.9em;
+        }
+        .test-type {
+            background: #38b2ac;
+            color: white;
+            padding: 5px 15px;
+            border-radius: 20px;
+            font-size: 0.9em;
+            text-transform: uppercase;
+        }
+        .task-description {
+            background: #edf2f7;
+            padding: 15px;
+            border-radius: 6px;
+            margin-bottom: 20px;
+            font-style: italic;
+            color: #4a5568;
+        }
+        .scores {
+            display: grid;
+            grid-template-columns: repeat(auto-fit, minmax(150px, 1fr));
+            gap: 15px;
+            margin-bottom: 20px;
+        }
+        .score-item {
+            text-align: center;
+            padding: 15px;
+            background: white;
+            border: 2px solid #e2e8f0;
+            border-radius: 8px;
+        }
+        .score-item.final {
+            border-color: #38b2ac;
+            background: #e6fffa;
+        }
+        .score-value {
+            font-size: 1.8em;
+            font-weight: bold;
+            color: #2d3748;
+        }
+        .score-label {
+            font-size: 0.8em;
+            color: #718096;
+            text-transform: uppercase;
+            letter-spacing: 1px;
+        }
+        .details {
+            display: grid;
+            grid-template-columns: 1fr 1fr;
+            gap: 20px;
+            margin-top: 20px;
+        }
+        .detail-section {
+            background: #f7fafc;
+            padding: 15px;
+            border-radius: 6px;
+        }
+        .detail-section h4 {
+            margin: 0 0 10px 0;
+            color: #4a5568;
+            font-size: 1em;
+        }
+        .detail-section p {
+            margin: 5px 0;
+            color: #718096;
+            line-height: 1.4;
+        }
+        .strengths, .weaknesses {
+            list-style: none;
+            padding: 0;
+        }
+        .strengths li {
+            background: #c6f6d5;
+            color: #22543d;
+            padding: 8px 12px;
+            margin: 5px 0;
+            border-radius: 4px;
+            border-left: 4px solid #38a169;
+        }
+        .weaknesses li {
+            background: #fed7d7;
+            color: #742a2a;
+            padding: 8px 12px;
+            margin: 5px 0;
+            border-radius: 4px;
+            border-left: 4px solid #e53e3e;
+        }
+        .output-section {
+            grid-column: 1 / -1;
+            background: #2d3748;
+            color: #e2e8f0;
+            padding: 15px;
+            border-radius: 6px;
+            font-family: 'Monaco', 'Courier New', monospace;
+            font-size: 0.9em;
+            white-space: pre-wrap;
+            overflow-x: auto;
+        }
+        .toggle-output {
+            background: #4299e1;
+            color: white;
+            border: none;
+            padding: 8px 16px;
+            border-radius: 4px;
+            cursor: pointer;
+            font-size: 0.9em;
+            margin-bottom: 10px;
+        }
+        .toggle-output:hover {
+            background: #3182ce;
+        }
+        .output-content {
+            display: none;
+        }
+        @media (max-width: 768px) {
+            .details {
+                grid-template-columns: 1fr;
+            }
+            .scores {
+                grid-template-columns: 1fr;
+            }
+            .summary-grid {
+                grid-template-columns: 1fr;
+            }
+        }
+        .pager {
+            padding: 15px 25px;
+            background: #f8fafc;
+            border-bottom: 1px solid #e2e8f0;
+        }
+        .pager a, a.type-badge {
+            text-decoration: none;
+        }
+        .pager a {
+            color: #4299e1;
+        }
+    """
+
+TOGGLE_SCRIPT = """
+    <script>
+        function toggleOutput(testId) {
+            const output = document.getElementById('output-' + testId);
+            if (output.style.display === 'none' || output.style.display === '') {
+                output.style.display = 'block';
+            } else {
+                output.style.display = 'none';
+            }
+        }
+    </script>
+"""
+
+
+class ScoreSummary:
+    """Running score averages and token totals, overall and per content type.
+
+    Filled one result at a time, so a run or report can be summarized
+    without keeping its results in memory.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.final_total = 0.0
+        self.model_total = 0.0
+        self.code_total = 0.0
+        self.cache_read_input_tokens = 0
+        self.cache_creation_input_tokens = 0
+        self.by_type = {}
+
+    @classmethod
+    def of(cls, results):
+        summary = cls()
+        for result in results:
+            summary.add(result)
+        return summary
+
+    def add(self, result):
+        self.count += 1
+        self.final_total += result["final_score"]
+        self.model_total += result["model_evaluation"]["score"]
+        self.code_total += result["code_evaluation"]["score"]
+        output = result["output"]
+        if isinstance(output, dict):
+            self.cache_read_input_tokens += output.get("cache_read_input_tokens", 0)
+            self.cache_creation_input_tokens += output.get("cache_creation_input_tokens", 0)
+
+        content_type = result["test_case"].get("type", "unknown")
+        counts = self.by_type.setdefault(content_type, {"count": 0, "final_total": 0.0, "scores": {}})
+        counts["count"] += 1
+        counts["final_total"] += result["final_score"]
+        bucket = int(result["final_score"])
+        counts["scores"][bucket] = counts["scores"].get(bucket, 0) + 1
+
+    def _average(self, total):
+        return total / self.count if self.count else 0
+
+    @property
+    def avg_final_score(self):
+        return self._average(self.final_total)
+
+    @property
+    def avg_model_score(self):
+        return self._average(self.model_total)
+
+    @property
+    def avg_code_score(self):
+        return self._average(self.code_total)
+
+
+class ResultWriter:
+    """Appends evaluation results to a JSON lines file in dataset order.
+
+    Each line is the result plus its dataset "index", written and
+    flushed under a lock so worker threads can share one writer. Results
+    that finish ahead of an earlier index are held until the gap is
+    filled, so with concurrent workers only the few in-flight cases wait
+    in memory. The running totals are kept in `summary`.
+    """
+
+    def __init__(self, path="evaluation_results.jsonl"):
+        self.path = path
+        self.summary = ScoreSummary()
+        self._lock = threading.Lock()
+        self._file = open(path, "w", encoding="utf-8")
+        self._next_index = 0
+        self._pending = {}
+
+    def write(self, index, result):
+        line = json.dumps({"index": index, **result}, ensure_ascii=False) + "\n"
+        with self._lock:
+            self.summary.add(result)
+            self._pending[index] = line
+            while self._next_index in self._pending:
+                self._file.write(self._pending.pop(self._next_index))
+                self._next_index += 1
+            self._file.flush()
+
+    def close(self):
+        # Only an aborted run leaves gaps; keep what finished, still in index order
+        with self._lock:
+            for index in sorted(self._pending):
+                self._file.write(self._pending[index])
+            self._pending.clear()
+            self._file.close()
+
+
+def iter_results(path):
+    """Yield the results of a JSON lines file one at a time."""
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+
+def _output_text(output):
+    return output.get("answer", "") if isinstance(output, dict) else str(output)
+
+
+def render_case(number, result):
+    """HTML for one test case, with every model- or dataset-provided string escaped."""
+    test_case = result["test_case"]
+    model_eval = result["model_evaluation"]
+    code_eval = result["code_evaluation"]
+    escape = html.escape
+
+    parts = [
+        f"""
+            <div class="test-case" id="test-{number}">
+                <div class="test-header">
+                    <span class="test-number">Test {number}</span>
+                    <span class="test-type">{escape(str(test_case.get('type', 'unknown')))}</span>
+                </div>
+
+                <div class="task-description">
+                    <strong>Task:</strong> {escape(str(test_case['task']))}
+                </div>
+
+                <div class="scores">
+                    <div class="score-item final">
+                        <div class="score-value">{result['final_score']}</div>
+                        <div class="score-label">Final Score</div>
+                    </div>
+                    <div class="score-item">
+                        <div class="score-value">{escape(str(model_eval['score']))}</div>
+                        <div class="score-label">Model Score</div>
+                    </div>
+                    <div class="score-item">
+                        <div class="score-value">{code_eval['score']}</div>
+                        <div class="score-label">Code Score</div>
+                    </div>
+                </div>
+
+                <div class="details">
+                    <div class="detail-section">
+                        <h4>Model Reasoning</h4>
+                        <p>{escape(str(model_eval['reasoning']))}</p>
+                    </div>
+
+                    <div class="detail-section">
+                        <h4>Code Validation</h4>
+                        <p>{escape(str(code_eval['feedback']))}</p>
+                    </div>
+"""
+    ]
+    for title, css_class in (("Strengths", "strengths"), ("Weaknesses", "weaknesses")):
+        items = model_eval[css_class]
+        if items:
+            parts.append(f"<div class='detail-section'><h4>{title}</h4><ul class='{css_class}'>")
+            parts.extend(f"<li>{escape(str(item))}</li>" for item in items)
+            parts.append("</ul></div>")
+    parts.append(
+        f"""
+                    <div class="output-section">
+                        <button class="toggle-output" onclick="toggleOutput({number})">Toggle Output</button>
+                        <div class="output-content" id="output-{number}">AI Output:
+{escape(_output_text(result['output']))}</div>
+                    </div>
+                </div>
+            </div>
+"""
+    )
+    return "".join(parts)
+
+
+def _page_head(title, heading, subtitle):
+    return f"""
+<!DOCTYPE html>
+<html lang="en">
+<head>
+    <meta charset="UTF-8">
+    <meta name="viewport" content="width=device-width, initial-scale=1.0">
+    <title>{html.escape(title)}</title>
+    <style>{REPORT_CSS}</style>
+</head>
+<body>
+    <div class="container">
+        <div class="header">
+            <h1>{html.escape(heading)}</h1>
+            <p>{html.escape(subtitle)}</p>
+        </div>
+"""
+
+
+def _page_tail():
+    return """
+    </div>
+""" + TOGGLE_SCRIPT + """
+</body>
+</html>
+"""
+
+
+def render_summary(summary, type_links=None):
+    """Summary cards plus one badge per content type, linked when type_links maps type -> URL."""
+    badges = []
+    for type_name, counts in summary.by_type.items():
+        label = f"{html.escape(str(type_name))}: {counts['count']}"
+        if type_links and type_name in type_links:
+            badges.append(f'<a class="type-badge" href="{html.escape(type_links[type_name])}">{label}</a>')
+        else:
+            badges.append(f'<span class="type-badge">{label}</span>')
+    return f"""
+        <div class="summary">
+            <div class="summary-grid">
+                <div class="summary-card">
+                    <h3>Final Average Score</h3>
+                    <div class="value">{summary.avg_final_score:.1f}/10</div>
+                </div>
+                <div class="summary-card">
+                    <h3>Model Score</h3>
+                    <div class="value">{summary.avg_model_score:.1f}/10</div>
+                </div>
+                <div class="summary-card">
+                    <h3>Code Score</h3>
+                    <div class="value">{summary.avg_code_score:.1f}/10</div>
+                </div>
+                <div class="summary-card">
+                    <h3>Total Tests</h3>
+                    <div class="value">{summary.count}</div>
+                </div>
+            </div>
+            <div class="type-breakdown">
+                {"".join(badges)}
+            </div>
+        </div>
+"""
+
+
+def generate_html_report(results):
+    """Generate a single-page HTML report from a list of evaluation results
+
+    Fine for small runs; write_html_report streams larger ones into pages.
+    """
+    results = list(results)
+    parts = [
+        _page_head("Evaluation Report", "AI Evaluation Report", f"Comprehensive analysis of {len(results)} test cases"),
+        render_summary(ScoreSummary.of(results)),
+        '\n        <div class="results">\n',
+    ]
+    parts.extend(render_case(i, result) for i, result in enumerate(results, 1))
+    parts.append("\n        </div>\n")
+    parts.append(_page_tail())
+    return "".join(parts)
+
+
+def _slug(type_name):
+    """File-name-safe form of a type name, unique per name.
+
+    Lowercasing and replacing punctuation can map different names to the
+    same string ("JSON" and "json", "c++" and "c--"), so any name that
+    changes on the way, or contains a dash, gets a short hash of the
+    original appended.
+    """
+    name = str(type_name)
+    slug = "".join(c if c.isascii() and c.isalnum() else "-" for c in name.lower())
+    # Only dash-free names stay bare, so no bare slug can look like a hashed one or a page number
+    if slug == name and slug and "-" not in slug:
+        return slug
+    return f"{slug or 'type'}-{hashlib.sha1(name.encode('utf-8')).hexdigest()[:8]}"
+
+
+class _TypePages:
+    """Writes one content type's cases into numbered pages of page_size cases."""
+
+    def __init__(self, directory, type_name, page_size):
+        self.directory = directory
+        self.type_name = type_name
+        self.slug = _slug(type_name)
+        self.page_size = page_size
+        self.pages = 0
+        self._on_page = 0
+        self._file = None
+
+    @property
+    def summary_name(self):
+        return f"type-{self.slug}.html"
+
+    def page_name(self, page):
+        return f"type-{self.slug}-{page:04d}.html"
+
+    def add(self, number, result):
+        if self._on_page == self.page_size:
+            # Only now is it known that the full page has a successor
+            self._close_page(has_next=True)
+        if self._file is None:
+            self.pages += 1
+            self._file = open(os.path.join(self.directory, self.page_name(self.pages)), "w", encoding="utf-8")
+            self._file.write(
+                _page_head(
+                    f"Evaluation Report - {self.type_name} page {self.pages}",
+                    f"{self.type_name} cases",
+                    f"Page {self.pages}",
+                )
+            )
+            self._file.write(self._nav(has_next=None))
+            self._file.write('\n        <div class="results">\n')
+        self._file.write(render_case(number, result))
+        self._on_page += 1
+
+    def _nav(self, has_next):
+        links = ['<a href="index.html">All types</a>', f'<a href="{self.summary_name}">{html.escape(str(self.type_name))} summary</a>']
+        if self.pages > 1:
+            links.append(f'<a href="{self.page_name(self.pages - 1)}">&larr; Previous</a>')
+        if has_next:
+            links.append(f'<a href="{self.page_name(self.pages + 1)}">Next &rarr;</a>')
+        return f'\n        <div class="pager">{" | ".join(links)}</div>\n'
+
+    def _close_page(self, has_next):
+        # Whether a next page exists is only known once another case arrives, so the link goes at the bottom
+        self._file.write("\n        </div>\n")
+        self._file.write(self._nav(has_next))
+        self._file.write(_page_tail())
+        self._file.close()
+        self._file = None
+        self._on_page = 0
+
+    def close(self):
+        if self._file is not None:
+            self._close_page(has_next=False)
+
+
+def write_html_report(results, directory="evaluation_report", page_size=100):
+    """Stream results into a multi-page HTML report and return its index path.
+
+    results may be any iterable, such as iter_results(path); each result
+    is rendered and written as soon as it is read, so memory stays flat
+    however many cases there are. The directory gets index.html (overall
+    summary), one summary page per content type, and that type's cases
+    split into pages of page_size. Cases appear in the order they are
+    read (dataset order for a ResultWriter file); case numbers come from
+    the result's "index" when present.
+    """
+    os.makedirs(directory, exist_ok=True)
+    summary = ScoreSummary()
+    pages = {}
+    try:
+        for position, result in enumerate(results):
+            type_name = result["test_case"].get("type", "unknown")
+            if type_name not in pages:
+                pages[type_name] = _TypePages(directory, type_name, page_size)
+            pages[type_name].add(result.get("index", position) + 1, result)
+            summary.add(result)
+    finally:
+        for type_pages in pages.values():
+            type_pages.close()
+
+    for type_name, type_pages in pages.items():
+        counts = summary.by_type[type_name]
+        average = counts["final_total"] / counts["count"]
+        distribution = "".join(
+            f"<li>{score}-{score + 1}: {counts['scores'][score]}</li>" for score in sorted(counts["scores"])
+        )
+        page_links = "".join(
+            f'<li><a href="{type_pages.page_name(page)}">Page {page}</a></li>' for page in range(1, type_pages.pages + 1)
+        )
+        with open(os.path.join(directory, type_pages.summary_name), "w", encoding="utf-8") as f:
+            f.write(_page_head(f"Evaluation Report - {type_name}", f"{type_name} cases", f"{counts['count']} test cases"))
+            f.write(
+                f"""
+        <div class="summary">
+            <div class="pager"><a href="index.html">All types</a></div>
+            <div class="summary-grid">
+                <div class="summary-card">
+                    <h3>Final Average Score</h3>
+                    <div class="value">{average:.1f}/10</div>
+                </div>
+                <div class="summary-card">
+                    <h3>Total Tests</h3>
+                    <div class="value">{counts['count']}</div>
+                </div>
+            </div>
+            <div class="detail-section">
+                <h4>Final score distribution</h4>
+                <ul>{distribution}</ul>
+            </div>
+            <div class="detail-section">
+                <h4>Case pages ({page_size} per page)</h4>
+                <ul>{page_links}</ul>
+            </div>
+        </div>
+"""
+            )
+            f.write(_page_tail())
+
+    index_path = os.path.join(directory, "index.html")
+    with open(index_path, "w", encoding="utf-8") as f:
+        f.write(_page_head("Evaluation Report", "AI Evaluation Report", f"Comprehensive analysis of {summary.count} test cases"))
+        f.write(render_summary(summary, {name: p.summary_name for name, p in pages.items()}))
+        f.write(_page_tail())
+    return index_path
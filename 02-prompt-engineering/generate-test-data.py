@@ -36,6 +36,7 @@ def main():
         system=[{"type": "text", "text": "You are a helpful assistant."}],
         max_tokens=200,
         stream=True,
+        echo=True,
     )
     
 
@@ -3,6 +3,10 @@ import sys
 import re
 sys.path.append('..')
 from chat_client import AnthropicChat
+from response_cache import ResponseCache
+
+# Set in __main__; shared by every chat so re-runs reuse identical responses
+response_cache = None
 
 
 def run_prompt(test_case):
@@ -10,13 +14,14 @@ def run_prompt(test_case):
     Please solve the following task:
     {test_case["task"]}
     """
-    chat = AnthropicChat()
+    chat = AnthropicChat(cache=response_cache)
     chat.add_user_message(prompt)
     answer = chat.send_message(
         user_input=None,
         system=[{"type": "text", "text": "You are a helpful assistant."}],
         max_tokens=200,
         stream=True,
+        echo=True,
     )
     return answer
 
@@ -35,7 +40,7 @@ def grade_by_model(test_case, output):
     - "score": A number between 1-10
     """
     
-    chat = AnthropicChat()
+    chat = AnthropicChat(cache=response_cache)
     chat.add_user_message(eval_prompt)
     chat.add_assistant_message("```json")
     evaluation = chat.send_message(
@@ -113,6 +118,8 @@ def run_eval(dataset):
 
 
 if __name__ == "__main__":
+    response_cache = ResponseCache("response_cache.sqlite")
+    
     with open("dataset.json", "r") as f:
         dataset = json.load(f)
     
@@ -0,0 +1,151 @@
+# history.py
+from chat_client import _estimate_tokens, get_shared_client
+
+SUMMARY_PREFIX = "Summary of the earlier conversation:\n"
+SUMMARY_ACK = "Understood, I'll keep that context in mind."
+
+
+def message_text(message):
+    """Plain text of a message whose content is a string or a list of blocks."""
+    content = message["content"]
+    if isinstance(content, str):
+        return content
+    return "\n".join(block.get("text", "") for block in content if isinstance(block, dict))
+
+
+def truncating_summarizer(max_chars=2000, chars_per_message=300):
+    """Summarizer that keeps the start of each folded message, newest last, without an API call."""
+    def summarize(previous_summary, messages):
+        lines = [previous_summary] if previous_summary else []
+        for message in messages:
+            text = " ".join(message_text(message).split())
+            if len(text) > chars_per_message:
+                text = text[:chars_per_message] + "..."
+            lines.append(f"{message['role']}: {text}")
+        summary = "\n".join(lines)
+        return summary[-max_chars:]
+    return summarize
+
+
+def claude_summarizer(client=None, model="claude-3-haiku-20240307", max_tokens=300):
+    """Summarizer that asks Claude to merge folded turns into the running summary."""
+    def summarize(previous_summary, messages):
+        transcript = "\n".join(f"{m['role']}: {message_text(m)}" for m in messages)
+        prompt = (
+            f"Previous summary:\n{previous_summary or '(none)'}\n\n"
+            f"New conversation turns:\n{transcript}\n\n"
+            "Write an updated summary that keeps every fact, decision, name and open question "
+            "needed to continue the conversation. Be brief."
+        )
+        response = (client or get_shared_client()).messages.create(
+            model=model,
+            max_tokens=max_tokens,
+            messages=[{"role": "user", "content": prompt}],
+        )
+        return "".join(block.text for block in response.content if block.type == "text")
+    return summarize
+
+
+class HistoryManager:
+    """Keeps AnthropicChat.messages within a token budget.
+
+    Pinned turns and the current turn are always sent verbatim. Once the
+    history reaches twice window_turns turns, or its estimated size
+    exceeds max_tokens, the oldest unpinned turns are folded into a
+    running summary sent as a synthetic first exchange, leaving at most
+    window_turns recent turns and half of max_tokens. Compacting in steps
+    means the summarizer runs (and the prompt-cache prefix changes) about
+    once every window_turns turns, not on every turn. A turn starts at a
+    user message and runs until the next one.
+    """
+
+    def __init__(self, max_tokens=4000, window_turns=6, summarizer=None):
+        """summarizer(previous_summary, messages) returns the new summary text."""
+        if window_turns < 1:
+            raise ValueError("window_turns must be at least 1")
+        self.max_tokens = max_tokens
+        self.window_turns = window_turns
+        self.summarizer = summarizer or truncating_summarizer()
+        self.summary = ""
+        self.compactions = 0
+        self._pinned = []
+
+    def pin(self, message):
+        """Always keep the turn containing message verbatim."""
+        if not any(message is pinned for pinned in self._pinned):
+            self._pinned.append(message)
+
+    def pin_last_turn(self, messages):
+        """Pin the most recent complete turn; returns False if there is none."""
+        turns = self._split_turns(messages)
+        complete = [turn for turn in turns if turn[-1]["role"] == "assistant" and not self._is_summary(turn)]
+        if not complete:
+            return False
+        self.pin(complete[-1][0])
+        return True
+
+    def reset(self):
+        self.summary = ""
+        self._pinned = []
+
+    def _is_pinned(self, turn):
+        return any(message is pinned for message in turn for pinned in self._pinned)
+
+    def _is_summary(self, turn):
+        return bool(self.summary) and message_text(turn[0]).startswith(SUMMARY_PREFIX)
+
+    @staticmethod
+    def _split_turns(messages):
+        turns = []
+        for message in messages:
+            if not turns or (message["role"] == "user" and not _is_tool_result(message)):
+                turns.append([])
+            turns[-1].append(message)
+        return turns
+
+    def _summary_turn(self):
+        return [
+            {"role": "user", "content": [{"type": "text", "text": SUMMARY_PREFIX + self.summary}]},
+            {"role": "assistant", "content": [{"type": "text", "text": SUMMARY_ACK}]},
+        ]
+
+    def compact(self, messages):
+        """Return messages, folding old turns into the summary if over budget.
+
+        The last turn (the one being sent) is never folded.
+        """
+        turns = [turn for turn in self._split_turns(messages) if not self._is_summary(turn)]
+        tokens = _estimate_tokens(messages)
+        if len(turns) <= 2 * self.window_turns and tokens <= self.max_tokens:
+            return messages
+
+        # Fold everything outside the window, then keep shrinking the window while over budget
+        keep = min(self.window_turns, len(turns) - 1)
+        fold, kept = self._partition(turns, keep)
+        while keep > 0 and _estimate_tokens([m for turn in kept for m in turn]) > self.max_tokens // 2:
+            keep -= 1
+            fold, kept = self._partition(turns, keep)
+        if not fold:
+            return messages
+
+        self.summary = self.summarizer(self.summary, [m for turn in fold for m in turn])
+        self.compactions += 1
+        return self._summary_turn() + [m for turn in kept for m in turn]
+
+    def _partition(self, turns, keep):
+        """Split turns into (to fold, to keep): pinned turns, the last `keep` turns and the current turn stay."""
+        boundary = len(turns) - 1 - keep
+        fold, kept = [], []
+        for i, turn in enumerate(turns):
+            if i < boundary and not self._is_pinned(turn):
+                fold.append(turn)
+            else:
+                kept.append(turn)
+        return fold, kept
+
+
+def _is_tool_result(message):
+    content = message["content"]
+    return isinstance(content, list) and any(
+        isinstance(block, dict) and block.get("type") == "tool_result" for block in content
+    )
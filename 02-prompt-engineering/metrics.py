@@ -0,0 +1,148 @@
+# metrics.py
+import json
+import math
+import threading
+
+# Per-request timings kept as histograms; everything else numeric is summed
+HISTOGRAM_FIELDS = ("latency_s", "ttft_s", "tokens_per_s")
+COUNTER_FIELDS = (
+    "input_tokens",
+    "output_tokens",
+    "cache_creation_input_tokens",
+    "cache_read_input_tokens",
+)
+
+
+class Histogram:
+    """In-memory histogram that keeps every observation for exact percentiles."""
+
+    def __init__(self):
+        self._values = []
+        self._sorted = True
+        self.total = 0.0
+
+    def observe(self, value):
+        self._values.append(value)
+        self._sorted = False
+        self.total += value
+
+    @property
+    def count(self):
+        return len(self._values)
+
+    def percentile(self, p):
+        """Nearest-rank percentile, p in [0, 100]; None when empty."""
+        if not self._values:
+            return None
+        if not self._sorted:
+            self._values.sort()
+            self._sorted = True
+        rank = max(1, math.ceil(p / 100 * len(self._values)))
+        return self._values[rank - 1]
+
+    def summary(self):
+        return {
+            "count": self.count,
+            "mean": self.total / self.count if self.count else None,
+            "p50": self.percentile(50),
+            "p95": self.percentile(95),
+            "max": self.percentile(100),
+        }
+
+
+class InMemoryMetrics:
+    """Metrics sink that aggregates request events for the whole run.
+
+    Each event is a dict as built by AnthropicChat: timings go into
+    histograms, token counts into running totals. Cached responses are
+    counted but left out of the latency histograms.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.histograms = {field: Histogram() for field in HISTOGRAM_FIELDS}
+        self.totals = {field: 0 for field in COUNTER_FIELDS}
+        self.requests = 0
+        self.cached_requests = 0
+
+    def record(self, event):
+        with self._lock:
+            self.requests += 1
+            if event.get("cached"):
+                self.cached_requests += 1
+                return
+            for field in HISTOGRAM_FIELDS:
+                if event.get(field) is not None:
+                    self.histograms[field].observe(event[field])
+            for field in COUNTER_FIELDS:
+                self.totals[field] += event.get(field) or 0
+
+    def summary(self):
+        with self._lock:
+            return {
+                "requests": self.requests,
+                "cached_requests": self.cached_requests,
+                **{field: self.histograms[field].summary() for field in HISTOGRAM_FIELDS},
+                **self.totals,
+            }
+
+
+class JSONLMetricsSink:
+    """Metrics sink that appends every event to a JSON lines file."""
+
+    def __init__(self, path="metrics.jsonl"):
+        self.path = path
+        self._lock = threading.Lock()
+        self._file = open(path, "a", encoding="utf-8")
+
+    def record(self, event):
+        line = json.dumps(event, ensure_ascii=False) + "\n"
+        with self._lock:
+            self._file.write(line)
+            self._file.flush()
+
+    def close(self):
+        self._file.close()
+
+
+class PrometheusTextMetrics(InMemoryMetrics):
+    """InMemoryMetrics that can render itself in the Prometheus text format."""
+
+    def __init__(self, prefix="anthropic_chat"):
+        super().__init__()
+        self.prefix = prefix
+
+    def render(self):
+        lines = []
+        with self._lock:
+            name = f"{self.prefix}_requests_total"
+            lines += [f"# TYPE {name} counter", f"{name} {self.requests}"]
+            name = f"{self.prefix}_cached_requests_total"
+            lines += [f"# TYPE {name} counter", f"{name} {self.cached_requests}"]
+            for field, total in self.totals.items():
+                name = f"{self.prefix}_{field}_total"
+                lines += [f"# TYPE {name} counter", f"{name} {total}"]
+            for field, histogram in self.histograms.items():
+                name = f"{self.prefix}_{field}"
+                lines.append(f"# TYPE {name} summary")
+                for quantile in (0.5, 0.95):
+                    value = histogram.percentile(quantile * 100)
+                    if value is not None:
+                        lines.append(f'{name}{{quantile="{quantile}"}} {value}')
+                lines += [f"{name}_sum {histogram.total}", f"{name}_count {histogram.count}"]
+        return "\n".join(lines) + "\n"
+
+    def write(self, path):
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(self.render())
+
+
+class MultiSink:
+    """Fans each event out to several sinks."""
+
+    def __init__(self, *sinks):
+        self.sinks = sinks
+
+    def record(self, event):
+        for sink in self.sinks:
+            sink.record(event)
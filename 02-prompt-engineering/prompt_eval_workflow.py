@@ -16,6 +16,7 @@ def run_prompt(test_case):
         system=[{"type": "text", "text": "You are a helpful assistant."}],
         max_tokens=200,
         stream=True,
+        echo=True,
     )
 
     return answer
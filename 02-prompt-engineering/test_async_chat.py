@@ -0,0 +1,124 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+import chat_client
+from chat_client import AnthropicChat, AsyncAnthropicChat, get_shared_async_client, get_shared_client
+from conftest import FakeAsyncClient
+from response_cache import ResponseCache
+
+
+@pytest.fixture
+def fresh_shared_clients(monkeypatch):
+    """Reset the process-wide clients and build dummies instead of real SDK clients."""
+    created = []
+
+    class Client:
+        def __init__(self):
+            created.append(self)
+
+    monkeypatch.setattr(chat_client, "_shared_client", None)
+    monkeypatch.setattr(chat_client, "_shared_async_client", None)
+    monkeypatch.setattr(chat_client, "_env_loaded", True)
+    monkeypatch.setattr(chat_client, "Anthropic", Client)
+    monkeypatch.setattr(chat_client, "AsyncAnthropic", Client)
+    return created
+
+
+def test_chats_share_one_client(fresh_shared_clients, monkeypatch):
+    monkeypatch.setenv("ANTHROPIC_API_KEY", "test-key")
+
+    clients = {id(AnthropicChat().client) for _ in range(3)}
+    async_clients = {id(AsyncAnthropicChat().client) for _ in range(3)}
+
+    assert len(clients) == len(async_clients) == 1
+    assert clients != async_clients
+    assert len(fresh_shared_clients) == 2
+
+
+def test_shared_client_is_created_once_across_threads(fresh_shared_clients):
+    threads = [threading.Thread(target=get_shared_client) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(fresh_shared_clients) == 1
+    assert get_shared_async_client() is get_shared_async_client()
+
+
+def test_missing_api_key_raises_without_an_injected_client(fresh_shared_clients, monkeypatch):
+    monkeypatch.delenv("ANTHROPIC_API_KEY", raising=False)
+
+    with pytest.raises(ValueError):
+        AnthropicChat()
+    assert fresh_shared_clients == []
+
+
+def test_concurrent_sends_overlap():
+    client = FakeAsyncClient(latency=0.2)
+
+    async def run():
+        chats = [AsyncAnthropicChat(client=client) for _ in range(10)]
+        return await asyncio.gather(*(chat.send_message(f"q{i}") for i, chat in enumerate(chats)))
+
+    start = time.perf_counter()
+    results = asyncio.run(run())
+
+    assert time.perf_counter() - start < 1.0
+    assert [r["answer"] for r in results] == [f"echo: q{i}" for i in range(10)]
+
+
+class SlowCache(ResponseCache):
+    def get(self, key):
+        time.sleep(0.2)
+        return super().get(key)
+
+
+def test_cache_lookups_do_not_block_the_event_loop(tmp_path):
+    cache = SlowCache(str(tmp_path / "responses.sqlite"))
+    chat = AsyncAnthropicChat(client=FakeAsyncClient(), cache=cache)
+    ticks = []
+
+    async def ticker():
+        for _ in range(5):
+            ticks.append(time.perf_counter())
+            await asyncio.sleep(0.02)
+
+    async def run():
+        await asyncio.gather(chat.send_message("hello"), ticker())
+
+    try:
+        asyncio.run(run())
+    finally:
+        cache.close()
+
+    # All ticks happen while the cache lookup is still sleeping in its thread
+    assert ticks[-1] - ticks[0] < 0.15
+
+
+def test_async_stream_awaits_the_sink_and_caches(tmp_path):
+    cache = ResponseCache(str(tmp_path / "responses.sqlite"))
+    client = FakeAsyncClient()
+    received = []
+
+    async def sink(chunk):
+        received.append((chunk, client.streams[-1].produced))
+
+    async def run():
+        first = await AsyncAnthropicChat(client=client, cache=cache).send_message("hello", stream=True, sink=sink)
+        second = await AsyncAnthropicChat(client=client, cache=cache).send_message("hello", stream=True)
+        return first, second
+
+    try:
+        first, second = asyncio.run(run())
+    finally:
+        cache.close()
+
+    # Each chunk reaches the sink before the next one is read
+    assert [produced for _, produced in received] == [1, 2, 3]
+    assert "".join(chunk for chunk, _ in received) == first["answer"] == "echo: hello"
+    assert second == first
+    assert len(client.requests) == 1
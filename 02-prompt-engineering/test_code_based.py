@@ -0,0 +1,216 @@
+import importlib.util
+import json
+import os
+import time
+from types import SimpleNamespace
+
+import pytest
+from anthropic import RateLimitError
+
+from conftest import FakeClient
+from eval_report import ResultWriter, iter_results
+from metrics import InMemoryMetrics
+from response_cache import ResponseCache
+
+# The module's file name has a hyphen, so it is loaded by path
+_spec = importlib.util.spec_from_file_location(
+    "code_based", os.path.join(os.path.dirname(__file__), "code-based.py")
+)
+code_based = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(code_based)
+
+GRADE = json.dumps({"strengths": ["works"], "weaknesses": [], "reasoning": "fine", "score": 8})
+
+
+def first_text(request):
+    return request["messages"][0]["content"][0]["text"]
+
+
+def reply(request):
+    """Answers prompts with valid Python and grading requests with GRADE"""
+    if "expert code reviewer" in first_text(request):
+        return GRADE
+    if "task broken" in first_text(request):
+        raise RuntimeError("server exploded")
+    return "```python\nprint('hi')\n```"
+
+
+def dataset(n, broken=()):
+    return [{"task": f"task {'broken' if i in broken else i}", "type": "python"} for i in range(n)]
+
+
+def rate_limit_error(retry_after=None):
+    headers = {"retry-after": retry_after} if retry_after is not None else {}
+    response = SimpleNamespace(status_code=429, headers=headers, request=None)
+    return RateLimitError("rate limited", response=response, body=None)
+
+
+@pytest.fixture
+def client(monkeypatch):
+    client = FakeClient(reply=reply)
+    monkeypatch.setattr(code_based, "client", client)
+    return client
+
+
+def test_validators():
+    assert code_based.validate_json('{"a": 1}')[0] == 10
+    assert code_based.validate_json("{a: 1}")[0] == 0
+    assert code_based.validate_python("def f():\n    return 1")[0] == 10
+    assert code_based.validate_python("def f(:")[0] == 0
+    assert code_based.validate_regex(r"^\d+$")[0] == 10
+    assert code_based.validate_regex("(")[0] == 0
+
+
+def test_code_grader_extracts_fenced_content():
+    grade = code_based.code_grader('Here you go:\n```json\n{"a": 1}\n```', {"type": "json"})
+
+    assert grade["score"] == 10
+    assert grade["extracted_content"] == '{"a": 1}'
+    assert code_based.code_grader("anything", {"type": "yaml"})["score"] == 5
+
+
+def test_parse_model_evaluation_falls_back_on_bad_json():
+    assert code_based.parse_model_evaluation("\n" + GRADE + "\n```")["score"] == 8
+    assert code_based.parse_model_evaluation("not json")["score"] == 1
+    assert code_based.parse_model_evaluation("")["weaknesses"] == ["Model evaluation parsing failed"]
+
+
+def test_run_eval_scores_every_case(client):
+    results = code_based.run_eval(dataset(3))
+
+    assert [result["test_case"]["task"] for result in results] == ["task 0", "task 1", "task 2"]
+    assert [result["final_score"] for result in results] == [8.8] * 3
+    # One prompt and one grading request per test case
+    assert len(client.requests) == 6
+
+
+def test_concurrent_runs_keep_dataset_order(client):
+    results = code_based.run_eval(dataset(12), concurrency=4)
+
+    assert [result["test_case"]["task"] for result in results] == [f"task {i}" for i in range(12)]
+    assert all(result["final_score"] == 8.8 for result in results)
+
+
+@pytest.mark.parametrize("concurrency", [1, 3])
+def test_failed_cases_are_recorded_and_the_run_continues(client, concurrency):
+    results = code_based.run_eval(dataset(5, broken={1, 3}), concurrency=concurrency)
+
+    assert [result["final_score"] for result in results] == [8.8, 0, 8.8, 0, 8.8]
+    assert results[1]["error"] == "RuntimeError: server exploded"
+    assert results[1]["test_case"]["task"] == "task broken"
+    assert "error" not in results[0]
+
+
+def test_run_eval_streams_to_a_writer(client, tmp_path):
+    path = str(tmp_path / "results.jsonl")
+    writer = ResultWriter(path)
+
+    summary = code_based.run_eval(dataset(6, broken={2}), concurrency=3, writer=writer)
+    writer.close()
+
+    assert summary.count == 6
+    assert [result["index"] for result in iter_results(path)] == list(range(6))
+
+
+def test_call_with_backoff_retries_rate_limits():
+    calls = []
+
+    def flaky(value):
+        calls.append(value)
+        if len(calls) < 3:
+            raise rate_limit_error(retry_after="0")
+        return value
+
+    assert code_based.call_with_backoff(flaky, "ok", base_delay=0) == "ok"
+    assert calls == ["ok"] * 3
+
+
+def test_call_with_backoff_gives_up_after_max_retries():
+    def always_limited():
+        raise rate_limit_error()
+
+    with pytest.raises(RateLimitError):
+        code_based.call_with_backoff(always_limited, max_retries=2, base_delay=0)
+
+
+def test_call_with_backoff_does_not_retry_other_errors():
+    calls = []
+
+    def broken():
+        calls.append(1)
+        raise ValueError("bad request")
+
+    with pytest.raises(ValueError):
+        code_based.call_with_backoff(broken, base_delay=0)
+    assert len(calls) == 1
+
+
+def test_rate_limiter_spaces_requests():
+    limiter = code_based.RateLimiter(requests_per_minute=600)
+
+    start = time.monotonic()
+    for _ in range(4):
+        limiter.acquire()
+
+    assert time.monotonic() - start == pytest.approx(0.3, abs=0.1)
+
+
+def test_rate_limiter_pause_holds_back_every_worker():
+    limiter = code_based.RateLimiter(resume_spacing=0.05)
+    limiter.pause(0.2)
+
+    start = time.monotonic()
+    limiter.acquire()
+    limiter.acquire()
+
+    # The first request waits out the pause, the next one is spaced by resume_spacing
+    assert time.monotonic() - start == pytest.approx(0.25, abs=0.08)
+
+
+def test_message_batches_are_split_and_polled(client):
+    requests = [
+        {"custom_id": f"r{i}", "params": {"messages": [{"role": "user", "content": [{"type": "text", "text": "hi"}]}]}}
+        for i in range(5)
+    ]
+
+    results = code_based.run_message_batch(client, requests, poll_interval=0, max_batch_size=2)
+
+    assert [len(batch) for batch in client.messages.batches.created] == [2, 2, 1]
+    assert sorted(results) == [f"r{i}" for i in range(5)]
+    assert code_based.message_text(results["r0"]) == "```python\nprint('hi')\n```"
+
+
+def test_batch_eval_matches_the_live_scores(client):
+    results = code_based.run_eval_batch(dataset(4), client=client, poll_interval=0)
+
+    assert [result["test_case"]["task"] for result in results] == [f"task {i}" for i in range(4)]
+    assert [result["final_score"] for result in results] == [8.8] * 4
+    # One batch of prompts, then one batch of grading requests
+    assert [len(batch) for batch in client.messages.batches.created] == [4, 4]
+    assert client.messages.batches.created[1][0]["params"]["messages"][-1]["content"][0]["text"] == "```json"
+
+
+def test_errored_batch_requests_get_an_empty_answer(client):
+    results = code_based.run_eval_batch(dataset(3, broken={1}), client=client, poll_interval=0)
+
+    assert results[1]["output"]["answer"] == ""
+    assert results[0]["output"]["answer"] == "```python\nprint('hi')\n```"
+
+
+def test_batch_requests_share_the_response_cache(client, tmp_path, monkeypatch):
+    cache = ResponseCache(str(tmp_path / "responses.sqlite"))
+    metrics = InMemoryMetrics()
+    monkeypatch.setattr(code_based, "response_cache", cache)
+    monkeypatch.setattr(code_based, "metrics", metrics)
+    try:
+        first = code_based.run_eval_batch(dataset(3), client=client, poll_interval=0)
+        second = code_based.run_eval_batch(dataset(3), client=client, poll_interval=0)
+    finally:
+        cache.close()
+
+    # The second run is answered from the cache and submits nothing
+    assert len(client.messages.batches.created) == 2
+    assert [result["final_score"] for result in second] == [result["final_score"] for result in first]
+    summary = metrics.summary()
+    assert (summary["requests"], summary["cached_requests"]) == (12, 6)
+    assert summary["latency_s"]["count"] == 0
@@ -0,0 +1,146 @@
+import os
+import re
+import threading
+
+from eval_report import (
+    ResultWriter,
+    ScoreSummary,
+    _slug,
+    generate_html_report,
+    iter_results,
+    write_html_report,
+)
+
+
+def make_result(i, content_type="python", score=7.0, answer=None):
+    return {
+        "output": {"answer": answer or f"answer {i}", "cache_read_input_tokens": 3},
+        "test_case": {"task": f"task {i}", "type": content_type},
+        "model_evaluation": {"score": score, "reasoning": "ok", "strengths": ["clear"], "weaknesses": []},
+        "code_evaluation": {"score": 10, "feedback": "valid"},
+        "final_score": score,
+    }
+
+
+def links(path):
+    with open(path, encoding="utf-8") as f:
+        return re.findall(r'href="([^"]+)"', f.read())
+
+
+def test_writer_reorders_results_into_dataset_order(tmp_path):
+    path = str(tmp_path / "results.jsonl")
+    writer = ResultWriter(path)
+
+    for index in [2, 0, 3, 1, 4]:
+        writer.write(index, make_result(index))
+        if index == 2:
+            # Index 0 has not arrived, so nothing is written yet
+            assert os.path.getsize(path) == 0
+    writer.close()
+
+    assert [result["index"] for result in iter_results(path)] == [0, 1, 2, 3, 4]
+    assert writer.summary.count == 5
+
+
+def test_writer_is_shared_by_threads(tmp_path):
+    path = str(tmp_path / "results.jsonl")
+    writer = ResultWriter(path)
+    threads = [
+        threading.Thread(target=lambda start=start: [writer.write(i, make_result(i)) for i in range(start, 200, 4)])
+        for start in range(4)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    writer.close()
+
+    assert [result["index"] for result in iter_results(path)] == list(range(200))
+
+
+def test_aborted_runs_keep_finished_results_in_order(tmp_path):
+    path = str(tmp_path / "results.jsonl")
+    writer = ResultWriter(path)
+    for index in [3, 0, 5]:
+        writer.write(index, make_result(index))
+    writer.close()
+
+    assert [result["index"] for result in iter_results(path)] == [0, 3, 5]
+
+
+def test_score_summary_tracks_types_and_cache_tokens():
+    summary = ScoreSummary.of([make_result(0, "python", 8.0), make_result(1, "json", 4.5), make_result(2, "python", 6.0)])
+
+    assert summary.avg_final_score == 6.166666666666667
+    assert summary.by_type["python"] == {"count": 2, "final_total": 14.0, "scores": {8: 1, 6: 1}}
+    assert summary.cache_read_input_tokens == 9
+
+
+def test_slugs_are_unique_and_file_safe():
+    names = ["python", "JSON", "json", "c++", "c--", "c", "type", "regex 1", "naïve", ""]
+
+    slugs = [_slug(name) for name in names]
+
+    assert len(set(slugs)) == len(names)
+    assert _slug("python") == "python"
+    assert all(re.fullmatch(r"[a-z0-9-]+", slug) for slug in slugs)
+
+
+def test_pages_link_to_their_neighbours(tmp_path):
+    directory = str(tmp_path / "report")
+    results = [make_result(i, "python") for i in range(5)] + [make_result(5, "json")]
+
+    index_path = write_html_report(results, directory, page_size=2)
+
+    summary_page = "type-python.html"
+    pages = [f"type-python-{page:04d}.html" for page in (1, 2, 3)]
+    assert summary_page in links(index_path)
+    assert links(os.path.join(directory, summary_page)) == ["index.html"] + pages
+    # The nav is written at the top and bottom; Next only appears at the bottom of full pages
+    assert links(os.path.join(directory, pages[0])) == ["index.html", summary_page, "index.html", summary_page, pages[1]]
+    assert links(os.path.join(directory, pages[1]))[-2:] == [pages[0], pages[2]]
+    assert links(os.path.join(directory, pages[2])) == ["index.html", summary_page, pages[1]] * 2
+    assert not os.path.exists(os.path.join(directory, "type-python-0004.html"))
+
+
+def test_a_full_last_page_has_no_next_link(tmp_path):
+    directory = str(tmp_path / "report")
+
+    write_html_report([make_result(i) for i in range(4)], directory, page_size=2)
+
+    last = links(os.path.join(directory, "type-python-0002.html"))
+    assert "type-python-0003.html" not in last
+    assert "type-python-0001.html" in last
+
+
+def test_colliding_type_names_get_separate_pages(tmp_path):
+    directory = str(tmp_path / "report")
+
+    write_html_report([make_result(0, "JSON"), make_result(1, "json")], directory)
+
+    hashed = _slug("JSON")
+    assert hashed != "json"
+    assert sorted(name for name in os.listdir(directory) if name.startswith("type-")) == sorted(
+        ["type-json.html", "type-json-0001.html", f"type-{hashed}.html", f"type-{hashed}-0001.html"]
+    )
+
+
+def test_case_numbers_come_from_the_result_index(tmp_path):
+    path = str(tmp_path / "results.jsonl")
+    writer = ResultWriter(path)
+    for index in range(3):
+        writer.write(index, make_result(index))
+    writer.close()
+
+    write_html_report(iter_results(path), str(tmp_path / "report"))
+
+    with open(tmp_path / "report" / "type-python-0001.html", encoding="utf-8") as f:
+        assert re.findall(r"Test (\d+)</span>", f.read()) == ["1", "2", "3"]
+
+
+def test_model_output_is_escaped():
+    page = generate_html_report([make_result(0, "<b>html</b>", answer="<script>alert(1)</script>")])
+
+    assert "<script>alert(1)</script>" not in page
+    assert "&lt;script&gt;alert(1)&lt;/script&gt;" in page
+    assert "&lt;b&gt;html&lt;/b&gt;" in page
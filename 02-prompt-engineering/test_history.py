@@ -0,0 +1,138 @@
+import pytest
+
+from chat_client import AnthropicChat
+from history import SUMMARY_PREFIX, HistoryManager, message_text, truncating_summarizer
+
+
+def user(text):
+    return {"role": "user", "content": [{"type": "text", "text": text}]}
+
+
+def assistant(text):
+    return {"role": "assistant", "content": [{"type": "text", "text": text}]}
+
+
+def conversation(n_turns, words=5):
+    messages = []
+    for i in range(n_turns):
+        messages += [user(f"question {i} " + "x " * words), assistant(f"answer {i} " + "y " * words)]
+    return messages
+
+
+class RecordingSummarizer:
+    def __init__(self):
+        self.calls = []
+
+    def __call__(self, previous_summary, messages):
+        self.calls.append((previous_summary, [message_text(m) for m in messages]))
+        return f"summary #{len(self.calls)}"
+
+
+def texts(messages):
+    return [message_text(m) for m in messages]
+
+
+def test_short_histories_are_untouched():
+    history = HistoryManager(max_tokens=10000, window_turns=3)
+    messages = conversation(5) + [user("current")]
+
+    assert history.compact(messages) is messages
+
+
+def test_folds_old_turns_once_twice_the_window_is_reached():
+    summarizer = RecordingSummarizer()
+    history = HistoryManager(max_tokens=10000, window_turns=3, summarizer=summarizer)
+    messages = conversation(7) + [user("current")]
+
+    compacted = history.compact(messages)
+
+    assert texts(compacted[:2]) == [SUMMARY_PREFIX + "summary #1", texts(history._summary_turn())[1]]
+    # The last window_turns complete turns and the current turn stay verbatim
+    assert compacted[2:] == messages[8:]
+    assert summarizer.calls[0][0] == ""
+    assert summarizer.calls[0][1] == texts(messages[:8])
+
+
+def test_later_compactions_extend_the_running_summary():
+    summarizer = RecordingSummarizer()
+    history = HistoryManager(max_tokens=10000, window_turns=2, summarizer=summarizer)
+    messages = history.compact(conversation(5) + [user("q5")])
+    messages += [assistant("a5")]
+
+    for i in range(6, 9):
+        messages = history.compact(messages + [user(f"q{i}")])
+        messages += [assistant(f"a{i}")]
+
+    assert history.compactions == 2
+    assert summarizer.calls[1][0] == "summary #1"
+    assert texts(messages[:1]) == [SUMMARY_PREFIX + "summary #2"]
+
+
+def test_token_budget_shrinks_the_window():
+    history = HistoryManager(max_tokens=200, window_turns=6, summarizer=RecordingSummarizer())
+    messages = conversation(4, words=60) + [user("current")]
+
+    compacted = history.compact(messages)
+
+    assert history.compactions == 1
+    assert compacted[-1] is messages[-1]
+    assert len(compacted) < len(messages)
+
+
+def test_pinned_turns_are_never_folded():
+    summarizer = RecordingSummarizer()
+    history = HistoryManager(max_tokens=10000, window_turns=2, summarizer=summarizer)
+    messages = conversation(6) + [user("current")]
+    history.pin(messages[2])
+
+    compacted = history.compact(messages)
+
+    assert messages[2] in compacted and messages[3] in compacted
+    assert texts(messages[2:4])[0] not in summarizer.calls[0][1]
+
+
+def test_pin_last_turn_needs_a_complete_turn():
+    history = HistoryManager()
+
+    assert not history.pin_last_turn([user("pending")])
+    messages = conversation(2)
+    assert history.pin_last_turn(messages)
+    assert history._is_pinned(messages[2:4])
+
+
+def test_tool_results_stay_with_their_turn():
+    tool_result = {"role": "user", "content": [{"type": "tool_result", "tool_use_id": "t1", "content": "42"}]}
+    messages = [user("q"), assistant("calling a tool"), tool_result, assistant("done"), user("next")]
+
+    turns = HistoryManager._split_turns(messages)
+
+    assert [len(turn) for turn in turns] == [4, 1]
+
+
+def test_truncating_summarizer_keeps_the_newest_text():
+    summarize = truncating_summarizer(max_chars=40, chars_per_message=10)
+
+    summary = summarize("old", [user("a" * 30), assistant("short")])
+
+    assert summary.endswith("assistant: short")
+    assert "aaaaaaaaaa..." in summary
+    assert len(summary) <= 40
+
+
+def test_window_turns_must_be_positive():
+    with pytest.raises(ValueError):
+        HistoryManager(window_turns=0)
+
+
+def test_chat_sends_the_compacted_history(fake_client):
+    chat = AnthropicChat(client=fake_client, history=HistoryManager(max_tokens=10000, window_turns=1))
+    for i in range(4):
+        chat.send_message(f"q{i}")
+
+    sent = fake_client.requests[-1]["messages"]
+
+    assert message_text(sent[0]).startswith(SUMMARY_PREFIX)
+    assert message_text(sent[-1]) == "q3"
+    assert len(sent) < 2 * 4
+    chat.clear_conversation()
+    assert chat.history.summary == ""
@@ -0,0 +1,107 @@
+import json
+
+import pytest
+
+from chat_client import AnthropicChat
+from metrics import Histogram, InMemoryMetrics, JSONLMetricsSink, MultiSink, PrometheusTextMetrics
+from response_cache import ResponseCache
+
+
+def event(**fields):
+    base = {"cached": False, "latency_s": 1.0, "ttft_s": None, "tokens_per_s": None, "input_tokens": 10, "output_tokens": 5}
+    return {**base, **fields}
+
+
+def test_histogram_nearest_rank_percentiles():
+    histogram = Histogram()
+    assert histogram.summary() == {"count": 0, "mean": None, "p50": None, "p95": None, "max": None}
+
+    for value in [5, 1, 4, 2, 3, 10, 9, 8, 7, 6]:
+        histogram.observe(value)
+
+    assert histogram.summary() == {"count": 10, "mean": 5.5, "p50": 5, "p95": 10, "max": 10}
+    assert histogram.percentile(0) == 1
+
+
+def test_cached_events_are_counted_but_not_timed():
+    metrics = InMemoryMetrics()
+    metrics.record(event(latency_s=2.0, ttft_s=0.5, tokens_per_s=50.0))
+    metrics.record(event(cached=True, latency_s=0.001))
+
+    summary = metrics.summary()
+
+    assert summary["requests"] == 2
+    assert summary["cached_requests"] == 1
+    assert summary["latency_s"]["count"] == 1
+    assert summary["ttft_s"]["p50"] == 0.5
+    assert summary["input_tokens"] == 10
+
+
+def test_missing_timings_are_skipped():
+    metrics = InMemoryMetrics()
+    metrics.record(event(ttft_s=None, tokens_per_s=None))
+
+    assert metrics.summary()["ttft_s"]["count"] == 0
+
+
+def test_jsonl_sink_appends_one_line_per_event(tmp_path):
+    path = tmp_path / "metrics.jsonl"
+    sink = JSONLMetricsSink(str(path))
+    try:
+        MultiSink(sink, InMemoryMetrics()).record(event(output_tokens=7))
+        sink.record(event(output_tokens=8))
+    finally:
+        sink.close()
+
+    lines = path.read_text(encoding="utf-8").splitlines()
+    assert [json.loads(line)["output_tokens"] for line in lines] == [7, 8]
+
+
+def test_prometheus_rendering(tmp_path):
+    metrics = PrometheusTextMetrics(prefix="test")
+    metrics.record(event(latency_s=0.25))
+    metrics.write(str(tmp_path / "metrics.prom"))
+
+    text = (tmp_path / "metrics.prom").read_text(encoding="utf-8")
+
+    assert "test_requests_total 1\n" in text
+    assert "test_output_tokens_total 5\n" in text
+    assert 'test_latency_s{quantile="0.5"} 0.25\n' in text
+    assert "test_ttft_s_count 0\n" in text
+
+
+def test_streaming_reports_usage_ttft_and_throughput(fake_client):
+    metrics = InMemoryMetrics()
+    chat = AnthropicChat(client=fake_client, metrics=metrics)
+
+    result = chat.send_message("hello", stream=True)
+
+    assert result["answer"] == "echo: hello"
+    assert (result["input_tokens"], result["output_tokens"]) == (10, 5)
+    event = chat.last_metrics
+    assert event["stream"] is True
+    assert 0 <= event["ttft_s"] <= event["latency_s"]
+    assert event["tokens_per_s"] > 0
+    assert metrics.summary()["output_tokens"] == 5
+
+
+def test_cache_hits_have_no_throughput(tmp_path, fake_client):
+    cache = ResponseCache(str(tmp_path / "responses.sqlite"))
+    try:
+        AnthropicChat(client=fake_client, cache=cache).send_message("hello", stream=True)
+        chat = AnthropicChat(client=fake_client, cache=cache)
+        chat.send_message("hello", stream=True)
+    finally:
+        cache.close()
+
+    assert chat.last_metrics["cached"] is True
+    assert chat.last_metrics["ttft_s"] is None
+    assert chat.last_metrics["tokens_per_s"] is None
+
+
+def test_non_streaming_requests_have_no_ttft(fake_client):
+    chat = AnthropicChat(client=fake_client)
+    chat.send_message("hello")
+
+    assert chat.last_metrics["ttft_s"] is None
+    assert chat.last_metrics["tokens_per_s"] == pytest.approx(5 / chat.last_metrics["latency_s"])
@@ -0,0 +1,80 @@
+import pytest
+
+from chat_client import DEFAULT_MIN_CACHE_TOKENS, AnthropicChat, min_cache_tokens_for
+from conftest import make_message
+
+LONG_SYSTEM = "You are a careful assistant. " * 400  # about 2900 estimated tokens
+TOOLS = [{"name": "lookup", "description": "Look things up. " * 700, "input_schema": {"type": "object"}}]
+
+
+def marked(content):
+    return isinstance(content, list) and "cache_control" in content[-1]
+
+
+def test_min_cache_tokens_depend_on_the_model():
+    assert min_cache_tokens_for("claude-3-haiku-20240307") == 2048
+    assert min_cache_tokens_for("claude-3-5-haiku-latest") == 2048
+    assert min_cache_tokens_for("claude-sonnet-4-5") == DEFAULT_MIN_CACHE_TOKENS
+
+
+def test_off_is_the_default_and_sends_no_cache_control(fake_client):
+    AnthropicChat(client=fake_client).send_message("hi", system=LONG_SYSTEM, tools=TOOLS)
+
+    request = fake_client.requests[0]
+    assert request["system"] == LONG_SYSTEM
+    assert request["tools"] == TOOLS
+    assert "cache_control" not in str(request["messages"])
+
+
+def test_system_policy_marks_tools_and_system(fake_client):
+    AnthropicChat(client=fake_client, cache_policy="system").send_message("hi", system=LONG_SYSTEM, tools=TOOLS)
+
+    request = fake_client.requests[0]
+    assert request["tools"][-1]["cache_control"] == {"type": "ephemeral"}
+    assert marked(request["system"]) and request["system"][0]["text"] == LONG_SYSTEM
+    assert not marked(request["messages"][-1]["content"])
+    # The caller's tool definitions are not modified
+    assert "cache_control" not in TOOLS[-1]
+
+
+def test_short_prefixes_get_no_breakpoint(fake_client):
+    chat = AnthropicChat(client=fake_client, cache_policy="auto")
+    chat.send_message("hi", system="Be brief.")
+
+    request = fake_client.requests[0]
+    assert request["system"] == "Be brief."
+    assert not marked(request["messages"][-1]["content"])
+
+
+def test_min_cache_tokens_override(fake_client):
+    chat = AnthropicChat(client=fake_client, cache_policy="system", min_cache_tokens=1)
+    chat.send_message("hi", system="Be brief.")
+
+    assert marked(fake_client.requests[0]["system"])
+
+
+def test_auto_marks_the_latest_message_and_the_previous_turn(fake_client):
+    chat = AnthropicChat(client=fake_client, cache_policy="auto")
+    chat.send_message("first", system=LONG_SYSTEM)
+    chat.send_message("second", system=LONG_SYSTEM)
+
+    messages = fake_client.requests[1]["messages"]
+    assert [marked(m["content"]) for m in messages] == [True, False, True]
+    # self.messages keeps the plain content
+    assert not any(marked(m["content"]) for m in chat.messages)
+
+
+def test_cache_usage_is_reported(fake_client):
+    fake_client.respond = lambda request: make_message(
+        "ok", cache_creation_input_tokens=2900, cache_read_input_tokens=0
+    )
+
+    result = AnthropicChat(client=fake_client, cache_policy="system").send_message("hi", system=LONG_SYSTEM)
+
+    assert result["cache_creation_input_tokens"] == 2900
+    assert result["cache_read_input_tokens"] == 0
+
+
+def test_unknown_policy_raises(fake_client):
+    with pytest.raises(ValueError):
+        AnthropicChat(client=fake_client, cache_policy="always")
@@ -0,0 +1,138 @@
+import pytest
+
+from chat_client import AnthropicChat
+from response_cache import ResponseCache
+
+
+class Clock:
+    """Replaces time.time in response_cache so access order is unambiguous."""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+    def advance(self, seconds=1.0):
+        self.now += seconds
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr("response_cache.time.time", clock)
+    return clock
+
+
+@pytest.fixture
+def make_cache(tmp_path):
+    caches = []
+
+    def make(**kwargs):
+        cache = ResponseCache(str(tmp_path / "responses.sqlite"), **kwargs)
+        caches.append(cache)
+        return cache
+
+    yield make
+    for cache in caches:
+        cache.close()
+
+
+def fill(cache, clock, keys):
+    for key in keys:
+        cache.set(key, {"answer": key})
+        clock.advance()
+
+
+def stored(cache, clock, keys):
+    present = [key for key in keys if cache.get(key) is not None]
+    clock.advance()
+    return present
+
+
+def test_evicts_least_recently_used_entries(make_cache, clock):
+    cache = make_cache(max_entries=3)
+    fill(cache, clock, ["a", "b", "c"])
+    cache.get("a")  # "b" is now the least recently used
+    clock.advance()
+
+    fill(cache, clock, ["d"])
+
+    assert stored(cache, clock, ["a", "b", "c", "d"]) == ["a", "c", "d"]
+    assert cache.stats()["entries"] == 3
+
+
+def test_byte_limit_evicts_oldest_first(make_cache, clock):
+    entry_size = len('{"answer": "a"}')
+    cache = make_cache(max_entries=None, max_bytes=3 * entry_size)
+    fill(cache, clock, ["a", "b", "c"])
+    cache.get("a")
+    clock.advance()
+
+    fill(cache, clock, ["d", "e"])
+
+    assert stored(cache, clock, ["a", "b", "c", "d", "e"]) == ["a", "d", "e"]
+
+
+def test_expired_entries_are_misses_and_removed(make_cache, clock):
+    cache = make_cache(ttl_seconds=10)
+    fill(cache, clock, ["a"])
+    clock.advance(5)
+    fill(cache, clock, ["b"])
+
+    clock.advance(5)  # "a" is 11s old, "b" 5s
+    assert cache.get("a") is None
+    assert cache.get("b") == {"answer": "b"}
+    assert cache.stats() == {"hits": 1, "misses": 1, "entries": 1}
+
+
+def test_reads_do_not_extend_the_ttl(make_cache, clock):
+    cache = make_cache(ttl_seconds=10)
+    fill(cache, clock, ["a"])
+    clock.advance(8)
+    assert cache.get("a") is not None
+
+    clock.advance(8)
+    assert cache.get("a") is None
+
+
+def test_entries_survive_reopening(make_cache, clock):
+    fill(make_cache(), clock, ["a"])
+
+    assert make_cache().get("a") == {"answer": "a"}
+
+
+def test_keys_are_canonical():
+    messages = [{"role": "user", "content": [{"type": "text", "text": "hi"}]}]
+    key = ResponseCache.make_key("m", "sys", messages, 100, None)
+
+    assert key == ResponseCache.make_key("m", "sys", [dict(reversed(messages[0].items()))], 100, [])
+    assert key != ResponseCache.make_key("m", "sys", messages, 101, None)
+    assert key != ResponseCache.make_key("m", "sys", messages, 100, None, tools=[{"name": "t"}])
+
+
+def test_identical_requests_skip_the_client(make_cache, fake_client):
+    cache = make_cache()
+    first = AnthropicChat(client=fake_client, cache=cache).send_message("hello", system="sys")
+
+    chat = AnthropicChat(client=fake_client, cache=cache)
+    second = chat.send_message("hello", system="sys")
+
+    assert second == first
+    assert len(fake_client.requests) == 1
+    assert chat.last_metrics["cached"] is True
+    # The cached answer still joins the conversation
+    assert chat.messages[1]["content"][0]["text"] == first["answer"]
+
+    chat.send_message("hello again", system="sys")
+    AnthropicChat(client=fake_client, cache=cache).send_message("hello", system="other")
+    assert len(fake_client.requests) == 3
+
+
+def test_use_cache_false_always_calls_the_client(make_cache, fake_client):
+    cache = make_cache()
+    for _ in range(2):
+        AnthropicChat(client=fake_client, cache=cache).send_message("hello", use_cache=False)
+
+    assert len(fake_client.requests) == 2
+    assert cache.stats()["entries"] == 0
@@ -0,0 +1,46 @@
+from chat_client import AnthropicChat
+
+
+def test_chunks_are_read_only_as_fast_as_they_are_consumed(fake_client):
+    chat = AnthropicChat(client=fake_client)
+    chunks = chat.stream_message("a fairly long question")
+
+    first = next(chunks)
+    produced_after_first = fake_client.streams[0].produced
+    rest = list(chunks)
+
+    assert produced_after_first == 1
+    assert first + "".join(rest) == "echo: a fairly long question"
+    assert chat.last_response["answer"] == first + "".join(rest)
+    assert fake_client.streams[0].closed
+
+
+def test_closing_early_leaves_no_response(fake_client):
+    chat = AnthropicChat(client=fake_client)
+    chat.send_message("first")
+    chunks = chat.stream_message("second question")
+
+    next(chunks)
+    chunks.close()
+
+    assert chat.last_response is None
+    assert fake_client.streams[0].closed
+    # The unfinished answer is not added to the conversation
+    assert [m["role"] for m in chat.messages] == ["user", "assistant", "user"]
+
+
+def test_sink_receives_chunks_without_console_output(fake_client, capsys):
+    received = []
+    chat = AnthropicChat(client=fake_client)
+
+    result = chat.send_message("hello", stream=True, sink=received.append)
+
+    assert received == ["echo", ": he", "llo"]
+    assert result["answer"] == "echo: hello"
+    assert capsys.readouterr().out == ""
+
+
+def test_echo_prints_the_stream(fake_client, capsys):
+    AnthropicChat(client=fake_client).send_message("hello", stream=True, echo=True)
+
+    assert capsys.readouterr().out == "Assistant: echo: hello\n"
@@ -0,0 +1,63 @@
+# fake_kubectl.py
+"""Stand-in for kubectl that replays recorded cluster state.
+
+Usage: python fake_kubectl.py --recordings DIR <kubectl args>
+
+DIR holds <kind>.json (the output of `kubectl get <kind> -A -o json`),
+optionally <kind>.watch.json (a JSON list of {"type", "object"} watch
+events) and top_pods.txt (the output of `kubectl top pods -A`). Point
+KubeStateProvider at it with
+kubectl=[sys.executable, "fake_kubectl.py", "--recordings", DIR].
+"""
+import json
+import os
+import sys
+import time
+
+
+def load(recordings, name, default=None):
+    path = os.path.join(recordings, name)
+    if not os.path.exists(path):
+        return default
+    with open(path, "r", encoding="utf-8") as f:
+        return f.read()
+
+
+def main(argv):
+    if len(argv) < 2 or argv[0] != "--recordings":
+        sys.exit("usage: fake_kubectl.py --recordings DIR <kubectl args>")
+    recordings, args = argv[1], argv[2:]
+
+    if args[:2] == ["top", "pods"]:
+        output = load(recordings, "top_pods.txt")
+        if output is None:
+            sys.stderr.write("error: Metrics API not available\n")
+            sys.exit(1)
+        sys.stdout.write(output)
+        return
+
+    if args[:1] != ["get"] or len(args) < 2:
+        sys.exit(f"fake_kubectl: unsupported command {args}")
+    kind = args[1]
+    items = json.loads(load(recordings, f"{kind}.json", '{"items": []}'))["items"]
+    if "-n" in args:
+        namespace = args[args.index("-n") + 1]
+        items = [i for i in items if i["metadata"].get("namespace") == namespace]
+
+    if "--watch" not in args:
+        json.dump({"apiVersion": "v1", "kind": "List", "items": items}, sys.stdout, indent=4)
+        sys.stdout.write("\n")
+        return
+
+    # Like kubectl: current objects as ADDED, then recorded changes, then stay open
+    events = [{"type": "ADDED", "object": item} for item in items]
+    events += json.loads(load(recordings, f"{kind}.watch.json", "[]"))
+    for event in events:
+        json.dump(event, sys.stdout, indent=4)
+        sys.stdout.write("\n")
+        sys.stdout.flush()
+    time.sleep(3600)
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,276 @@
+# Shared, cached view of cluster state for the kind_* tools
+import json
+import subprocess
+import threading
+import time
+
+WATCHED_KINDS = ("pods", "nodes", "events")
+
+
+def _object_key(obj):
+    metadata = obj["metadata"]
+    return metadata.get("namespace", ""), metadata["name"]
+
+
+class _Snapshot:
+    """In-memory copy of one resource kind, with pods indexed by namespace, node and phase."""
+
+    def __init__(self, kind):
+        self.kind = kind
+        self.items = {}
+        self.fetched_at = None
+        self.by_namespace = {}
+        self.by_node = {}
+        self.by_status = {}
+
+    def _index_fields(self, obj):
+        fields = [(self.by_namespace, obj["metadata"].get("namespace", ""))]
+        if self.kind == "pods":
+            fields.append((self.by_node, obj.get("spec", {}).get("nodeName", "")))
+            fields.append((self.by_status, obj.get("status", {}).get("phase", "")))
+        return fields
+
+    def upsert(self, obj):
+        key = _object_key(obj)
+        self.delete(obj)
+        self.items[key] = obj
+        for index, value in self._index_fields(obj):
+            index.setdefault(value, set()).add(key)
+
+    def delete(self, obj):
+        old = self.items.pop(_object_key(obj), None)
+        if old is None:
+            return
+        key = _object_key(old)
+        for index, value in self._index_fields(old):
+            index[value].discard(key)
+            if not index[value]:
+                del index[value]
+
+    def replace(self, items):
+        self.items.clear()
+        self.by_namespace.clear()
+        self.by_node.clear()
+        self.by_status.clear()
+        for obj in items:
+            self.upsert(obj)
+
+    def select(self, namespace=None, node=None, status=None):
+        keys = None
+        for index, value in ((self.by_namespace, namespace), (self.by_node, node), (self.by_status, status)):
+            if value is None:
+                continue
+            matches = index.get(value, set())
+            keys = set(matches) if keys is None else keys & matches
+        if keys is None:
+            return list(self.items.values())
+        return [self.items[key] for key in sorted(keys)]
+
+
+class KubeStateProvider:
+    """Answers the kind_* tools from one in-memory snapshot per resource kind.
+
+    Each kind is fetched with a single all-namespaces `kubectl get -o
+    json` and refreshed when older than ttl seconds. With watch=True a
+    background `kubectl get --watch --output-watch-events -o json` per
+    kind applies changes as they happen, and the TTL is only used while
+    a watch is down. kubectl may be a command list, so tests can point
+    it at a fake script (see fake_kubectl.py).
+
+    kubectl runs outside the lock that guards the snapshots, behind a
+    per-kind (and, for top, per-namespace) fetch lock: concurrent calls
+    for different kinds fetch in parallel, while concurrent calls for the
+    same kind share one fetch.
+    """
+
+    def __init__(self, kubectl="kubectl", ttl=10.0, watch=False, timeout=30.0):
+        self.kubectl = [kubectl] if isinstance(kubectl, str) else list(kubectl)
+        self.ttl = ttl
+        self.timeout = timeout
+        self._snapshots = {kind: _Snapshot(kind) for kind in WATCHED_KINDS}
+        self._lock = threading.RLock()
+        self._fetch_locks = {kind: threading.Lock() for kind in WATCHED_KINDS}
+        self._top_cache = {}
+        self._top_locks = {}
+        self._watchers = {}
+        self._watch_processes = {}
+        self._synced = set()
+        self._stopping = threading.Event()
+        self.fetches = 0
+        if watch:
+            self.start_watch()
+
+    def _run(self, args, check=True):
+        with self._lock:
+            self.fetches += 1
+        return subprocess.run(
+            self.kubectl + args, capture_output=True, text=True, check=check, timeout=self.timeout
+        )
+
+    def _fresh(self, snapshot):
+        if snapshot.fetched_at is None:
+            return False
+        watcher = self._watchers.get(snapshot.kind)
+        if watcher is not None and watcher.is_alive() and snapshot.kind in self._synced:
+            return True
+        return time.monotonic() - snapshot.fetched_at < self.ttl
+
+    def _snapshot(self, kind):
+        snapshot = self._snapshots[kind]
+        with self._fetch_locks[kind]:
+            with self._lock:
+                if self._fresh(snapshot):
+                    return snapshot
+            result = self._run(["get", kind, "-A", "-o", "json"])
+            items = json.loads(result.stdout)["items"]
+            with self._lock:
+                # A watch that synced while this list was in flight is newer than it
+                if self._fresh(snapshot):
+                    return snapshot
+                snapshot.replace(items)
+                snapshot.fetched_at = time.monotonic()
+        return snapshot
+
+    def refresh(self):
+        """Drop every cached snapshot so the next call refetches."""
+        with self._lock:
+            for snapshot in self._snapshots.values():
+                snapshot.fetched_at = None
+            self._top_cache.clear()
+
+    def pods(self, namespace="all", node=None, status=None):
+        """Raw pod objects, filtered through the namespace/node/phase indexes."""
+        snapshot = self._snapshot("pods")
+        with self._lock:
+            return snapshot.select(None if namespace == "all" else namespace, node, status)
+
+    def nodes(self):
+        snapshot = self._snapshot("nodes")
+        with self._lock:
+            return snapshot.select()
+
+    def events(self, namespace="all"):
+        """Raw event objects, oldest first (like --sort-by=.lastTimestamp)."""
+        snapshot = self._snapshot("events")
+        with self._lock:
+            events = snapshot.select(None if namespace == "all" else namespace)
+        return sorted(events, key=lambda e: e.get("lastTimestamp") or e.get("eventTime") or "")
+
+    def top_pods(self, namespace="all"):
+        """(returncode, stdout) of `kubectl top pods`, cached for ttl seconds.
+
+        Metrics cannot be watched, so this is always TTL-cached.
+        """
+        with self._lock:
+            fetch_lock = self._top_locks.setdefault(namespace, threading.Lock())
+        with fetch_lock:
+            with self._lock:
+                cached = self._top_cache.get(namespace)
+                if cached is not None and time.monotonic() - cached[0] < self.ttl:
+                    return cached[1]
+            scope = ["-A"] if namespace == "all" else ["-n", namespace]
+            result = self._run(["top", "pods"] + scope, check=False)
+            value = (result.returncode, result.stdout)
+            with self._lock:
+                self._top_cache[namespace] = (time.monotonic(), value)
+        return value
+
+    # Watch mode
+
+    def start_watch(self):
+        self._stopping.clear()
+        for kind in WATCHED_KINDS:
+            if kind not in self._watchers or not self._watchers[kind].is_alive():
+                thread = threading.Thread(target=self._watch_loop, args=(kind,), daemon=True, name=f"kube-watch-{kind}")
+                self._watchers[kind] = thread
+                thread.start()
+
+    def stop_watch(self):
+        self._stopping.set()
+        with self._lock:
+            processes = list(self._watch_processes.values())
+        for process in processes:
+            if process.poll() is None:
+                process.terminate()
+        for thread in self._watchers.values():
+            thread.join(timeout=5)
+        self._watchers.clear()
+        self._watch_processes.clear()
+
+    def _watch_loop(self, kind, retry_delay=5.0):
+        while not self._stopping.is_set():
+            process = None
+            try:
+                # List first so the snapshot is complete before any events arrive
+                with self._lock:
+                    self._snapshots[kind].fetched_at = None
+                self._snapshot(kind)
+                process = subprocess.Popen(
+                    self.kubectl + ["get", kind, "-A", "--watch", "--output-watch-events", "-o", "json"],
+                    stdout=subprocess.PIPE,
+                    stderr=subprocess.DEVNULL,
+                    text=True,
+                )
+                with self._lock:
+                    # stop_watch may have collected the processes while this one was starting
+                    if self._stopping.is_set():
+                        break
+                    self._watch_processes[kind] = process
+                    self._synced.add(kind)
+                for event in _iter_json_stream(process.stdout):
+                    self._apply_event(kind, event)
+                process.wait()
+            except Exception as e:
+                print(f"Watch on {kind} failed: {e}")
+            finally:
+                if process is not None:
+                    if process.poll() is None:
+                        process.kill()
+                    process.wait()
+                    process.stdout.close()
+                with self._lock:
+                    self._synced.discard(kind)
+                    if self._watch_processes.get(kind) is process:
+                        del self._watch_processes[kind]
+            # The snapshot falls back to TTL refreshes until the watch is back
+            self._stopping.wait(retry_delay)
+
+    def _apply_event(self, kind, event):
+        obj = event.get("object")
+        if not obj or "metadata" not in obj:
+            return
+        snapshot = self._snapshots[kind]
+        with self._lock:
+            if event.get("type") == "DELETED":
+                snapshot.delete(obj)
+            elif event.get("type") in ("ADDED", "MODIFIED"):
+                snapshot.upsert(obj)
+            snapshot.fetched_at = time.monotonic()
+
+
+def _iter_json_stream(lines):
+    """Yield each JSON document from lines of concatenated, possibly pretty-printed, documents.
+
+    kubectl prints every watch event as an indented object, so decoding
+    is only attempted on an unindented closing line instead of on every
+    line read.
+    """
+    decoder = json.JSONDecoder()
+    buffer = []
+    for line in lines:
+        buffer.append(line)
+        if line[:1].isspace() or not line.rstrip().endswith("}"):
+            continue
+        text = "".join(buffer)
+        position = 0
+        while True:
+            while position < len(text) and text[position].isspace():
+                position += 1
+            if position == len(text):
+                break
+            try:
+                document, position = decoder.raw_decode(text, position)
+            except json.JSONDecodeError:
+                break
+            yield document
+        buffer = [text[position:]] if position < len(text) else []
@@ -0,0 +1,143 @@
+import json
+import os
+import sys
+import threading
+import time
+
+import pytest
+
+from kube_state import KubeStateProvider, _iter_json_stream
+
+FAKE_KUBECTL = os.path.join(os.path.dirname(__file__), "fake_kubectl.py")
+
+
+def pod(name, namespace="default", node="node-1", phase="Running"):
+    return {"metadata": {"name": name, "namespace": namespace}, "spec": {"nodeName": node}, "status": {"phase": phase}}
+
+
+def event(name, timestamp, namespace="default"):
+    return {"metadata": {"name": name, "namespace": namespace}, "lastTimestamp": timestamp, "reason": name}
+
+
+PODS = [
+    pod("web-1"),
+    pod("web-2", node="node-2"),
+    pod("db-1", namespace="data", node="node-2", phase="Pending"),
+    pod("job-1", namespace="data", phase="Succeeded"),
+]
+
+
+@pytest.fixture
+def recordings(tmp_path):
+    def write(name, value):
+        with open(tmp_path / name, "w", encoding="utf-8") as f:
+            f.write(value if isinstance(value, str) else json.dumps(value))
+
+    write("pods.json", {"items": PODS})
+    write("nodes.json", {"items": [{"metadata": {"name": "node-1"}}, {"metadata": {"name": "node-2"}}]})
+    write("events.json", {"items": [event("late", "2024-01-02T00:00:00Z"), event("early", "2024-01-01T00:00:00Z")]})
+    write("top_pods.txt", "NAMESPACE NAME CPU(cores) MEMORY(bytes)\ndefault web-1 5m 20Mi\n")
+    write.path = tmp_path
+    return write
+
+
+def provider(recordings, **kwargs):
+    return KubeStateProvider(kubectl=[sys.executable, FAKE_KUBECTL, "--recordings", str(recordings.path)], **kwargs)
+
+
+def names(objects):
+    return sorted(obj["metadata"]["name"] for obj in objects)
+
+
+def wait_for(condition, timeout=10.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if condition():
+            return True
+        time.sleep(0.05)
+    return False
+
+
+def test_pods_are_filtered_through_the_indexes(recordings):
+    state = provider(recordings)
+
+    assert names(state.pods()) == ["db-1", "job-1", "web-1", "web-2"]
+    assert names(state.pods(namespace="data")) == ["db-1", "job-1"]
+    assert names(state.pods(node="node-2")) == ["db-1", "web-2"]
+    assert names(state.pods(namespace="data", status="Pending")) == ["db-1"]
+    assert state.pods(namespace="missing") == []
+    # Every query was answered from one fetch
+    assert state.fetches == 1
+
+
+def test_snapshots_expire_after_the_ttl(recordings):
+    state = provider(recordings, ttl=0.2)
+    state.nodes()
+    state.nodes()
+    assert state.fetches == 1
+
+    time.sleep(0.3)
+    state.nodes()
+    assert state.fetches == 2
+
+    state.refresh()
+    state.nodes()
+    assert state.fetches == 3
+
+
+def test_events_are_sorted_oldest_first(recordings):
+    assert [e["reason"] for e in provider(recordings).events()] == ["early", "late"]
+
+
+def test_top_pods_is_cached_and_reports_failures(recordings):
+    state = provider(recordings)
+    returncode, output = state.top_pods()
+    state.top_pods()
+
+    assert returncode == 0 and "web-1" in output
+    assert state.fetches == 1
+
+    os.remove(recordings.path / "top_pods.txt")
+    assert state.top_pods(namespace="default")[0] == 1
+
+
+def test_concurrent_calls_share_one_fetch(recordings):
+    state = provider(recordings)
+    threads = [threading.Thread(target=state.pods) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert state.fetches == 1
+
+
+def test_watch_applies_changes_without_refetching(recordings):
+    recordings(
+        "pods.watch.json",
+        [
+            {"type": "DELETED", "object": PODS[0]},
+            {"type": "MODIFIED", "object": pod("db-1", namespace="data", node="node-2", phase="Running")},
+            {"type": "ADDED", "object": pod("web-3")},
+        ],
+    )
+    state = provider(recordings, ttl=0.0, watch=True)
+    try:
+        assert wait_for(lambda: "web-3" in names(state.pods()))
+        fetches = state.fetches
+
+        assert names(state.pods()) == ["db-1", "job-1", "web-2", "web-3"]
+        assert names(state.pods(status="Pending")) == []
+        assert names(state.pods(node="node-1")) == ["job-1", "web-3"]
+        # With the watch synced, ttl=0 no longer forces a fetch
+        assert state.fetches == fetches
+    finally:
+        state.stop_watch()
+
+    assert not state._watch_processes
+
+
+def test_json_stream_decodes_pretty_printed_and_compact_documents():
+    lines = (json.dumps({"a": 1}, indent=4) + "\n" + json.dumps({"b": {"c": [1, 2]}}) + "\n" + "{\"d\": 3}{\"e\": 4}\n")
+
+    assert list(_iter_json_stream(lines.splitlines(keepends=True))) == [{"a": 1}, {"b": {"c": [1, 2]}}, {"d": 3}, {"e": 4}]
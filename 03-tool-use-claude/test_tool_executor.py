@@ -0,0 +1,113 @@
+import json
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from tool_executor import ToolExecutor
+
+
+def tool_use(id, name, **tool_input):
+    return SimpleNamespace(type="tool_use", id=id, name=name, input=tool_input)
+
+
+def message(*blocks):
+    return SimpleNamespace(content=[SimpleNamespace(type="text", text="calling tools"), *blocks])
+
+
+def invocation(name, **arguments):
+    return {"name": name, "arguments": json.dumps(arguments)}
+
+
+def run_tool(name, tool_input):
+    if name == "sleep":
+        time.sleep(tool_input["seconds"])
+        return tool_input["seconds"]
+    if name == "fail":
+        raise ValueError("tool failed")
+    return {"name": name, "input": tool_input}
+
+
+@pytest.fixture
+def executor():
+    executor = ToolExecutor(run_tool, max_workers=4, default_timeout=5.0)
+    yield executor
+    executor.shutdown()
+
+
+def test_results_keep_the_tool_use_order_and_run_concurrently(executor):
+    start = time.monotonic()
+    blocks = executor.run_tools(
+        message(tool_use("a", "sleep", seconds=0.3), tool_use("b", "sleep", seconds=0.1), tool_use("c", "sleep", seconds=0.2))
+    )
+
+    assert time.monotonic() - start < 0.5
+    assert [block["tool_use_id"] for block in blocks] == ["a", "b", "c"]
+    assert [json.loads(block["content"]) for block in blocks] == [0.3, 0.1, 0.2]
+    assert not any(block["is_error"] for block in blocks)
+
+
+def test_errors_and_timeouts_become_error_results():
+    executor = ToolExecutor(run_tool, default_timeout=5.0, timeouts={"sleep": 0.1})
+    try:
+        blocks = executor.run_tools(message(tool_use("a", "fail"), tool_use("b", "sleep", seconds=1.0), tool_use("c", "echo")))
+    finally:
+        executor.shutdown()
+
+    assert blocks[0] == {"type": "tool_result", "tool_use_id": "a", "content": "Error: tool failed", "is_error": True}
+    assert blocks[1]["content"] == "Error: Tool sleep timed out"
+    assert not blocks[2]["is_error"]
+
+
+def test_batch_tool_invocations_share_the_pool(executor):
+    start = time.monotonic()
+    blocks = executor.run_tools(
+        message(
+            tool_use("a", "batch_tool", invocations=[invocation("sleep", seconds=0.3), invocation("echo", x=1)]),
+            tool_use("b", "sleep", seconds=0.3),
+        )
+    )
+
+    assert time.monotonic() - start < 0.5
+    assert json.loads(blocks[0]["content"]) == [
+        {"name": "sleep", "output": 0.3},
+        {"name": "echo", "output": {"name": "echo", "input": {"x": 1}}},
+    ]
+
+
+def test_bad_batch_arguments_only_fail_their_invocation(executor):
+    output = executor.run_batch([{"name": "echo", "arguments": "{not json"}, invocation("echo", x=1), {"arguments": "{}"}])
+
+    assert output[0]["name"] == "echo" and "error" in output[0]
+    assert output[1] == {"name": "echo", "output": {"name": "echo", "input": {"x": 1}}}
+    assert output[2]["name"] is None and "error" in output[2]
+
+
+def test_nested_fan_out_does_not_starve_the_pool():
+    executor = None
+
+    def aggregating_tool(name, tool_input):
+        if name == "aggregate":
+            return [entry["output"] for entry in executor.run_batch([invocation("echo", i=i) for i in range(3)])]
+        return tool_input["i"]
+
+    executor = ToolExecutor(aggregating_tool, max_workers=1, default_timeout=2.0)
+    try:
+        blocks = executor.run_tools(message(tool_use("a", "aggregate"), tool_use("b", "aggregate")))
+    finally:
+        executor.shutdown()
+
+    assert [json.loads(block["content"]) for block in blocks] == [[0, 1, 2], [0, 1, 2]]
+
+
+def test_calls_outside_a_tool_use_the_main_pool(executor):
+    names = []
+
+    def record_thread(name, tool_input):
+        names.append(threading.current_thread().name)
+
+    executor._run_tool = record_thread
+    executor.run_batch([invocation("echo")])
+
+    assert names[0].startswith("tool_") and not names[0].startswith("tool-nested")
@@ -0,0 +1,127 @@
+# Concurrent execution of the tool_use blocks in one assistant turn
+import json
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+
+
+class ToolExecutor:
+    """Runs independent tool calls concurrently on a shared thread pool.
+
+    run_tool(name, tool_input) is the dispatch function that executes a
+    single tool (the notebook's run_tool). Each call gets a timeout,
+    timeouts[name] or default_timeout seconds counted from submission, so
+    a turn takes about as long as its slowest tool. A timed-out call is
+    reported as an error; its thread is left to finish in the background.
+
+    A tool may fan out to other tools through run_batch. Calls submitted
+    from inside a running tool go to a second pool, so an aggregating tool
+    never waits on workers that are all busy running aggregating tools.
+    """
+
+    def __init__(self, run_tool, max_workers=8, default_timeout=30.0, timeouts=None, batch_tool_name="batch_tool"):
+        self._run_tool = run_tool
+        self.default_timeout = default_timeout
+        self.timeouts = timeouts or {}
+        self.batch_tool_name = batch_tool_name
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="tool")
+        self._nested_executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="tool-nested")
+        self._local = threading.local()
+
+    def _call(self, name, tool_input):
+        self._local.in_tool = True
+        try:
+            return self._run_tool(name, tool_input)
+        finally:
+            self._local.in_tool = False
+
+    def _submit(self, name, tool_input):
+        timeout = self.timeouts.get(name, self.default_timeout)
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        executor = self._nested_executor if getattr(self._local, "in_tool", False) else self._executor
+        return executor.submit(self._call, name, tool_input), name, deadline
+
+    @staticmethod
+    def _result(pending):
+        """Wait for a submitted call; raises its exception, or TimeoutError past the deadline."""
+        future, name, deadline = pending
+        remaining = None if deadline is None else max(0.0, deadline - time.monotonic())
+        try:
+            return future.result(timeout=remaining)
+        except FutureTimeoutError:
+            future.cancel()
+            raise TimeoutError(f"Tool {name} timed out")
+
+    def _submit_batch(self, invocations):
+        """Submit each invocation of a batch_tool call; bad arguments become a failed future."""
+        pending = []
+        for invocation in invocations:
+            try:
+                pending.append(self._submit(invocation["name"], json.loads(invocation["arguments"])))
+            except Exception as e:
+                failed = Future()
+                failed.set_exception(e)
+                pending.append((failed, invocation.get("name"), None))
+        return pending
+
+    def _batch_result(self, pending):
+        batch_output = []
+        for entry in pending:
+            name = entry[1]
+            try:
+                batch_output.append({"name": name, "output": self._result(entry)})
+            except Exception as e:
+                batch_output.append({"name": name, "error": str(e)})
+        return batch_output
+
+    def run_batch(self, invocations):
+        """Run batch_tool invocations concurrently; results keep the invocation order."""
+        return self._batch_result(self._submit_batch(invocations))
+
+    def run_tools(self, message):
+        """Execute every tool_use block of message concurrently.
+
+        Returns tool_result blocks in the order of the tool_use blocks,
+        each carrying its tool_use_id. batch_tool calls are expanded so
+        their invocations share the pool instead of occupying a worker
+        while they wait.
+        """
+        tool_requests = [
+            block for block in message.content if block.type == "tool_use"
+        ]
+
+        pending = {}
+        for tool_request in tool_requests:
+            if tool_request.name == self.batch_tool_name:
+                pending[tool_request.id] = self._submit_batch(tool_request.input.get("invocations", []))
+            else:
+                pending[tool_request.id] = self._submit(tool_request.name, tool_request.input)
+
+        tool_result_blocks = []
+        for tool_request in tool_requests:
+            try:
+                if tool_request.name == self.batch_tool_name:
+                    tool_output = self._batch_result(pending[tool_request.id])
+                else:
+                    tool_output = self._result(pending[tool_request.id])
+                tool_result_block = {
+                    "type": "tool_result",
+                    "tool_use_id": tool_request.id,
+                    "content": json.dumps(tool_output),
+                    "is_error": False,
+                }
+            except Exception as e:
+                tool_result_block = {
+                    "type": "tool_result",
+                    "tool_use_id": tool_request.id,
+                    "content": f"Error: {e}",
+                    "is_error": True,
+                }
+
+            tool_result_blocks.append(tool_result_block)
+
+        return tool_result_blocks
+
+    def shutdown(self, wait=False):
+        self._executor.shutdown(wait=wait)
+        self._nested_executor.shutdown(wait=wait)
@@ -0,0 +1,251 @@
+# Approximate nearest-neighbour index (IVF with k-means coarse quantization)
+import os
+import time
+import numpy as np
+from typing import Optional, Any, Callable, List, Dict, Hashable, Tuple
+
+from hybrid_retriever import default_document_key
+from index_storage import write_array
+from vector_index import VectorIndex
+
+
+class IVFIndex(VectorIndex):
+    """VectorIndex that only scans the `nprobe` closest of `n_lists` k-means cells.
+
+    Until `train_size` vectors have been added (or `train()` is called)
+    searches fall back to the exact brute-force scan. After training,
+    new vectors are assigned to their nearest cell on insert.
+    """
+
+    def __init__(
+        self,
+        distance_metric: str = "cosine",
+        embedding_fn=None,
+        n_lists: int = 100,
+        nprobe: int = 8,
+        train_size: Optional[int] = None,
+        kmeans_iters: int = 20,
+        seed: int = 0,
+        filter_fields: Optional[List[str]] = None,
+    ):
+        super().__init__(
+            distance_metric=distance_metric, embedding_fn=embedding_fn, filter_fields=filter_fields
+        )
+        if n_lists <= 0 or nprobe <= 0:
+            raise ValueError("n_lists and nprobe must be positive integers.")
+        self.n_lists = n_lists
+        self.nprobe = nprobe
+        self._train_size = train_size if train_size is not None else 40 * n_lists
+        self._kmeans_iters = kmeans_iters
+        self._rng = np.random.default_rng(seed)
+        self._centroids: Optional[np.ndarray] = None
+        self._lists: List[List[int]] = []
+        self._list_arrays: List[Optional[np.ndarray]] = []
+
+    @property
+    def is_trained(self) -> bool:
+        return self._centroids is not None
+
+    def train(self, sample_size: Optional[int] = None):
+        """Run k-means over the stored vectors and rebuild the inverted lists."""
+        if len(self) == 0:
+            raise ValueError("Cannot train an empty index.")
+        n_lists = min(self.n_lists, len(self))
+        sample_size = sample_size or 256 * n_lists
+        data = self._kmeans_space(self.vectors)
+        if len(data) > sample_size:
+            data = data[self._rng.choice(len(data), sample_size, replace=False)]
+
+        centroids = data[self._rng.choice(len(data), n_lists, replace=False)].copy()
+        for _ in range(self._kmeans_iters):
+            assignment = self._nearest_centroids(data, centroids, 1)[:, 0]
+            counts = np.bincount(assignment, minlength=n_lists)
+            order = np.argsort(assignment, kind="stable")
+            starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+            non_empty = counts > 0
+            sums = np.add.reduceat(data[order], starts[non_empty], axis=0)
+            centroids[non_empty] = sums / counts[non_empty, np.newaxis]
+            # Re-seed empty cells with random points so every list stays usable
+            empty = np.flatnonzero(~non_empty)
+            centroids[empty] = data[self._rng.integers(len(data), size=len(empty))]
+            if self._distance_metric == "cosine":
+                centroids = self._kmeans_space(centroids)
+
+        self._centroids = centroids.astype(np.float32)
+        assignment = self._nearest_centroids(self._kmeans_space(self.vectors), self._centroids, 1)[:, 0]
+        self._lists = [[] for _ in range(n_lists)]
+        for row, c in enumerate(assignment):
+            self._lists[c].append(row)
+        self._list_arrays = [None] * n_lists
+
+    def add_vector(self, vector, document: Dict[str, Any]):
+        super().add_vector(vector, document)
+        if self.is_trained:
+            row = len(self) - 1
+            point = self._kmeans_space(self.vectors[row : row + 1])
+            c = self._nearest_centroids(point, self._centroids, 1)[0, 0]
+            self._lists[c].append(row)
+            self._list_arrays[c] = None
+
+    def search(
+        self,
+        query: Any,
+        k: int = 1,
+        nprobe: Optional[int] = None,
+        filter: Optional[Dict[str, Any]] = None,
+    ) -> List[Tuple[Dict[str, Any], float]]:
+        if len(self) == 0:
+            return []
+        if not self.is_trained:
+            if len(self) < self._train_size:
+                return super().search(query, k, filter=filter)
+            self.train()
+
+        query_vector = self._prepare_query(query)
+        if k <= 0:
+            raise ValueError("k must be a positive integer.")
+
+        nprobe = min(nprobe or self.nprobe, len(self._lists))
+        allowed = self._filter_rows(filter)
+        if allowed is not None and len(allowed) <= len(self) * nprobe / len(self._lists):
+            # The filter leaves fewer rows than the probed cells hold: scan them exactly
+            return super().search(query_vector, k, filter=filter)
+
+        probe = self._nearest_centroids(
+            self._kmeans_space(query_vector[np.newaxis, :]), self._centroids, nprobe
+        )[0]
+        rows = np.concatenate([self._list_array(c) for c in probe])
+        if allowed is not None:
+            rows = rows[np.isin(rows, allowed, assume_unique=True)]
+        if len(rows) == 0:
+            return []
+
+        distances = self._distances(query_vector, rows)
+        top = self._top_k(distances, k)
+        return [(self.documents[rows[i]], float(distances[i])) for i in top]
+
+    def search_many(
+        self,
+        queries: Any,
+        k: int = 1,
+        batch_size: int = 256,
+        nprobe: Optional[int] = None,
+        filter: Optional[Dict[str, Any]] = None,
+    ) -> List[List[Tuple[Dict[str, Any], float]]]:
+        return [self.search(q, k, nprobe=nprobe, filter=filter) for q in queries]
+
+    def save(self, path: str):
+        """Save like VectorIndex, plus the centroids and each vector's list id."""
+        super().save(path)
+        if self.is_trained:
+            write_array(os.path.join(path, "centroids.f32"), self._centroids)
+            assignment = np.empty(len(self), dtype=np.int32)
+            for c, rows in enumerate(self._lists):
+                assignment[rows] = c
+            write_array(os.path.join(path, "assignment.i32"), assignment)
+
+    def _restore(self, path: str, meta: Dict[str, Any]):
+        super()._restore(path, meta)
+        centroids_path = os.path.join(path, "centroids.f32")
+        if not os.path.exists(centroids_path):
+            return
+        self._centroids = np.fromfile(centroids_path, dtype=np.float32).reshape(-1, self._vector_dim)
+        assignment = np.fromfile(os.path.join(path, "assignment.i32"), dtype=np.int32)
+        order = np.argsort(assignment, kind="stable")
+        bounds = np.searchsorted(assignment[order], np.arange(len(self._centroids) + 1))
+        self._list_arrays = [order[bounds[c] : bounds[c + 1]] for c in range(len(self._centroids))]
+        self._lists = [rows.tolist() for rows in self._list_arrays]
+
+    def _list_array(self, c: int) -> np.ndarray:
+        if self._list_arrays[c] is None:
+            self._list_arrays[c] = np.asarray(self._lists[c], dtype=np.int64)
+        return self._list_arrays[c]
+
+    def _kmeans_space(self, vectors: np.ndarray) -> np.ndarray:
+        """Cosine indexes cluster on the unit sphere; euclidean ones as-is."""
+        if self._distance_metric != "cosine":
+            return vectors
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        return vectors / np.where(norms == 0, 1.0, norms)
+
+    def _nearest_centroids(
+        self, points: np.ndarray, centroids: np.ndarray, n: int, chunk: int = 4096
+    ) -> np.ndarray:
+        """Indices of the n nearest centroids for each point, closest first."""
+        centroid_sq = (centroids ** 2).sum(axis=1)
+        out = np.empty((len(points), n), dtype=np.int64)
+        for start in range(0, len(points), chunk):
+            block = points[start : start + chunk]
+            # ||x||^2 is constant per row, so it does not affect the ranking
+            scores = centroid_sq[np.newaxis, :] - 2 * (block @ centroids.T)
+            if n == 1:
+                out[start : start + chunk, 0] = scores.argmin(axis=1)
+                continue
+            if n < scores.shape[1]:
+                part = np.argpartition(scores, n - 1, axis=1)[:, :n]
+            else:
+                part = np.tile(np.arange(scores.shape[1]), (len(block), 1))
+            order = np.argsort(np.take_along_axis(scores, part, axis=1), axis=1)
+            out[start : start + chunk] = np.take_along_axis(part, order, axis=1)
+        return out
+
+    def __repr__(self) -> str:
+        return f"IVFIndex(count={len(self)}, dim={self._vector_dim}, metric='{self._distance_metric}', n_lists={self.n_lists}, nprobe={self.nprobe}, trained={self.is_trained})"
+
+
+def recall_at_k(
+    exact_index: VectorIndex,
+    approx_index: VectorIndex,
+    queries: Any,
+    k: int = 10,
+    document_key: Callable[[Dict[str, Any]], Hashable] = default_document_key,
+    **search_kwargs,
+) -> float:
+    """Mean fraction of the exact top-k documents that the approximate index returns.
+
+    Documents are matched by `document_key`, not identity: a loaded index
+    parses a fresh dict on every access.
+    """
+    total = 0.0
+    for query in queries:
+        expected = {document_key(doc) for doc, _ in exact_index.search(query, k)}
+        found = {document_key(doc) for doc, _ in approx_index.search(query, k, **search_kwargs)}
+        total += len(expected & found) / len(expected) if expected else 1.0
+    return total / len(queries) if len(queries) else 1.0
+
+
+def benchmark(n: int = 50000, dim: int = 128, n_queries: int = 100, k: int = 10, seed: int = 0):
+    """Print recall@k and latency of IVFIndex against the exact index on clustered random data."""
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(200, dim))
+    data = (centers[rng.integers(len(centers), size=n)] + 0.3 * rng.normal(size=(n, dim))).astype(np.float32)
+    queries = (centers[rng.integers(len(centers), size=n_queries)] + 0.3 * rng.normal(size=(n_queries, dim))).astype(np.float32)
+
+    exact = VectorIndex()
+    ivf = IVFIndex(n_lists=int(np.sqrt(n)))
+    for i, vector in enumerate(data):
+        document = {"content": f"doc {i}"}
+        exact.add_vector(vector, document)
+        ivf.add_vector(vector, document)
+
+    start = time.perf_counter()
+    ivf.train()
+    print(f"Trained {ivf.n_lists} lists in {time.perf_counter() - start:.2f}s")
+
+    start = time.perf_counter()
+    for query in queries:
+        exact.search(query, k)
+    exact_ms = (time.perf_counter() - start) / n_queries * 1000
+    print(f"exact          recall@{k}=1.000  {exact_ms:.2f} ms/query")
+
+    for nprobe in [1, 2, 4, 8, 16, 32]:
+        start = time.perf_counter()
+        for query in queries:
+            ivf.search(query, k, nprobe=nprobe)
+        ivf_ms = (time.perf_counter() - start) / n_queries * 1000
+        recall = recall_at_k(exact, ivf, queries, k, nprobe=nprobe)
+        print(f"ivf nprobe={nprobe:<3} recall@{k}={recall:.3f}  {ivf_ms:.2f} ms/query")
+
+
+if __name__ == "__main__":
+    benchmark()
@@ -0,0 +1,410 @@
+# BM25Index implementation (inverted index with MaxScore top-k)
+import heapq
+import math
+import os
+import re
+from array import array
+from bisect import bisect_left
+from collections import Counter
+from typing import Callable, Optional, Any, List, Dict, Tuple
+
+from index_storage import (
+    LazyDocuments,
+    LazyPostings,
+    copy_array,
+    map_array,
+    read_json,
+    write_array,
+    write_documents,
+    write_json,
+)
+from metadata_filter import MetadataIndex
+
+
+class BM25Index:
+    """BM25 search over an incrementally maintained inverted index.
+
+    Corpus statistics (document frequencies, total length) are updated
+    on every add/remove, and IDF is computed lazily per query term, so
+    writes never trigger a full rebuild. Document ids are positions in
+    `documents`; removed documents leave a `None` slot behind and are
+    flagged in a one-byte-per-id tombstone array, so searches skip them
+    without reading `documents` (a memory-mapped sidecar once loaded).
+    """
+
+    def __init__(
+        self,
+        k1: float = 1.5,
+        b: float = 0.75,
+        tokenizer: Optional[Callable[[str], List[str]]] = None,
+        filter_fields: Optional[List[str]] = None,
+    ):
+        self.documents: List[Optional[Dict[str, Any]]] = []
+        self._doc_len: List[int] = []
+        self._deleted = array("B")
+        # term -> (sorted doc ids, term frequencies), appended at add time
+        self._postings: Dict[str, Tuple[List[int], List[int]]] = {}
+        self._doc_freqs: Dict[str, int] = {}
+        # Per-term max tf and min doc length, used for MaxScore upper bounds.
+        # Removals leave them untouched, which only loosens the bound.
+        self._max_term_freq: Dict[str, int] = {}
+        self._min_doc_len: Dict[str, int] = {}
+        self._dead_postings: Dict[str, int] = {}
+        self._total_doc_len: int = 0
+        self._live_count: int = 0
+        self._idf: Dict[str, float] = {}
+        self._metadata = MetadataIndex(filter_fields)
+
+        self.k1 = k1
+        self.b = b
+        self._tokenizer = tokenizer if tokenizer else self._default_tokenizer
+
+    def _default_tokenizer(self, text: str) -> List[str]:
+        text = text.lower()
+        tokens = re.split(r"\W+", text)
+        return [token for token in tokens if token]
+
+    def _update_stats_add(self, doc_tokens: List[str]):
+        doc_id = len(self._doc_len)
+        doc_length = len(doc_tokens)
+        self._doc_len.append(doc_length)
+        self._deleted.append(0)
+        self._total_doc_len += doc_length
+        self._live_count += 1
+
+        for token, term_freq in Counter(doc_tokens).items():
+            if token not in self._postings:
+                self._postings[token] = ([], [])
+                self._max_term_freq[token] = term_freq
+                self._min_doc_len[token] = doc_length
+            doc_ids, term_freqs = self._postings[token]
+            doc_ids.append(doc_id)
+            term_freqs.append(term_freq)
+            self._doc_freqs[token] = self._doc_freqs.get(token, 0) + 1
+            self._max_term_freq[token] = max(self._max_term_freq[token], term_freq)
+            self._min_doc_len[token] = min(self._min_doc_len[token], doc_length)
+
+        # N changed, so every cached IDF is stale
+        self._idf = {}
+
+    def _update_stats_remove(self, doc_id: int, doc_tokens: List[str]):
+        self._total_doc_len -= self._doc_len[doc_id]
+        self._live_count -= 1
+
+        for token in set(doc_tokens):
+            self._doc_freqs[token] -= 1
+            if self._doc_freqs[token] == 0:
+                del self._doc_freqs[token]
+                del self._postings[token]
+                del self._max_term_freq[token]
+                del self._min_doc_len[token]
+                self._dead_postings.pop(token, None)
+                continue
+            # Postings are compacted once dead entries outnumber live ones,
+            # keeping removal amortized O(1) per posting
+            dead = self._dead_postings.get(token, 0) + 1
+            if dead > self._doc_freqs[token]:
+                self._compact_postings(token)
+            else:
+                self._dead_postings[token] = dead
+
+        self._idf = {}
+
+    def _compact_postings(self, term: str):
+        doc_ids, term_freqs = self._postings[term]
+        live = [
+            (doc_id, term_freq)
+            for doc_id, term_freq in zip(doc_ids, term_freqs)
+            if not self._deleted[doc_id]
+        ]
+        self._postings[term] = ([doc_id for doc_id, _ in live], [tf for _, tf in live])
+        self._dead_postings.pop(term, None)
+
+    @property
+    def _avg_doc_len(self) -> float:
+        return self._total_doc_len / self._live_count if self._live_count else 0.0
+
+    def _get_idf(self, term: str) -> float:
+        idf_score = self._idf.get(term)
+        if idf_score is None:
+            N = self._live_count
+            freq = self._doc_freqs[term]
+            idf_score = math.log(((N - freq + 0.5) / (freq + 0.5)) + 1)
+            self._idf[term] = idf_score
+        return idf_score
+
+    def _term_score(
+        self, idf: float, term_freq: int, doc_length: int, avg_doc_len: float
+    ) -> float:
+        numerator = idf * term_freq * (self.k1 + 1)
+        denominator = term_freq + self.k1 * (
+            1 - self.b + self.b * (doc_length / avg_doc_len)
+        )
+        return numerator / (denominator + 1e-9)
+
+    def _term_upper_bound(self, term: str) -> float:
+        """Highest contribution `term` can make to any live document's score."""
+        return self._term_score(
+            self._get_idf(term),
+            self._max_term_freq[term],
+            self._min_doc_len[term],
+            self._avg_doc_len,
+        )
+
+    def add_document(self, document: Dict[str, Any]) -> int:
+        """Index a document and return its doc id."""
+        if not isinstance(document, dict):
+            raise TypeError("Document must be a dictionary.")
+        if "content" not in document:
+            raise ValueError(
+                "Document dictionary must contain a 'content' key."
+            )
+
+        content = document.get("content", "")
+        if not isinstance(content, str):
+            raise TypeError("Document 'content' must be a string.")
+
+        doc_tokens = self._tokenizer(content)
+
+        self.documents.append(document)
+        self._update_stats_add(doc_tokens)
+        self._metadata.add(len(self.documents) - 1, document)
+        return len(self.documents) - 1
+
+    def remove_document(self, doc_id: int):
+        """Remove a document by id; its slot in `documents` becomes None."""
+        if not 0 <= doc_id < len(self._deleted) or self._deleted[doc_id]:
+            raise KeyError(f"No document with id {doc_id}.")
+
+        doc_tokens = self._tokenizer(self.documents[doc_id]["content"])
+        self.documents[doc_id] = None
+        self._deleted[doc_id] = 1
+        self._update_stats_remove(doc_id, doc_tokens)
+
+    def update_document(self, doc_id: int, document: Dict[str, Any]) -> int:
+        """Replace a document and return the id of the new version.
+
+        Postings are kept sorted by doc id, so the new version is appended
+        under a fresh id rather than reusing the old one.
+        """
+        if not 0 <= doc_id < len(self._deleted) or self._deleted[doc_id]:
+            raise KeyError(f"No document with id {doc_id}.")
+        new_id = self.add_document(document)
+        self.remove_document(doc_id)
+        return new_id
+
+    def _max_score_top_k(
+        self, query_terms: Dict[str, int], k: int, allowed: Optional[List[int]] = None
+    ) -> List[Tuple[float, int]]:
+        """Document-at-a-time top-k with MaxScore early termination.
+
+        Terms are ordered by upper bound. Once the k-th best score exceeds
+        the summed bounds of the lowest terms, those terms become
+        non-essential: documents that only contain them are never
+        visited, and they are only probed (by binary search) for
+        documents that can still make the top k.
+
+        `allowed` is a sorted list of doc ids from a metadata filter. A
+        candidate outside it is never scored: the essential postings
+        leap forward (by binary search) to the next allowed id instead.
+        """
+        bound_of = {
+            term: self._term_upper_bound(term) * count
+            for term, count in query_terms.items()
+        }
+        terms = sorted(query_terms, key=lambda term: bound_of[term])
+        postings = [self._postings[term] for term in terms]
+        weights = [query_terms[term] * self._get_idf(term) for term in terms]
+        # prefix_bounds[i] is the best score reachable from terms[:i] alone
+        prefix_bounds = [0.0]
+        for term in terms:
+            prefix_bounds.append(prefix_bounds[-1] + bound_of[term])
+
+        deleted = self._deleted
+        doc_len = self._doc_len
+        avg_doc_len = self._avg_doc_len
+        pointers = [0] * len(terms)
+        heap: List[Tuple[float, int]] = []
+        threshold = 0.0
+        first_essential = 0
+        allowed_pos = 0
+
+        while first_essential < len(terms):
+            doc_id = None
+            for i in range(first_essential, len(terms)):
+                doc_ids = postings[i][0]
+                if pointers[i] < len(doc_ids) and (doc_id is None or doc_ids[pointers[i]] < doc_id):
+                    doc_id = doc_ids[pointers[i]]
+            if doc_id is None:
+                break
+
+            if allowed is not None:
+                allowed_pos = bisect_left(allowed, doc_id, allowed_pos)
+                if allowed_pos == len(allowed):
+                    break
+                if allowed[allowed_pos] != doc_id:
+                    target = allowed[allowed_pos]
+                    for i in range(first_essential, len(terms)):
+                        pointers[i] = bisect_left(postings[i][0], target, pointers[i])
+                    continue
+
+            score = 0.0
+            for i in range(first_essential, len(terms)):
+                doc_ids, term_freqs = postings[i]
+                if pointers[i] < len(doc_ids) and doc_ids[pointers[i]] == doc_id:
+                    score += self._term_score(weights[i], term_freqs[pointers[i]], doc_len[doc_id], avg_doc_len)
+                    pointers[i] += 1
+
+            if deleted[doc_id]:
+                continue
+
+            for i in range(first_essential - 1, -1, -1):
+                if score + prefix_bounds[i + 1] <= threshold:
+                    break
+                doc_ids, term_freqs = postings[i]
+                pointers[i] = bisect_left(doc_ids, doc_id, pointers[i])
+                if pointers[i] < len(doc_ids) and doc_ids[pointers[i]] == doc_id:
+                    score += self._term_score(weights[i], term_freqs[pointers[i]], doc_len[doc_id], avg_doc_len)
+
+            if score <= 1e-9:
+                continue
+            # -doc_id makes later documents lose ties, like a stable sort would
+            if len(heap) < k:
+                heapq.heappush(heap, (score, -doc_id))
+            elif score > heap[0][0]:
+                heapq.heapreplace(heap, (score, -doc_id))
+            else:
+                continue
+            if len(heap) == k:
+                threshold = heap[0][0]
+                while (
+                    first_essential < len(terms)
+                    and prefix_bounds[first_essential + 1] <= threshold
+                ):
+                    first_essential += 1
+
+        return sorted(((score, -neg_id) for score, neg_id in heap), key=lambda item: (-item[0], item[1]))
+
+    def search(
+        self,
+        query_text: str,
+        k: int = 1,
+        score_normalization_factor: float = 0.1,
+        filter: Optional[Dict[str, Any]] = None,
+    ) -> List[Tuple[Dict[str, Any], float]]:
+        """Top-k documents for `query_text`; `filter` restricts them by metadata (see MetadataIndex)."""
+        if not self._live_count:
+            return []
+
+        if not isinstance(query_text, str):
+            raise TypeError("Query text must be a string.")
+
+        if k <= 0:
+            raise ValueError("k must be a positive integer.")
+
+        if self._avg_doc_len == 0:
+            return []
+
+        query_tokens = self._tokenizer(query_text)
+        if not query_tokens:
+            return []
+
+        query_terms = {
+            token: count
+            for token, count in Counter(query_tokens).items()
+            if token in self._postings
+        }
+        if not query_terms:
+            return []
+
+        allowed = None
+        if filter is not None:
+            allowed = self._metadata.match(filter).tolist()
+            if not allowed:
+                return []
+
+        normalized_results = []
+        for raw_score, doc_id in self._max_score_top_k(query_terms, k, allowed):
+            normalized_score = math.exp(-score_normalization_factor * raw_score)
+            normalized_results.append((self.documents[doc_id], normalized_score))
+
+        normalized_results.sort(key=lambda item: item[1])
+
+        return normalized_results
+
+    def save(self, path: str):
+        """Write the index to a directory.
+
+        Postings are stored as two flat uint32 arrays (doc ids, term
+        frequencies) with a vocabulary of offsets into them; documents go
+        to a JSON lines sidecar. Dead postings are dropped on the way out.
+        """
+        os.makedirs(path, exist_ok=True)
+        vocabulary = {}
+        doc_ids_out, term_freqs_out = array("I"), array("I")
+        for term, (doc_ids, term_freqs) in self._postings.items():
+            offset = len(doc_ids_out)
+            for doc_id, term_freq in zip(doc_ids, term_freqs):
+                if not self._deleted[doc_id]:
+                    doc_ids_out.append(doc_id)
+                    term_freqs_out.append(term_freq)
+            vocabulary[term] = [
+                offset,
+                len(doc_ids_out) - offset,
+                self._max_term_freq[term],
+                self._min_doc_len[term],
+            ]
+
+        write_array(os.path.join(path, "postings_docs.u32"), doc_ids_out)
+        write_array(os.path.join(path, "postings_tfs.u32"), term_freqs_out)
+        write_array(os.path.join(path, "doc_len.u32"), array("I", self._doc_len))
+        write_array(os.path.join(path, "deleted.u8"), self._deleted)
+        write_json(os.path.join(path, "vocabulary.json"), vocabulary)
+        write_json(
+            os.path.join(path, "meta.json"),
+            {
+                "k1": self.k1,
+                "b": self.b,
+                "live_count": self._live_count,
+                "total_doc_len": self._total_doc_len,
+            },
+        )
+        write_documents(path, self.documents)
+        self._metadata.save(path)
+
+    @classmethod
+    def load(
+        cls, path: str, tokenizer: Optional[Callable[[str], List[str]]] = None
+    ) -> "BM25Index":
+        """Open a saved index; postings and documents are read on demand.
+
+        A custom tokenizer is not saved and must be passed again.
+        """
+        meta = read_json(os.path.join(path, "meta.json"))
+        index = cls(k1=meta["k1"], b=meta["b"], tokenizer=tokenizer)
+        vocabulary = read_json(os.path.join(path, "vocabulary.json"))
+
+        index._postings = LazyPostings(
+            path, {term: (entry[0], entry[1]) for term, entry in vocabulary.items()}
+        )
+        index._doc_freqs = {term: entry[1] for term, entry in vocabulary.items()}
+        index._max_term_freq = {term: entry[2] for term, entry in vocabulary.items()}
+        index._min_doc_len = {term: entry[3] for term, entry in vocabulary.items()}
+        index._doc_len = copy_array(map_array(os.path.join(path, "doc_len.u32"), "I"), "I")
+        index._live_count = meta["live_count"]
+        index._total_doc_len = meta["total_doc_len"]
+        index.documents = LazyDocuments(path)
+        deleted_path = os.path.join(path, "deleted.u8")
+        if os.path.exists(deleted_path):
+            index._deleted = copy_array(map_array(deleted_path, "B"), "B")
+        else:
+            # Saved before tombstones were stored: recover them from the sidecar once
+            index._deleted = array("B", (document is None for document in index.documents))
+        index._metadata = MetadataIndex.load(path)
+        return index
+
+    def __len__(self) -> int:
+        return self._live_count
+
+    def __repr__(self) -> str:
+        return f"BM25VectorStore(count={len(self)}, k1={self.k1}, b={self.b}, vocab={len(self._postings)})"
@@ -0,0 +1,337 @@
+# Chunking strategies
+import mmap
+import re
+from collections import deque
+from functools import lru_cache
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Union
+
+SENTENCE_BOUNDARY = r"(?<=[.!?])\s+"
+SECTION_BOUNDARY = r"\n## "
+TOKEN_PATTERN = re.compile(r"\w+|[^\w\s]")
+
+
+# Chunk by a set number of characters
+def chunk_by_char(text, chunk_size=150, chunk_overlap=20):
+    chunks = []
+    start_idx = 0
+
+    while start_idx < len(text):
+        end_idx = min(start_idx + chunk_size, len(text))
+
+        chunk_text = text[start_idx:end_idx]
+        chunks.append(chunk_text)
+
+        start_idx = (
+            end_idx - chunk_overlap if end_idx < len(text) else len(text)
+        )
+
+    return chunks
+
+
+# Chunk by sentence
+def chunk_by_sentence(text, max_sentences_per_chunk=5, overlap_sentences=1):
+    sentences = re.split(SENTENCE_BOUNDARY, text)
+
+    chunks = []
+    start_idx = 0
+
+    while start_idx < len(sentences):
+        end_idx = min(start_idx + max_sentences_per_chunk, len(sentences))
+
+        current_chunk = sentences[start_idx:end_idx]
+        chunks.append(" ".join(current_chunk))
+
+        start_idx += max_sentences_per_chunk - overlap_sentences
+
+        if start_idx < 0:
+            start_idx = 0
+
+    return chunks
+
+
+# Chunk by section
+def chunk_by_section(document_text):
+    return re.split(SECTION_BOUNDARY, document_text)
+
+
+class TextSource:
+    """Text to chunk: an in-memory string or a memory-mapped UTF-8 file.
+
+    For strings, offsets are character offsets. For files, they are byte
+    offsets into the mapping, which is scanned lazily by the OS pager, so
+    a multi-GB file is never copied into memory as a whole.
+    """
+
+    def __init__(self, data: Union[str, bytes, mmap.mmap], name: Optional[str] = None):
+        self.data = data
+        self.name = name
+        self.is_bytes = not isinstance(data, str)
+
+    @classmethod
+    def from_file(cls, path: str) -> "TextSource":
+        with open(path, "rb") as f:
+            try:
+                data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError:
+                data = b""  # empty files cannot be mapped
+        return cls(data, name=path)
+
+    def __len__(self) -> int:
+        return len(self.data)
+
+    def pattern(self, pattern: str) -> "re.Pattern":
+        return re.compile(pattern.encode("utf-8") if self.is_bytes else pattern)
+
+    def text(self, start: int, end: int) -> str:
+        chunk = self.data[start:end]
+        return chunk.decode("utf-8", errors="replace") if self.is_bytes else chunk
+
+    def char_boundary(self, index: int) -> int:
+        """Move a byte offset back to the start of its UTF-8 character."""
+        if not self.is_bytes:
+            return index
+        while 0 < index < len(self.data) and self.data[index] & 0xC0 == 0x80:
+            index -= 1
+        return index
+
+
+class Chunk:
+    """A [start, end) span of a TextSource whose text is read on demand."""
+
+    __slots__ = ("source", "start", "end")
+
+    def __init__(self, source: TextSource, start: int, end: int):
+        self.source = source
+        self.start = start
+        self.end = end
+
+    @property
+    def text(self) -> str:
+        return self.source.text(self.start, self.end)
+
+    def __repr__(self) -> str:
+        return f"Chunk(start={self.start}, end={self.end})"
+
+
+def _as_source(source: Union[str, TextSource]) -> TextSource:
+    return source if isinstance(source, TextSource) else TextSource(source)
+
+
+def iter_chunk_by_char(
+    source: Union[str, TextSource], chunk_size: int = 150, chunk_overlap: int = 20
+) -> Iterator[Chunk]:
+    """Lazy chunk_by_char; byte-sized (never splitting a character) for files."""
+    if chunk_overlap >= chunk_size:
+        raise ValueError("chunk_overlap must be smaller than chunk_size")
+    source = _as_source(source)
+    length = len(source)
+    start_idx = 0
+
+    while start_idx < length:
+        end_idx = min(start_idx + chunk_size, length)
+        end_idx = source.char_boundary(end_idx)
+        if end_idx <= start_idx:
+            # A single character wider than chunk_size; take it whole
+            end_idx = min(start_idx + 4, length)
+
+        yield Chunk(source, start_idx, end_idx)
+
+        if end_idx >= length:
+            break
+        next_start = source.char_boundary(end_idx - chunk_overlap)
+        start_idx = next_start if next_start > start_idx else end_idx
+
+
+def _iter_spans(source: TextSource, boundary: str) -> Iterator[tuple]:
+    """Yield (start, end) of the pieces re.split(boundary) would produce."""
+    previous_end = 0
+    for match in source.pattern(boundary).finditer(source.data):
+        yield previous_end, match.start()
+        previous_end = match.end()
+    yield previous_end, len(source)
+
+
+def iter_chunk_by_sentence(
+    source: Union[str, TextSource],
+    max_sentences_per_chunk: int = 5,
+    overlap_sentences: int = 1,
+) -> Iterator[Chunk]:
+    """Lazy chunk_by_sentence.
+
+    Produces the same sentence groups, but each chunk spans the original
+    text from its first to its last sentence, so whitespace between
+    sentences is kept rather than replaced by a single space.
+    """
+    step = max_sentences_per_chunk - overlap_sentences
+    if step <= 0:
+        raise ValueError("overlap_sentences must be smaller than max_sentences_per_chunk")
+    source = _as_source(source)
+    window: deque = deque()
+
+    for span in _iter_spans(source, SENTENCE_BOUNDARY):
+        window.append(span)
+        if len(window) == max_sentences_per_chunk:
+            yield Chunk(source, window[0][0], window[-1][1])
+            for _ in range(step):
+                window.popleft()
+
+    # Trailing partial windows, exactly as the list version emits them
+    while window:
+        yield Chunk(source, window[0][0], window[-1][1])
+        for _ in range(min(step, len(window))):
+            window.popleft()
+
+
+def iter_chunk_by_section(source: Union[str, TextSource]) -> Iterator[Chunk]:
+    """Lazy chunk_by_section."""
+    source = _as_source(source)
+    for start, end in _iter_spans(source, SECTION_BOUNDARY):
+        yield Chunk(source, start, end)
+
+
+@lru_cache(maxsize=65536)
+def count_tokens(text: str) -> int:
+    """Approximate BPE token count: one per punctuation mark, one per ~4 word characters.
+
+    Results are memoized, so re-chunking the same text with different
+    budgets does not re-tokenize each sentence.
+    """
+    return sum(
+        1 + (len(match) - 1) // 4 for match in TOKEN_PATTERN.findall(text)
+    )
+
+
+def _split_span(source: TextSource, start: int, end: int, max_tokens: int, token_counter):
+    """Cut an over-budget span at token boundaries into pieces of at most max_tokens."""
+    text = source.text(start, end)
+    offset = 0  # position in `text`
+    piece_start = start
+    piece_tokens = 0
+
+    def advance(position):
+        head = text[offset:position]
+        return piece_start + (len(head.encode("utf-8")) if source.is_bytes else len(head))
+
+    for match in TOKEN_PATTERN.finditer(text):
+        tokens = token_counter(match.group())
+        if piece_tokens and piece_tokens + tokens > max_tokens:
+            cut = advance(match.start())
+            yield piece_start, cut, piece_tokens
+            piece_start, offset, piece_tokens = cut, match.start(), 0
+        if tokens > max_tokens:
+            # One enormous "word" (base64, minified data): cut it by characters
+            step = 4 * max_tokens
+            for position in range(match.start() + step, match.end(), step):
+                cut = advance(position)
+                yield piece_start, cut, token_counter(text[offset:position])
+                piece_start, offset = cut, position
+            tokens = token_counter(text[offset : match.end()])
+        piece_tokens += tokens
+    if piece_start < end:
+        yield piece_start, end, piece_tokens
+
+
+def iter_chunk_by_tokens(
+    source: Union[str, TextSource],
+    max_tokens: int = 256,
+    overlap_tokens: int = 32,
+    unit: str = "sentence",
+    token_counter: Callable[[str], int] = count_tokens,
+) -> Iterator[Chunk]:
+    """Pack whole sentences (or sections) into chunks of at most `max_tokens`.
+
+    Each new chunk starts with the trailing units of the previous one
+    that fit in `overlap_tokens`. A single unit over the budget is cut at
+    token boundaries.
+    """
+    if overlap_tokens >= max_tokens:
+        raise ValueError("overlap_tokens must be smaller than max_tokens")
+    if unit not in ("sentence", "section"):
+        raise ValueError("unit must be 'sentence' or 'section'")
+    source = _as_source(source)
+    boundary = SENTENCE_BOUNDARY if unit == "sentence" else SECTION_BOUNDARY
+
+    window: deque = deque()  # (start, end, tokens)
+    window_tokens = 0
+
+    for start, end in _iter_spans(source, boundary):
+        tokens = token_counter(source.text(start, end))
+        pieces = (
+            _split_span(source, start, end, max_tokens, token_counter)
+            if tokens > max_tokens
+            else [(start, end, tokens)]
+        )
+        for piece in pieces:
+            if window and window_tokens + piece[2] > max_tokens:
+                yield Chunk(source, window[0][0], window[-1][1])
+                # Keep the tail that fits in the overlap budget and still
+                # leaves room for the incoming piece
+                kept = 0
+                for i in range(len(window) - 1, -1, -1):
+                    if kept + window[i][2] > min(overlap_tokens, max_tokens - piece[2]):
+                        break
+                    kept += window[i][2]
+                while window_tokens > kept:
+                    window_tokens -= window.popleft()[2]
+            window.append(piece)
+            window_tokens += piece[2]
+
+    if window:
+        yield Chunk(source, window[0][0], window[-1][1])
+
+
+def chunk_by_tokens(text, max_tokens=256, overlap_tokens=32, unit="sentence"):
+    return [
+        chunk.text
+        for chunk in iter_chunk_by_tokens(text, max_tokens, overlap_tokens, unit)
+    ]
+
+
+def iter_documents(chunks: Iterable[Chunk], **metadata: Any) -> Iterator[Dict[str, Any]]:
+    """Turn chunks into index documents carrying their offsets."""
+    for chunk in chunks:
+        document = {"content": chunk.text, "start": chunk.start, "end": chunk.end}
+        if chunk.source.name:
+            document["source"] = chunk.source.name
+        document.update(metadata)
+        yield document
+
+
+def ingest(
+    chunks: Iterable[Chunk],
+    bm25_index=None,
+    vector_index=None,
+    embedding_service=None,
+    batch_size: int = 256,
+    **metadata: Any,
+) -> int:
+    """Stream chunks into a BM25Index and/or VectorIndex; returns the chunk count.
+
+    Vectors come from `embedding_service` in batches of `batch_size`, so
+    only one batch of chunk text is held in memory at a time.
+    """
+    if vector_index is not None and embedding_service is None:
+        raise ValueError("embedding_service is required to fill a vector index")
+
+    count = 0
+    batch: List[Dict[str, Any]] = []
+    for document in iter_documents(chunks, **metadata):
+        batch.append(document)
+        if len(batch) >= batch_size:
+            _ingest_batch(batch, bm25_index, vector_index, embedding_service)
+            count += len(batch)
+            batch = []
+    if batch:
+        _ingest_batch(batch, bm25_index, vector_index, embedding_service)
+        count += len(batch)
+    return count
+
+
+def _ingest_batch(batch, bm25_index, vector_index, embedding_service):
+    if bm25_index is not None:
+        for document in batch:
+            bm25_index.add_document(document)
+    if vector_index is not None:
+        vectors = embedding_service.embed([document["content"] for document in batch])
+        for vector, document in zip(vectors, batch):
+            vector_index.add_vector(vector, document)
@@ -0,0 +1,204 @@
+# Embedding service: micro-batching, deduplication, caching and retries
+import hashlib
+import random
+import sqlite3
+import threading
+import time
+from array import array
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (about four characters per token)."""
+    return len(text) // 4 + 1
+
+
+class EmbeddingCache:
+    """SQLite cache of embeddings keyed by model, input type and content hash."""
+
+    def __init__(self, path: str = "embedding_cache.sqlite"):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS embeddings (
+                key TEXT PRIMARY KEY,
+                vector BLOB NOT NULL
+            )"""
+        )
+        self._conn.commit()
+
+    @staticmethod
+    def make_key(model: str, input_type: Optional[str], text: str) -> str:
+        digest = hashlib.sha256(text.encode("utf-8")).hexdigest()
+        return f"{model}:{input_type}:{digest}"
+
+    def get_many(self, keys: Sequence[str]) -> Dict[str, List[float]]:
+        found = {}
+        with self._lock:
+            # Stay under SQLite's bound-parameter limit
+            for start in range(0, len(keys), 500):
+                chunk = keys[start : start + 500]
+                placeholders = ",".join("?" * len(chunk))
+                rows = self._conn.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})", chunk
+                ).fetchall()
+                for key, blob in rows:
+                    found[key] = array("f", blob).tolist()
+        return found
+
+    def set_many(self, items: Iterable[Tuple[str, Sequence[float]]]):
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (key, vector) VALUES (?, ?)",
+                [(key, array("f", vector).tobytes()) for key, vector in items],
+            )
+            self._conn.commit()
+
+    def close(self):
+        self._conn.close()
+
+
+class EmbeddingService:
+    """Wraps an embed function with batching, dedup, an on-disk cache and retries.
+
+    `embed_fn(texts)` takes a list of strings and returns one vector per
+    string, in order. Any callable works, so tests can pass a local fake.
+    """
+
+    def __init__(
+        self,
+        embed_fn: Callable[[List[str]], List[List[float]]],
+        model: str = "voyage-3-large",
+        input_type: Optional[str] = "document",
+        cache: Optional[EmbeddingCache] = None,
+        max_batch_size: int = 128,
+        max_batch_tokens: int = 120000,
+        max_workers: int = 4,
+        max_retries: int = 5,
+        base_delay: float = 1.0,
+        token_counter: Callable[[str], int] = estimate_tokens,
+    ):
+        self._embed_fn = embed_fn
+        self.model = model
+        self.input_type = input_type
+        self.cache = cache
+        self.max_batch_size = max_batch_size
+        self.max_batch_tokens = max_batch_tokens
+        self.max_workers = max_workers
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self._token_counter = token_counter
+
+        self.cache_hits = 0
+        self.api_calls = 0
+        self.texts_embedded = 0
+        self._stats_lock = threading.Lock()
+
+    @classmethod
+    def from_voyage(
+        cls, client, model: str = "voyage-3-large", input_type: Optional[str] = "document", **kwargs
+    ) -> "EmbeddingService":
+        """Build a service around a `voyageai.Client`."""
+
+        def embed_fn(texts: List[str]) -> List[List[float]]:
+            return client.embed(texts, model=model, input_type=input_type).embeddings
+
+        return cls(embed_fn, model=model, input_type=input_type, **kwargs)
+
+    def embed(self, texts: Sequence[str]) -> List[List[float]]:
+        """Embed texts, returning one vector per input in the same order.
+
+        Identical texts are embedded once, cached texts are not sent at
+        all, and the rest go out in size- and token-limited batches that
+        are dispatched concurrently.
+        """
+        keys = [EmbeddingCache.make_key(self.model, self.input_type, text) for text in texts]
+        unique: Dict[str, str] = {}
+        for key, text in zip(keys, texts):
+            unique.setdefault(key, text)
+
+        vectors = self.cache.get_many(list(unique)) if self.cache else {}
+        with self._stats_lock:
+            self.cache_hits += len(vectors)
+
+        missing = [(key, text) for key, text in unique.items() if key not in vectors]
+        batches = list(self._make_batches(missing))
+        if len(batches) == 1 or self.max_workers <= 1:
+            embedded = [self._embed_batch(batch) for batch in batches]
+        else:
+            with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+                embedded = list(executor.map(self._embed_batch, batches))
+
+        for batch, batch_vectors in zip(batches, embedded):
+            for (key, _), vector in zip(batch, batch_vectors):
+                vectors[key] = vector
+
+        return [vectors[key] for key in keys]
+
+    def embed_one(self, text: str) -> List[float]:
+        return self.embed([text])[0]
+
+    def embed_documents(
+        self, documents: Iterable[Dict], batch_size: int = 1024
+    ) -> Iterator[Tuple[List[float], Dict]]:
+        """Lazily yield (vector, document) pairs for an iterable of documents."""
+        pending: List[Dict] = []
+        for document in documents:
+            pending.append(document)
+            if len(pending) >= batch_size:
+                yield from zip(self.embed([d["content"] for d in pending]), pending)
+                pending = []
+        if pending:
+            yield from zip(self.embed([d["content"] for d in pending]), pending)
+
+    def _make_batches(
+        self, items: List[Tuple[str, str]]
+    ) -> Iterator[List[Tuple[str, str]]]:
+        batch: List[Tuple[str, str]] = []
+        batch_tokens = 0
+        for key, text in items:
+            tokens = self._token_counter(text)
+            if batch and (
+                len(batch) >= self.max_batch_size
+                or batch_tokens + tokens > self.max_batch_tokens
+            ):
+                yield batch
+                batch, batch_tokens = [], 0
+            batch.append((key, text))
+            batch_tokens += tokens
+        if batch:
+            yield batch
+
+    def _embed_batch(self, batch: List[Tuple[str, str]]) -> List[List[float]]:
+        texts = [text for _, text in batch]
+        for attempt in range(self.max_retries + 1):
+            try:
+                with self._stats_lock:
+                    self.api_calls += 1
+                result = self._embed_fn(texts)
+                break
+            except Exception as e:
+                if attempt == self.max_retries:
+                    raise
+                delay = self.base_delay * (2 ** attempt) + random.uniform(0, self.base_delay)
+                print(f"Embedding request failed ({e}), retrying in {delay:.1f}s")
+                time.sleep(delay)
+
+        if len(result) != len(texts):
+            raise ValueError(f"Expected {len(texts)} embeddings, got {len(result)}")
+        result = [list(vector) for vector in result]
+        # Cache each batch as it lands so a later failure does not lose it
+        if self.cache:
+            self.cache.set_many((key, vector) for (key, _), vector in zip(batch, result))
+        with self._stats_lock:
+            self.texts_embedded += len(texts)
+        return result
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "cache_hits": self.cache_hits,
+            "api_calls": self.api_calls,
+            "texts_embedded": self.texts_embedded,
+        }
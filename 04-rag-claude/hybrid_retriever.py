@@ -0,0 +1,142 @@
+# Hybrid retrieval: dense (VectorIndex) + lexical (BM25Index) search with rank fusion
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Hashable, List, Optional, Tuple
+
+from bm25_index import BM25Index
+from vector_index import VectorIndex
+
+
+def default_document_key(document: Dict[str, Any]) -> Hashable:
+    """Identify a document across both indexes by its "id", falling back to its content."""
+    return document.get("id", document["content"])
+
+
+class HybridRetriever:
+    """Searches a VectorIndex and a BM25Index concurrently and fuses the results.
+
+    Each index only returns its own top `candidates` documents, which are
+    then merged with reciprocal rank fusion ("rrf") or a weighted sum of
+    min-max normalized scores ("weighted"). Results are (document, score)
+    pairs sorted best first; unlike the underlying indexes, a higher fused
+    score is better.
+
+    The dense leg runs on a shared pool of `max_workers` threads (default:
+    ThreadPoolExecutor's) while the BM25 leg runs in the calling thread, so
+    concurrent callers only queue on the pool for one leg each.
+    """
+
+    def __init__(
+        self,
+        vector_index: VectorIndex,
+        bm25_index: BM25Index,
+        fusion: str = "rrf",
+        rrf_k: int = 60,
+        vector_weight: float = 0.5,
+        bm25_weight: float = 0.5,
+        candidate_multiplier: int = 4,
+        document_key: Callable[[Dict[str, Any]], Hashable] = default_document_key,
+        max_workers: Optional[int] = None,
+    ):
+        if fusion not in ["rrf", "weighted"]:
+            raise ValueError("fusion must be 'rrf' or 'weighted'")
+        self.vector_index = vector_index
+        self.bm25_index = bm25_index
+        self.fusion = fusion
+        self.rrf_k = rrf_k
+        self.weights = {"vector": vector_weight, "bm25": bm25_weight}
+        self.candidate_multiplier = candidate_multiplier
+        self._document_key = document_key
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="hybrid")
+        self.last_timings: Dict[str, float] = {}
+
+    def search(
+        self,
+        query: str,
+        k: int = 1,
+        candidates: Optional[int] = None,
+        query_vector: Optional[Any] = None,
+        filter: Optional[Dict[str, Any]] = None,
+    ) -> List[Tuple[Dict[str, Any], float]]:
+        """Return the fused top-k for `query`.
+
+        `candidates` (default `candidate_multiplier * k`) is how many
+        results to fetch from each index. Pass `query_vector` to reuse an
+        existing query embedding. `filter` is passed to both indexes so
+        they only score matching documents. Per-stage timings in
+        milliseconds are left in `last_timings`.
+        """
+        if not isinstance(query, str):
+            raise TypeError("Query must be a string.")
+        if k <= 0:
+            raise ValueError("k must be a positive integer.")
+        candidates = max(k, candidates or self.candidate_multiplier * k)
+
+        start = time.perf_counter()
+        timings: Dict[str, float] = {}
+        dense_query = query if query_vector is None else query_vector
+        vector_future = self._executor.submit(
+            self._timed, timings, "vector_ms", self.vector_index.search, dense_query, candidates, filter=filter
+        )
+        bm25_results = self._timed(timings, "bm25_ms", self.bm25_index.search, query, candidates, filter=filter)
+        ranked = {"vector": vector_future.result(), "bm25": bm25_results}
+
+        fusion_start = time.perf_counter()
+        if self.fusion == "rrf":
+            fused = self._fuse_rrf(ranked)
+        else:
+            fused = self._fuse_weighted(ranked)
+        results = [
+            (document, score)
+            for document, score in sorted(fused.values(), key=lambda item: -item[1])[:k]
+        ]
+
+        end = time.perf_counter()
+        timings["fusion_ms"] = (end - fusion_start) * 1000
+        timings["total_ms"] = (end - start) * 1000
+        self.last_timings = timings
+        return results
+
+    @staticmethod
+    def _timed(timings: Dict[str, float], name: str, fn, *args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            timings[name] = (time.perf_counter() - start) * 1000
+
+    def _fuse_rrf(
+        self, ranked: Dict[str, List[Tuple[Dict[str, Any], float]]]
+    ) -> Dict[Hashable, List]:
+        fused: Dict[Hashable, List] = {}
+        for name, results in ranked.items():
+            weight = self.weights[name]
+            # Both indexes return best-first lists, so position is the rank
+            for rank, (document, _) in enumerate(results, start=1):
+                entry = fused.setdefault(self._document_key(document), [document, 0.0])
+                entry[1] += weight / (self.rrf_k + rank)
+        return fused
+
+    def _fuse_weighted(
+        self, ranked: Dict[str, List[Tuple[Dict[str, Any], float]]]
+    ) -> Dict[Hashable, List]:
+        fused: Dict[Hashable, List] = {}
+        for name, results in ranked.items():
+            if not results:
+                continue
+            weight = self.weights[name]
+            # Both indexes score lower-is-better; map the candidate set onto [0, 1], best = 1
+            scores = [score for _, score in results]
+            low, high = min(scores), max(scores)
+            span = high - low
+            for document, score in results:
+                normalized = (high - score) / span if span > 0 else 1.0
+                entry = fused.setdefault(self._document_key(document), [document, 0.0])
+                entry[1] += weight * normalized
+        return fused
+
+    def close(self):
+        self._executor.shutdown(wait=True)
+
+    def __repr__(self) -> str:
+        return f"HybridRetriever(fusion='{self.fusion}', vector={self.vector_index!r}, bm25={self.bm25_index!r})"
@@ -0,0 +1,167 @@
+# On-disk storage helpers shared by VectorIndex and BM25Index
+import json
+import mmap
+import os
+import tempfile
+from array import array
+from contextlib import contextmanager
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+
+@contextmanager
+def replace_file(path: str, mode: str = "wb", **kwargs):
+    """Write to a temporary file next to `path`, then atomically move it into place.
+
+    A loaded index memory-maps its own files, so truncating them in place
+    (e.g. saving back to the directory it was loaded from) would pull the
+    pages out from under the mapping. Replacing the directory entry keeps
+    the old file alive for as long as it is mapped.
+    """
+    directory, name = os.path.split(path)
+    fd, temp_path = tempfile.mkstemp(prefix=f".{name}.", dir=directory or ".")
+    try:
+        with os.fdopen(fd, mode, **kwargs) as f:
+            yield f
+        os.replace(temp_path, path)
+    except BaseException:
+        os.remove(temp_path)
+        raise
+
+
+def write_array(path: str, values: Any):
+    """Write a NumPy array or array.array as raw items, via replace_file."""
+    with replace_file(path) as f:
+        values.tofile(f)
+
+
+def write_json(path: str, data: Any):
+    with replace_file(path, "w", encoding="utf-8") as f:
+        json.dump(data, f)
+
+
+def read_json(path: str) -> Any:
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def write_documents(directory: str, documents: Iterable[Optional[Dict[str, Any]]]):
+    """Write documents as JSON lines plus a uint64 offset table for random access."""
+    offsets = array("Q", [0])
+    with replace_file(os.path.join(directory, "documents.jsonl")) as f:
+        for document in documents:
+            line = json.dumps(document, ensure_ascii=False).encode("utf-8") + b"\n"
+            f.write(line)
+            offsets.append(offsets[-1] + len(line))
+    write_array(os.path.join(directory, "documents.idx"), offsets)
+
+
+def map_array(path: str, typecode: str) -> memoryview:
+    """Memory-map a raw array file read-only and view it as `typecode` items."""
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return memoryview(array(typecode))
+        mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    return memoryview(mapped).cast("B").cast(typecode)
+
+
+def copy_array(view: memoryview, typecode: str) -> array:
+    """Copy a typed memoryview (e.g. a slice of `map_array`) into an array."""
+    result = array(typecode)
+    result.frombytes(view.cast("B"))
+    return result
+
+
+class LazyDocuments:
+    """List-like view of a documents sidecar that parses entries on access.
+
+    Appends and replacements are kept in memory on top of the mapped
+    file, so a loaded index can keep accepting writes.
+    """
+
+    def __init__(self, directory: str):
+        self._offsets = map_array(os.path.join(directory, "documents.idx"), "Q")
+        with open(os.path.join(directory, "documents.jsonl"), "rb") as f:
+            size = os.fstat(f.fileno()).st_size
+            self._data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if size else b""
+        self._stored = len(self._offsets) - 1
+        self._overrides: Dict[int, Optional[Dict[str, Any]]] = {}
+        self._appended: List[Optional[Dict[str, Any]]] = []
+
+    def __len__(self) -> int:
+        return self._stored + len(self._appended)
+
+    def _position(self, index: int) -> int:
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("document index out of range")
+        return index
+
+    def __getitem__(self, index: int) -> Optional[Dict[str, Any]]:
+        index = self._position(index)
+        if index >= self._stored:
+            return self._appended[index - self._stored]
+        if index in self._overrides:
+            return self._overrides[index]
+        return json.loads(self._data[self._offsets[index] : self._offsets[index + 1]])
+
+    def __setitem__(self, index: int, document: Optional[Dict[str, Any]]):
+        index = self._position(index)
+        if index >= self._stored:
+            self._appended[index - self._stored] = document
+        else:
+            self._overrides[index] = document
+
+    def __iter__(self) -> Iterator[Optional[Dict[str, Any]]]:
+        for index in range(len(self)):
+            yield self[index]
+
+    def append(self, document: Optional[Dict[str, Any]]):
+        self._appended.append(document)
+
+
+class LazyPostings:
+    """Dict-like term -> (doc ids, term freqs) backed by mapped uint32 arrays.
+
+    A term's postings are copied into compact arrays the first time it is
+    looked up, so a query only reads the postings of its own terms.
+    """
+
+    def __init__(self, directory: str, vocabulary: Dict[str, Tuple[int, int]]):
+        self._vocabulary = vocabulary
+        self._doc_ids = map_array(os.path.join(directory, "postings_docs.u32"), "I")
+        self._term_freqs = map_array(os.path.join(directory, "postings_tfs.u32"), "I")
+        self._loaded: Dict[str, Tuple[array, array]] = {}
+
+    def __contains__(self, term: str) -> bool:
+        return term in self._loaded or term in self._vocabulary
+
+    def __getitem__(self, term: str) -> Tuple[array, array]:
+        if term not in self._loaded:
+            offset, length = self._vocabulary.pop(term)
+            self._loaded[term] = (
+                copy_array(self._doc_ids[offset : offset + length], "I"),
+                copy_array(self._term_freqs[offset : offset + length], "I"),
+            )
+        return self._loaded[term]
+
+    def __setitem__(self, term: str, postings: Tuple[Any, Any]):
+        self._loaded[term] = postings
+        self._vocabulary.pop(term, None)
+
+    def __delitem__(self, term: str):
+        if term not in self:
+            raise KeyError(term)
+        self._loaded.pop(term, None)
+        self._vocabulary.pop(term, None)
+
+    def __len__(self) -> int:
+        return len(self._loaded) + len(self._vocabulary)
+
+    def __iter__(self) -> Iterator[str]:
+        yield from self._loaded
+        yield from self._vocabulary
+
+    def items(self) -> Iterator[Tuple[str, Tuple[Any, Any]]]:
+        for term in list(self):
+            yield term, self[term]
@@ -0,0 +1,126 @@
+# Metadata pre-filtering shared by VectorIndex and BM25Index
+import os
+from array import array
+from typing import Any, Dict, Iterable, List, Optional
+
+import numpy as np
+
+from index_storage import copy_array, map_array, read_json, write_array, write_json
+
+RANGE_OPERATORS = ("gt", "gte", "lt", "lte")
+
+
+def _indexable_values(value: Any) -> List[Any]:
+    """Scalars are indexed as-is and lists element by element; anything else is skipped."""
+    if isinstance(value, (str, int, float, bool)):
+        return [value]
+    if isinstance(value, (list, tuple)):
+        return [v for v in value if isinstance(v, (str, int, float, bool))]
+    return []
+
+
+def _in_range(value: Any, condition: Dict[str, Any]) -> bool:
+    try:
+        return (
+            ("gt" not in condition or value > condition["gt"])
+            and ("gte" not in condition or value >= condition["gte"])
+            and ("lt" not in condition or value < condition["lt"])
+            and ("lte" not in condition or value <= condition["lte"])
+        )
+    except TypeError:
+        # Values of another type (e.g. a string next to dates) never match a range
+        return False
+
+
+class MetadataIndex:
+    """Per-field inverted index from metadata value to sorted doc ids.
+
+    Every top-level document key except "content" is indexed (or only
+    `fields`, when given). Ids are appended in insertion order, so each
+    list is already sorted and a filter resolves to the sorted ids it
+    allows by merging a few of them, without touching the documents.
+
+    A filter maps field -> condition, all of which must hold:
+    a value (equality; for list-valued fields, membership), a list of
+    values (any of them) or a range such as {"gte": "2024-01-01"}.
+    """
+
+    def __init__(self, fields: Optional[Iterable[str]] = None):
+        self.fields = None if fields is None else set(fields)
+        self._ids: Dict[str, Dict[Any, array]] = {}
+
+    def add(self, doc_id: int, document: Dict[str, Any]):
+        for field, value in document.items():
+            if field == "content" or (self.fields is not None and field not in self.fields):
+                continue
+            by_value = self._ids.setdefault(field, {})
+            for v in set(_indexable_values(value)):
+                by_value.setdefault(v, array("I")).append(doc_id)
+
+    def match(self, filter: Dict[str, Any]) -> np.ndarray:
+        """Sorted int64 doc ids that satisfy every condition of `filter`."""
+        if not isinstance(filter, dict) or not filter:
+            raise TypeError("filter must be a non-empty dictionary.")
+
+        per_field = []
+        for field, condition in filter.items():
+            if self.fields is not None and field not in self.fields:
+                raise ValueError(f"Field '{field}' is not indexed for filtering.")
+            ids = self._field_ids(self._ids.get(field, {}), condition)
+            if len(ids) == 0:
+                return ids
+            per_field.append(ids)
+
+        # Intersect smallest first so the work is bounded by the most selective field
+        per_field.sort(key=len)
+        result = per_field[0]
+        for ids in per_field[1:]:
+            result = np.intersect1d(result, ids, assume_unique=True)
+            if len(result) == 0:
+                break
+        return result
+
+    def _field_ids(self, by_value: Dict[Any, array], condition: Any) -> np.ndarray:
+        if isinstance(condition, dict):
+            unknown = set(condition) - set(RANGE_OPERATORS)
+            if unknown:
+                raise ValueError(f"Unsupported filter operators: {sorted(unknown)}")
+            values = [v for v in by_value if _in_range(v, condition)]
+        elif isinstance(condition, (list, tuple, set)):
+            values = [v for v in condition if v in by_value]
+        else:
+            values = [condition] if condition in by_value else []
+
+        if not values:
+            return np.empty(0, dtype=np.int64)
+        if len(values) == 1:
+            return np.array(by_value[values[0]], dtype=np.int64)
+        # A list-valued field can list the same doc under several values
+        return np.unique(np.concatenate([np.array(by_value[v], dtype=np.int64) for v in values]))
+
+    def save(self, path: str):
+        """Write the id lists to one flat uint32 file plus a JSON table of offsets."""
+        entries = []
+        ids_out = array("I")
+        for field, by_value in self._ids.items():
+            for value, ids in by_value.items():
+                entries.append([field, value, len(ids_out), len(ids)])
+                ids_out.extend(ids)
+        write_array(os.path.join(path, "metadata_ids.u32"), ids_out)
+        write_json(
+            os.path.join(path, "metadata.json"),
+            {"fields": None if self.fields is None else sorted(self.fields), "entries": entries},
+        )
+
+    @classmethod
+    def load(cls, path: str) -> "MetadataIndex":
+        """Read a saved index back, or an empty one for indexes saved without it."""
+        meta_path = os.path.join(path, "metadata.json")
+        if not os.path.exists(meta_path):
+            return cls()
+        meta = read_json(meta_path)
+        index = cls(meta["fields"])
+        ids = map_array(os.path.join(path, "metadata_ids.u32"), "I")
+        for field, value, offset, length in meta["entries"]:
+            index._ids.setdefault(field, {})[value] = copy_array(ids[offset : offset + length], "I")
+        return index
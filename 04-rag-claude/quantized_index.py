@@ -0,0 +1,504 @@
+# Compressed vector storage (int8 scalar quantization and product quantization)
+import os
+import shutil
+import tempfile
+import time
+import weakref
+from abc import ABC, abstractmethod
+import numpy as np
+from typing import Optional, Any, List, Dict, Tuple
+
+from ann_index import recall_at_k
+from index_storage import read_json, write_array, write_json
+from vector_index import VectorIndex
+
+
+def _grow_rows(array: np.ndarray, capacity: int, count: int) -> np.ndarray:
+    grown = np.empty((capacity,) + array.shape[1:], dtype=array.dtype)
+    grown[:count] = array[:count]
+    return grown
+
+
+def _close_and_remove(f, path: Optional[str]):
+    f.close()
+    if path is not None and os.path.exists(path):
+        os.remove(path)
+
+
+class _RawVectorStore:
+    """Append-only float32 matrix in a file, read back through np.memmap.
+
+    Keeps the full-precision vectors of a quantized index on disk. With
+    no path a temporary file is used and removed with the store. A store
+    opened on a saved index is read-only until the first append, which
+    copies the file to a temporary one.
+    """
+
+    def __init__(self, dim: int, path: Optional[str] = None, count: int = 0, writable: bool = True):
+        self.dim = dim
+        self.count = count
+        self._map = None
+        self._file = None
+        self._finalizer = None
+        self.path = path
+        if writable:
+            self._open_for_append(path)
+
+    def _open_for_append(self, path: Optional[str]):
+        owned = path is None
+        if owned:
+            fd, path = tempfile.mkstemp(suffix=".f32")
+            os.close(fd)
+        if self.path is not None and self.path != path:
+            shutil.copyfile(self.path, path)
+        elif not owned:
+            open(path, "wb").close()
+        self.path = path
+        self._file = open(path, "ab")
+        self._finalizer = weakref.finalize(self, _close_and_remove, self._file, path if owned else None)
+
+    def append(self, vector: np.ndarray):
+        if self._file is None:
+            self._open_for_append(None)
+        self._file.write(vector.astype(np.float32, copy=False).tobytes())
+        self.count += 1
+        self._map = None
+
+    def rows(self) -> np.ndarray:
+        """All stored vectors as a read-only (count, dim) memmap."""
+        if self.count == 0:
+            return np.empty((0, self.dim), dtype=np.float32)
+        if self._map is None:
+            if self._file is not None:
+                self._file.flush()
+            self._map = np.memmap(self.path, dtype=np.float32, mode="r", shape=(self.count, self.dim))
+        return self._map
+
+    def close(self):
+        self._map = None
+        if self._finalizer is not None:
+            self._finalizer()
+
+
+class QuantizedVectorIndex(VectorIndex, ABC):
+    """VectorIndex that keeps compressed codes in memory and float32 vectors on disk.
+
+    Searches scan the codes in blocks of `chunk_size` rows. With rerank
+    the `rerank_factor * k` best approximate candidates are re-scored
+    exactly against the full-precision vectors, which are appended to
+    `vector_path` (a temporary file by default). Subclasses define the
+    code layout through `_grow_codes`, `_encode` and `_block_dots`.
+    """
+
+    quantization = ""
+
+    def __init__(
+        self,
+        distance_metric: str = "cosine",
+        embedding_fn=None,
+        rerank: bool = True,
+        rerank_factor: int = 4,
+        vector_path: Optional[str] = None,
+        chunk_size: int = 65536,
+        filter_fields: Optional[List[str]] = None,
+    ):
+        super().__init__(
+            distance_metric=distance_metric, embedding_fn=embedding_fn, filter_fields=filter_fields
+        )
+        if rerank_factor < 1:
+            raise ValueError("rerank_factor must be a positive integer.")
+        self.rerank = rerank
+        self.rerank_factor = rerank_factor
+        self._vector_path = vector_path
+        self._chunk_size = chunk_size
+        self._raw: Optional[_RawVectorStore] = None
+
+    @property
+    def vectors(self) -> np.ndarray:
+        """Full-precision vectors, memory-mapped from disk."""
+        if self._raw is None:
+            return np.empty((0, self._vector_dim or 0), dtype=np.float32)
+        return self._raw.rows()
+
+    def memory_bytes(self) -> int:
+        """Bytes held in memory for searching: codes, norms and quantizer state."""
+        return sum(array.nbytes for array in self._resident_arrays())
+
+    def _resident_arrays(self) -> List[np.ndarray]:
+        return [self._norms[: self._count]]
+
+    def _append_vector(self, vector: np.ndarray):
+        if self._raw is None:
+            self._raw = _RawVectorStore(self._vector_dim, self._vector_path)
+        if self._count == len(self._norms):
+            capacity = max(16, 2 * len(self._norms))
+            self._norms = _grow_rows(self._norms, capacity, self._count)
+            self._grow_codes(capacity)
+
+        self._norms[self._count] = np.linalg.norm(vector)
+        self._raw.append(vector)
+        self._encode(self._count, vector)
+        self._count += 1
+
+    @abstractmethod
+    def _grow_codes(self, capacity: int):
+        """Resize the code arrays to hold `capacity` rows."""
+
+    @abstractmethod
+    def _encode(self, row: int, vector: np.ndarray):
+        """Store the compressed code of `vector` at `row`."""
+
+    @abstractmethod
+    def _block_dots(self, query_matrix: np.ndarray, block: Any) -> np.ndarray:
+        """Approximate (m, len(block)) dot products for a slice or array of rows."""
+
+    def _distances_many(
+        self, query_matrix: np.ndarray, rows: Optional[np.ndarray] = None
+    ) -> np.ndarray:
+        """Approximate (m, n) distances computed from the codes."""
+        n = self._count if rows is None else len(rows)
+        dots = np.empty((len(query_matrix), n), dtype=np.float32)
+        for start in range(0, n, self._chunk_size):
+            stop = min(start + self._chunk_size, n)
+            block = slice(start, stop) if rows is None else rows[start:stop]
+            dots[:, start:stop] = self._block_dots(query_matrix, block)
+        norms = self._norms[: self._count] if rows is None else self._norms[rows]
+        return self._dots_to_distances(query_matrix, dots, norms)
+
+    def _exact_distances(self, query_vector: np.ndarray, rows: np.ndarray) -> np.ndarray:
+        """Full-precision distances to `rows`, read from the on-disk vectors."""
+        dots = query_vector[np.newaxis, :] @ self.vectors[rows].T
+        return self._dots_to_distances(query_vector[np.newaxis, :], dots, self._norms[rows])[0]
+
+    def search(
+        self,
+        query: Any,
+        k: int = 1,
+        rerank: Optional[bool] = None,
+        filter: Optional[Dict[str, Any]] = None,
+    ) -> List[Tuple[Dict[str, Any], float]]:
+        if not (self.rerank if rerank is None else rerank):
+            return super().search(query, k, filter=filter)
+        if len(self) == 0:
+            return []
+
+        query_vector = self._prepare_query(query)
+
+        if k <= 0:
+            raise ValueError("k must be a positive integer.")
+
+        rows = self._filter_rows(filter)
+        if rows is not None and len(rows) == 0:
+            return []
+
+        distances = self._distances(query_vector, rows)
+        candidates = self._top_k(distances, min(len(distances), k * self.rerank_factor))
+        # Sorted rows keep the reads from the memmap sequential
+        candidates = np.sort(candidates if rows is None else rows[candidates])
+        exact = self._exact_distances(query_vector, candidates)
+        top = self._top_k(exact, k)
+        return [(self.documents[candidates[i]], float(exact[i])) for i in top]
+
+    def search_many(
+        self,
+        queries: Any,
+        k: int = 1,
+        batch_size: int = 256,
+        rerank: Optional[bool] = None,
+        filter: Optional[Dict[str, Any]] = None,
+    ) -> List[List[Tuple[Dict[str, Any], float]]]:
+        if self.rerank if rerank is None else rerank:
+            return [self.search(q, k, rerank=True, filter=filter) for q in queries]
+        return super().search_many(queries, k, batch_size, filter=filter)
+
+    def save(self, path: str):
+        """Save like VectorIndex (vectors.f32 is the full-precision copy) plus the codes."""
+        super().save(path)
+        meta_path = os.path.join(path, "meta.json")
+        meta = read_json(meta_path)
+        meta.update(self._quantizer_meta())
+        write_json(meta_path, meta)
+
+    def _quantizer_meta(self) -> Dict[str, Any]:
+        return {"quantization": self.quantization}
+
+    def _restore(self, path: str, meta: Dict[str, Any]):
+        if meta.get("quantization") != self.quantization:
+            raise ValueError(
+                f"Index at {path} is not a {self.quantization} quantized index."
+            )
+        super()._restore(path, meta)
+        # Only the codes are searched; the float32 file is reopened for reranking
+        self._vectors = np.empty((0, 0), dtype=np.float32)
+        self._raw = _RawVectorStore(
+            self._vector_dim, os.path.join(path, "vectors.f32"), count=self._count, writable=False
+        )
+
+    def close(self):
+        """Close and, if temporary, delete the full-precision vector file."""
+        if self._raw is not None:
+            self._raw.close()
+
+
+class Int8VectorIndex(QuantizedVectorIndex):
+    """Scalar quantization: each vector is stored as int8 times its own float32 scale.
+
+    Uses dim + 8 bytes per vector in memory (codes, scale and norm)
+    instead of 4 * dim + 4.
+    """
+
+    quantization = "int8"
+
+    def __init__(self, distance_metric: str = "cosine", embedding_fn=None, **kwargs):
+        super().__init__(distance_metric=distance_metric, embedding_fn=embedding_fn, **kwargs)
+        self._codes = np.empty((0, 0), dtype=np.int8)
+        self._scales = np.empty(0, dtype=np.float32)
+
+    def _resident_arrays(self) -> List[np.ndarray]:
+        return super()._resident_arrays() + [self._codes[: self._count], self._scales[: self._count]]
+
+    def _grow_codes(self, capacity: int):
+        if self._codes.shape[1:] != (self._vector_dim,):
+            self._codes = np.empty((0, self._vector_dim), dtype=np.int8)
+        self._codes = _grow_rows(self._codes, capacity, self._count)
+        self._scales = _grow_rows(self._scales, capacity, self._count)
+
+    def _encode(self, row: int, vector: np.ndarray):
+        peak = float(np.abs(vector).max()) if len(vector) else 0.0
+        scale = peak / 127 if peak > 0 else 1.0
+        self._codes[row] = np.clip(np.rint(vector / scale), -127, 127)
+        self._scales[row] = scale
+
+    def _block_dots(self, query_matrix: np.ndarray, block: Any) -> np.ndarray:
+        codes = self._codes[block].astype(np.float32)
+        return (query_matrix @ codes.T) * self._scales[block][np.newaxis, :]
+
+    def save(self, path: str):
+        super().save(path)
+        write_array(os.path.join(path, "codes.i8"), self._codes[: self._count])
+        write_array(os.path.join(path, "scales.f32"), self._scales[: self._count])
+
+    def _restore(self, path: str, meta: Dict[str, Any]):
+        super()._restore(path, meta)
+        if self._count:
+            self._codes = np.memmap(
+                os.path.join(path, "codes.i8"), dtype=np.int8, mode="r", shape=(self._count, self._vector_dim)
+            )
+            self._scales = np.memmap(
+                os.path.join(path, "scales.f32"), dtype=np.float32, mode="r", shape=(self._count,)
+            )
+
+    def __repr__(self) -> str:
+        return f"Int8VectorIndex(count={len(self)}, dim={self._vector_dim}, metric='{self._distance_metric}', rerank={self.rerank})"
+
+
+class PQVectorIndex(QuantizedVectorIndex):
+    """Product quantization with asymmetric distance computation (ADC).
+
+    Each vector is split into `n_subvectors` slices and every slice is
+    replaced by the id of its nearest of `n_centroids` k-means centroids,
+    so a vector costs n_subvectors bytes plus its norm. A search builds
+    one (n_subvectors, n_centroids) table of query-centroid dot products
+    and sums table lookups instead of touching the vectors. Until
+    `train_size` vectors have been added (or `train()` is called)
+    searches are exact over the on-disk vectors.
+    """
+
+    quantization = "pq"
+
+    def __init__(
+        self,
+        distance_metric: str = "cosine",
+        embedding_fn=None,
+        n_subvectors: int = 8,
+        n_centroids: int = 256,
+        train_size: Optional[int] = None,
+        kmeans_iters: int = 20,
+        seed: int = 0,
+        **kwargs,
+    ):
+        super().__init__(distance_metric=distance_metric, embedding_fn=embedding_fn, **kwargs)
+        if n_subvectors <= 0:
+            raise ValueError("n_subvectors must be a positive integer.")
+        if not 1 <= n_centroids <= 256:
+            raise ValueError("n_centroids must be between 1 and 256.")
+        self.n_subvectors = n_subvectors
+        self.n_centroids = n_centroids
+        self._train_size = train_size if train_size is not None else 40 * n_centroids
+        self._kmeans_iters = kmeans_iters
+        self._rng = np.random.default_rng(seed)
+        # Centroids of every subspace side by side: (n_centroids, dim)
+        self._codebook: Optional[np.ndarray] = None
+        self._codes = np.empty((0, n_subvectors), dtype=np.uint8)
+
+    @property
+    def is_trained(self) -> bool:
+        return self._codebook is not None
+
+    def _bounds(self) -> np.ndarray:
+        return np.linspace(0, self._vector_dim, self.n_subvectors + 1).astype(np.int64)
+
+    def _resident_arrays(self) -> List[np.ndarray]:
+        arrays = super()._resident_arrays()
+        if self.is_trained:
+            arrays += [self._codes[: self._count], self._codebook]
+        return arrays
+
+    def train(self, sample_size: Optional[int] = None):
+        """Learn one k-means codebook per subspace and encode the stored vectors."""
+        if len(self) == 0:
+            raise ValueError("Cannot train an empty index.")
+        if self.n_subvectors > self._vector_dim:
+            raise ValueError("n_subvectors cannot exceed the vector dimension.")
+        sample_size = sample_size or 64 * self.n_centroids
+        data = self.vectors
+        if len(data) > sample_size:
+            data = data[np.sort(self._rng.choice(len(data), sample_size, replace=False))]
+        data = np.asarray(data, dtype=np.float32)
+
+        n_centroids = min(self.n_centroids, len(data))
+        bounds = self._bounds()
+        codebook = np.empty((n_centroids, self._vector_dim), dtype=np.float32)
+        for a, b in zip(bounds[:-1], bounds[1:]):
+            codebook[:, a:b] = self._kmeans(data[:, a:b], n_centroids)
+        self._codebook = codebook
+
+        self._codes = np.empty((len(self._norms), self.n_subvectors), dtype=np.uint8)
+        vectors = self.vectors
+        for start in range(0, self._count, self._chunk_size):
+            stop = min(start + self._chunk_size, self._count)
+            self._codes[start:stop] = self._encode_block(np.asarray(vectors[start:stop]))
+
+    def _kmeans(self, data: np.ndarray, n_clusters: int) -> np.ndarray:
+        centroids = data[self._rng.choice(len(data), n_clusters, replace=False)].copy()
+        for _ in range(self._kmeans_iters):
+            assignment = self._nearest(data, centroids)
+            counts = np.bincount(assignment, minlength=n_clusters)
+            order = np.argsort(assignment, kind="stable")
+            starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+            non_empty = counts > 0
+            sums = np.add.reduceat(data[order], starts[non_empty], axis=0)
+            centroids[non_empty] = sums / counts[non_empty, np.newaxis]
+            empty = np.flatnonzero(~non_empty)
+            centroids[empty] = data[self._rng.integers(len(data), size=len(empty))]
+        return centroids
+
+    @staticmethod
+    def _nearest(points: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+        # ||x||^2 is constant per row, so it does not affect the argmin
+        scores = (centroids ** 2).sum(axis=1)[np.newaxis, :] - 2 * (points @ centroids.T)
+        return scores.argmin(axis=1)
+
+    def _encode_block(self, vectors: np.ndarray) -> np.ndarray:
+        bounds = self._bounds()
+        codes = np.empty((len(vectors), self.n_subvectors), dtype=np.uint8)
+        for j, (a, b) in enumerate(zip(bounds[:-1], bounds[1:])):
+            codes[:, j] = self._nearest(vectors[:, a:b], self._codebook[:, a:b])
+        return codes
+
+    def add_vector(self, vector, document: Dict[str, Any]):
+        super().add_vector(vector, document)
+        if not self.is_trained and len(self) >= self._train_size:
+            self.train()
+
+    def _grow_codes(self, capacity: int):
+        if self.is_trained:
+            self._codes = _grow_rows(self._codes, capacity, self._count)
+
+    def _encode(self, row: int, vector: np.ndarray):
+        if self.is_trained:
+            self._codes[row] = self._encode_block(vector[np.newaxis, :])[0]
+
+    def _block_dots(self, query_matrix: np.ndarray, block: Any) -> np.ndarray:
+        if not self.is_trained:
+            return query_matrix @ np.asarray(self.vectors[block]).T
+        codes = self._codes[block]
+        bounds = self._bounds()
+        dots = np.zeros((len(query_matrix), len(codes)), dtype=np.float32)
+        for j, (a, b) in enumerate(zip(bounds[:-1], bounds[1:])):
+            table = query_matrix[:, a:b] @ self._codebook[:, a:b].T
+            dots += table[:, codes[:, j]]
+        return dots
+
+    def _distances_many(
+        self, query_matrix: np.ndarray, rows: Optional[np.ndarray] = None
+    ) -> np.ndarray:
+        if not self.is_trained:
+            # Exact until trained, straight from the on-disk vectors
+            vectors = self.vectors if rows is None else self.vectors[rows]
+            norms = self._norms[: self._count] if rows is None else self._norms[rows]
+            return self._dots_to_distances(query_matrix, query_matrix @ vectors.T, norms)
+        return super()._distances_many(query_matrix, rows)
+
+    def _quantizer_meta(self) -> Dict[str, Any]:
+        return {
+            **super()._quantizer_meta(),
+            "n_subvectors": self.n_subvectors,
+            "n_centroids": self.n_centroids,
+        }
+
+    def save(self, path: str):
+        super().save(path)
+        if self.is_trained:
+            write_array(os.path.join(path, "codebook.f32"), self._codebook)
+            write_array(os.path.join(path, "codes.u8"), self._codes[: self._count])
+
+    def _restore(self, path: str, meta: Dict[str, Any]):
+        super()._restore(path, meta)
+        self.n_subvectors = meta["n_subvectors"]
+        self.n_centroids = meta["n_centroids"]
+        codebook_path = os.path.join(path, "codebook.f32")
+        if not os.path.exists(codebook_path):
+            return
+        self._codebook = np.fromfile(codebook_path, dtype=np.float32).reshape(-1, self._vector_dim)
+        self._codes = np.memmap(
+            os.path.join(path, "codes.u8"), dtype=np.uint8, mode="r", shape=(self._count, self.n_subvectors)
+        )
+
+    def __repr__(self) -> str:
+        return f"PQVectorIndex(count={len(self)}, dim={self._vector_dim}, metric='{self._distance_metric}', n_subvectors={self.n_subvectors}, trained={self.is_trained}, rerank={self.rerank})"
+
+
+def report(n: int = 20000, dim: int = 256, n_queries: int = 100, k: int = 10, seed: int = 0):
+    """Print memory per index against recall@k and latency on synthetic embeddings."""
+    rng = np.random.default_rng(seed)
+    # Embeddings have most of their variance in a few directions, so draw
+    # the data from a 32-dimensional subspace plus a little isotropic noise
+    basis = rng.normal(size=(32, dim))
+    scales = 1.0 / np.arange(1, 33)
+    data = (rng.normal(size=(n, 32)) * scales) @ basis + 0.05 * rng.normal(size=(n, dim))
+    queries = (rng.normal(size=(n_queries, 32)) * scales) @ basis + 0.05 * rng.normal(size=(n_queries, dim))
+    data, queries = data.astype(np.float32), queries.astype(np.float32)
+
+    exact = VectorIndex()
+    indexes = {
+        "int8": Int8VectorIndex(),
+        "pq m=16": PQVectorIndex(n_subvectors=16, rerank_factor=10),
+        "pq m=32": PQVectorIndex(n_subvectors=32, rerank_factor=10),
+    }
+    for i, vector in enumerate(data):
+        document = {"content": f"doc {i}"}
+        exact.add_vector(vector, document)
+        for index in indexes.values():
+            index.add_vector(vector, document)
+
+    exact_mb = (exact.vectors.nbytes + len(exact) * 4) / 2 ** 20
+    list_mb = n * (dim * 8 + 56) / 2 ** 20
+    print(f"{'python lists':<16} {list_mb:8.1f} MB  (estimate: 8-byte pointers to shared floats)")
+    print(f"{'float32 exact':<16} {exact_mb:8.1f} MB  recall@{k}=1.000")
+
+    for name, index in indexes.items():
+        mb = index.memory_bytes() / 2 ** 20
+        for rerank in (False, True):
+            start = time.perf_counter()
+            for query in queries:
+                index.search(query, k, rerank=rerank)
+            ms = (time.perf_counter() - start) / n_queries * 1000
+            recall = recall_at_k(exact, index, queries, k, rerank=rerank)
+            label = f"{name}{' +rerank' if rerank else ''}"
+            print(f"{label:<16} {mb:8.1f} MB  recall@{k}={recall:.3f}  {ms:.2f} ms/query")
+        index.close()
+
+
+if __name__ == "__main__":
+    report()
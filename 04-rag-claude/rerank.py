@@ -0,0 +1,175 @@
+# Reranking stage between retrieval and the model
+import hashlib
+import json
+import re
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, List, Optional, Sequence, Tuple
+
+from hybrid_retriever import default_document_key
+
+
+class LexicalOverlapScorer:
+    """Cheap local stand-in for a cross-encoder.
+
+    Scores each document by the fraction of query terms and query
+    bigrams it contains, in [0, 1].
+    """
+
+    def __init__(self, bigram_weight: float = 0.5):
+        self.bigram_weight = bigram_weight
+
+    @staticmethod
+    def _tokenize(text: str) -> List[str]:
+        return re.findall(r"\w+", text.lower())
+
+    def score(self, query: str, documents: Sequence[Dict[str, Any]]) -> List[float]:
+        query_tokens = self._tokenize(query)
+        if not query_tokens:
+            return [0.0] * len(documents)
+        query_terms = set(query_tokens)
+        query_bigrams = set(zip(query_tokens, query_tokens[1:]))
+
+        scores = []
+        for document in documents:
+            tokens = self._tokenize(document["content"])
+            terms = set(tokens)
+            score = len(query_terms & terms) / len(query_terms)
+            if query_bigrams:
+                bigrams = set(zip(tokens, tokens[1:]))
+                bigram_score = len(query_bigrams & bigrams) / len(query_bigrams)
+                score = (score + self.bigram_weight * bigram_score) / (1 + self.bigram_weight)
+            scores.append(score)
+        return scores
+
+
+class LLMScorer:
+    """Scores all candidates for a query with one batched Claude request.
+
+    `chat_factory` returns a fresh chat object with the AnthropicChat
+    `send_message` interface (a new one per call so no history leaks
+    between queries). Scores are the model's 0-10 ratings scaled to [0, 1].
+    """
+
+    SYSTEM_PROMPT = (
+        "You rate how relevant passages are to a search query. "
+        "Respond with only a JSON array of integers from 0 (irrelevant) to 10 "
+        "(directly answers the query), one per passage, in passage order."
+    )
+
+    def __init__(self, chat_factory: Callable[[], Any], max_chars: int = 1500, max_tokens: int = 200):
+        self._chat_factory = chat_factory
+        self.max_chars = max_chars
+        self.max_tokens = max_tokens
+
+    def _build_prompt(self, query: str, documents: Sequence[Dict[str, Any]]) -> str:
+        passages = "\n".join(
+            f'<passage index="{i}">\n{document["content"][: self.max_chars]}\n</passage>'
+            for i, document in enumerate(documents)
+        )
+        return f"<query>{query}</query>\n\n{passages}\n\nRate all {len(documents)} passages."
+
+    def score(self, query: str, documents: Sequence[Dict[str, Any]]) -> List[float]:
+        if not documents:
+            return []
+        chat = self._chat_factory()
+        response = chat.send_message(
+            self._build_prompt(query, documents),
+            system=self.SYSTEM_PROMPT,
+            max_tokens=self.max_tokens,
+        )
+        match = re.search(r"\[.*?\]", response["answer"], re.DOTALL)
+        if not match:
+            raise ValueError(f"Could not parse relevance scores from: {response['answer']!r}")
+        ratings = json.loads(match.group())
+        if len(ratings) != len(documents):
+            raise ValueError(f"Expected {len(documents)} scores, got {len(ratings)}")
+        return [min(max(float(rating), 0.0), 10.0) / 10 for rating in ratings]
+
+
+class Reranker:
+    """Reorders retrieved candidates with a pluggable scorer.
+
+    Only the top `top_n` candidates are scored. Candidates are scored in
+    retrieval order, `batch_size` at a time (None scores them in one
+    call); once a whole batch scores below `threshold` the rest are
+    skipped, and results below `threshold` are dropped. Scores are kept
+    in an LRU cache keyed by (query hash, candidate ids).
+
+    Results are (document, score) pairs sorted best first, higher is better.
+    """
+
+    def __init__(
+        self,
+        scorer,
+        top_n: int = 20,
+        threshold: Optional[float] = None,
+        batch_size: Optional[int] = None,
+        cache_size: int = 1024,
+        document_key: Callable[[Dict[str, Any]], Hashable] = default_document_key,
+    ):
+        if top_n <= 0:
+            raise ValueError("top_n must be a positive integer.")
+        self.scorer = scorer
+        self.top_n = top_n
+        self.threshold = threshold
+        self.batch_size = batch_size
+        self.cache_size = cache_size
+        self._document_key = document_key
+        self._cache: "OrderedDict[Tuple[str, str], List[float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _make_key(self, query: str, documents: Sequence[Dict[str, Any]]) -> Tuple[str, str]:
+        query_hash = hashlib.sha256(query.encode("utf-8")).hexdigest()
+        ids = json.dumps([str(self._document_key(d)) for d in documents], ensure_ascii=False)
+        return query_hash, hashlib.sha256(ids.encode("utf-8")).hexdigest()
+
+    def _score(self, query: str, documents: List[Dict[str, Any]]) -> List[float]:
+        batch_size = self.batch_size or len(documents)
+        scores: List[float] = []
+        for start in range(0, len(documents), batch_size):
+            batch_scores = self.scorer.score(query, documents[start : start + batch_size])
+            scores.extend(batch_scores)
+            if self.threshold is not None and max(batch_scores, default=0.0) < self.threshold:
+                break
+        return scores
+
+    def rerank(
+        self,
+        query: str,
+        candidates: Sequence[Tuple[Dict[str, Any], float]],
+        k: Optional[int] = None,
+    ) -> List[Tuple[Dict[str, Any], float]]:
+        """Rerank (document, score) results from any index and return the best k."""
+        documents = [document for document, _ in candidates[: self.top_n]]
+        if not documents:
+            return []
+
+        key = self._make_key(query, documents)
+        with self._lock:
+            scores = self._cache.get(key)
+            if scores is not None:
+                self._cache.move_to_end(key)
+                self.hits += 1
+            else:
+                self.misses += 1
+        if scores is None:
+            scores = self._score(query, documents)
+            with self._lock:
+                self._cache[key] = scores
+                if len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+
+        # Early-cut candidates were never scored and are dropped here too
+        results = [
+            (document, score)
+            for document, score in zip(documents, scores)
+            if self.threshold is None or score >= self.threshold
+        ]
+        results.sort(key=lambda item: -item[1])
+        return results[:k] if k else results
+
+    def stats(self) -> Dict[str, int]:
+        return {"hits": self.hits, "misses": self.misses, "entries": len(self._cache)}
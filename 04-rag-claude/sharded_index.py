@@ -0,0 +1,313 @@
+# Sharded index serving: one worker process per shard, scatter-gather search
+import heapq
+import importlib
+import itertools
+import multiprocessing
+import os
+import queue
+import threading
+import time
+import zlib
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError
+from typing import Any, Callable, Dict, Hashable, Iterable, List, Optional, Tuple
+
+from hybrid_retriever import default_document_key
+from index_storage import read_json, write_json
+
+
+def shard_of(key: Hashable, n_shards: int) -> int:
+    """Stable shard number for a document key (Python's hash() is salted per process)."""
+    return zlib.crc32(repr(key).encode("utf-8")) % n_shards
+
+
+def build_shards(
+    path: str,
+    documents: Iterable[Dict[str, Any]],
+    n_shards: int,
+    index_factory: Callable[[], Any],
+    vectors: Optional[Iterable[Any]] = None,
+    document_key: Callable[[Dict[str, Any]], Hashable] = default_document_key,
+):
+    """Hash-partition documents into `n_shards` saved indexes under `path`.
+
+    index_factory returns an empty VectorIndex, BM25Index or subclass;
+    each shard is built in memory and written with its `save`. With
+    `vectors`, documents are added with `add_vector` instead of
+    `add_document`, so no embedding calls are made.
+    """
+    if n_shards <= 0:
+        raise ValueError("n_shards must be a positive integer.")
+    shards = [index_factory() for _ in range(n_shards)]
+    pairs = zip(documents, vectors) if vectors is not None else ((d, None) for d in documents)
+    for document, vector in pairs:
+        shard = shards[shard_of(document_key(document), n_shards)]
+        if vector is None:
+            shard.add_document(document)
+        else:
+            shard.add_vector(vector, document)
+
+    os.makedirs(path, exist_ok=True)
+    for i, shard in enumerate(shards):
+        shard.save(os.path.join(path, f"shard-{i:03d}"))
+    index_class = type(shards[0])
+    write_json(
+        os.path.join(path, "shards.json"),
+        {"n_shards": n_shards, "index_class": f"{index_class.__module__}:{index_class.__qualname__}"},
+    )
+
+
+def _serve_shard(shard_id: int, directory: str, index_class: str, load_kwargs: Dict[str, Any], requests, responses):
+    """Worker process: load one shard (memory-mapped) and answer searches until told to stop."""
+    try:
+        module, name = index_class.split(":")
+        index = getattr(importlib.import_module(module), name).load(directory, **load_kwargs)
+    except Exception as e:
+        responses.put((0, shard_id, False, f"{type(e).__name__}: {e}"))
+        return
+    responses.put((0, shard_id, True, len(index)))
+
+    while True:
+        message = requests.get()
+        if message is None:
+            break
+        request_id, args, kwargs = message
+        try:
+            responses.put((request_id, shard_id, True, index.search(*args, **kwargs)))
+        except Exception as e:
+            responses.put((request_id, shard_id, False, f"{type(e).__name__}: {e}"))
+
+
+class _Gather:
+    """Per-shard replies collected for one request id."""
+
+    def __init__(self, n_shards: int, k: Optional[int]):
+        self.future: Future = Future()
+        self.k = k
+        self.replies: List[Any] = [None] * n_shards
+        self.remaining = n_shards
+        self.error: Optional[str] = None
+
+
+class ShardedIndex:
+    """Serves a directory written by `build_shards` from one process per shard.
+
+    Every query is sent to all shards; each returns its own top k, and
+    the per-shard lists (all sorted best first, lowest score) are merged
+    with a heap. Shards load through the index's `load`, so vectors and
+    postings are memory-mapped rather than copied into each process.
+
+    Any number of client threads may call `search` at once: requests are
+    tagged with an id and a dispatcher thread routes each shard's reply
+    back to the waiting caller, so shards work on different queries in
+    parallel. String queries for vector shards are embedded once here
+    with `embedding_fn` rather than in every worker.
+
+    The dispatcher also watches the workers: if one dies, every pending
+    and later request fails at once instead of waiting out `timeout`.
+
+    BM25 scores use each shard's own IDF and length statistics. Hash
+    partitioning keeps those close to the global values on large
+    corpora, but on small ones the merged order can differ slightly
+    from a single index.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        embedding_fn: Optional[Callable[[str], Any]] = None,
+        load_kwargs: Optional[Dict[str, Any]] = None,
+        timeout: float = 30.0,
+    ):
+        meta = read_json(os.path.join(path, "shards.json"))
+        self.n_shards = meta["n_shards"]
+        self.timeout = timeout
+        self._embedding_fn = embedding_fn
+        self._lock = threading.Lock()
+        self._request_ids = itertools.count(1)
+        self._pending: Dict[int, _Gather] = {0: _Gather(self.n_shards, None)}
+        self._closed = False
+        self._failure: Optional[str] = None
+
+        context = multiprocessing.get_context()
+        self._responses = context.Queue()
+        self._requests = [context.Queue() for _ in range(self.n_shards)]
+        self._workers = [
+            context.Process(
+                target=_serve_shard,
+                args=(
+                    i,
+                    os.path.join(path, f"shard-{i:03d}"),
+                    meta["index_class"],
+                    load_kwargs or {},
+                    self._requests[i],
+                    self._responses,
+                ),
+                daemon=True,
+                name=f"shard-{i:03d}",
+            )
+            for i in range(self.n_shards)
+        ]
+        for worker in self._workers:
+            worker.start()
+        self._dispatcher = threading.Thread(target=self._dispatch, daemon=True, name="shard-dispatcher")
+        self._dispatcher.start()
+
+        try:
+            self.shard_sizes = self._pending[0].future.result(timeout=timeout)
+        except BaseException:
+            self.close()
+            raise
+
+    def _dispatch(self, liveness_interval: float = 1.0):
+        while True:
+            try:
+                message = self._responses.get(timeout=liveness_interval)
+            except queue.Empty:
+                self._check_workers()
+                continue
+            if message is None:
+                break
+            request_id, shard_id, ok, payload = message
+            with self._lock:
+                gather = self._pending.get(request_id)
+                if gather is None:
+                    continue
+                if ok:
+                    gather.replies[shard_id] = payload
+                elif gather.error is None:
+                    gather.error = f"shard {shard_id}: {payload}"
+                gather.remaining -= 1
+                if gather.remaining:
+                    continue
+                del self._pending[request_id]
+            if gather.error is not None:
+                gather.future.set_exception(RuntimeError(gather.error))
+            elif gather.k is None:
+                gather.future.set_result(gather.replies)
+            else:
+                merged = heapq.merge(*gather.replies, key=lambda item: item[1])
+                gather.future.set_result(list(itertools.islice(merged, gather.k)))
+
+    def _check_workers(self):
+        """Fail every pending request, and refuse new ones, once a shard worker has died."""
+        with self._lock:
+            if self._closed or self._failure is not None:
+                return
+            dead = [worker for worker in self._workers if not worker.is_alive()]
+            if not dead:
+                return
+            self._failure = f"shard worker {dead[0].name} died (exit code {dead[0].exitcode})"
+            pending = list(self._pending.values())
+            self._pending.clear()
+        for gather in pending:
+            if not gather.future.done():
+                gather.future.set_exception(RuntimeError(self._failure))
+
+    def _forget(self, request_id: int):
+        with self._lock:
+            self._pending.pop(request_id, None)
+
+    def _result(self, request_id: int, future: Future) -> Any:
+        try:
+            return future.result(timeout=self.timeout)
+        except TimeoutError:
+            # Late replies for a forgotten id are dropped by the dispatcher
+            self._forget(request_id)
+            raise
+
+    def submit(self, query: Any, k: int = 1, **kwargs) -> Future:
+        """Scatter a search to every shard; the Future resolves to the merged top k.
+
+        Cancelling the Future (e.g. after giving up on it) drops the request.
+        """
+        return self._submit(query, k, **kwargs)[1]
+
+    def _submit(self, query: Any, k: int, **kwargs) -> Tuple[int, Future]:
+        if k <= 0:
+            raise ValueError("k must be a positive integer.")
+        if isinstance(query, str) and self._embedding_fn is not None:
+            query = self._embedding_fn(query)
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("ShardedIndex is closed.")
+            if self._failure is not None:
+                raise RuntimeError(self._failure)
+            request_id = next(self._request_ids)
+            gather = _Gather(self.n_shards, k)
+            self._pending[request_id] = gather
+        gather.future.add_done_callback(lambda future: future.cancelled() and self._forget(request_id))
+        for requests in self._requests:
+            requests.put((request_id, (query, k), kwargs))
+        return request_id, gather.future
+
+    def search(self, query: Any, k: int = 1, **kwargs) -> List[Tuple[Dict[str, Any], float]]:
+        """Like the shard index's `search`; extra keyword arguments (e.g. filter) go to every shard."""
+        return self._result(*self._submit(query, k, **kwargs))
+
+    def search_many(self, queries: Any, k: int = 1, **kwargs) -> List[List[Tuple[Dict[str, Any], float]]]:
+        """Submit every query before waiting, so the shards pipeline them."""
+        submitted = [self._submit(query, k, **kwargs) for query in queries]
+        try:
+            return [self._result(request_id, future) for request_id, future in submitted]
+        except BaseException:
+            for request_id, _ in submitted:
+                self._forget(request_id)
+            raise
+
+    def close(self):
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+        for requests in self._requests:
+            requests.put(None)
+        for worker in self._workers:
+            worker.join(timeout=5)
+            if worker.is_alive():
+                worker.terminate()
+        self._responses.put(None)
+        self._dispatcher.join(timeout=5)
+
+    def __enter__(self) -> "ShardedIndex":
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __len__(self) -> int:
+        return sum(self.shard_sizes)
+
+    def __repr__(self) -> str:
+        return f"ShardedIndex(count={len(self)}, shards={self.n_shards})"
+
+
+def benchmark(n: int = 200000, n_queries: int = 2000, clients: int = 16, k: int = 10, seed: int = 0):
+    """Print BM25 query throughput for 1, 2, 4, ... shards up to the CPU count."""
+    import random
+    import tempfile
+
+    from bm25_index import BM25Index
+
+    rng = random.Random(seed)
+    vocabulary = [f"term{i}" for i in range(20000)]
+    # Zipf-like term frequencies, like natural text
+    weights = [1 / (rank + 1) for rank in range(len(vocabulary))]
+    documents = [
+        {"id": i, "content": " ".join(rng.choices(vocabulary, weights, k=60))} for i in range(n)
+    ]
+    queries = [" ".join(rng.choices(vocabulary[:2000], k=4)) for _ in range(n_queries)]
+
+    n_shards = 1
+    while n_shards <= (os.cpu_count() or 1):
+        with tempfile.TemporaryDirectory() as path:
+            build_shards(path, documents, n_shards, BM25Index)
+            with ShardedIndex(path) as index, ThreadPoolExecutor(clients) as pool:
+                start = time.perf_counter()
+                list(pool.map(lambda q: index.search(q, k), queries))
+                elapsed = time.perf_counter() - start
+        print(f"shards={n_shards:<3} {n_queries / elapsed:8.1f} queries/s")
+        n_shards *= 2
+
+
+if __name__ == "__main__":
+    benchmark()
@@ -0,0 +1,83 @@
+import numpy as np
+import pytest
+
+from ann_index import IVFIndex, recall_at_k
+from vector_index import VectorIndex
+
+
+def clustered_data(n=3000, dim=32, n_queries=40, seed=0):
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(30, dim))
+    data = centers[rng.integers(len(centers), size=n)] + 0.3 * rng.normal(size=(n, dim))
+    queries = centers[rng.integers(len(centers), size=n_queries)] + 0.3 * rng.normal(size=(n_queries, dim))
+    return data.astype(np.float32), queries.astype(np.float32)
+
+
+def build(data, metric="cosine", **kwargs):
+    exact = VectorIndex(distance_metric=metric)
+    ivf = IVFIndex(distance_metric=metric, **kwargs)
+    for i, vector in enumerate(data):
+        document = {"id": i, "content": f"doc {i}"}
+        exact.add_vector(vector, document)
+        ivf.add_vector(vector, document)
+    return exact, ivf
+
+
+def test_untrained_index_searches_exactly():
+    data, queries = clustered_data(n=200)
+    exact, ivf = build(data, n_lists=16)
+
+    assert not ivf.is_trained
+    assert recall_at_k(exact, ivf, queries, k=10) == 1.0
+    assert not ivf.is_trained
+
+
+@pytest.mark.parametrize("metric", ["cosine", "euclidean"])
+def test_recall_grows_with_nprobe(metric):
+    data, queries = clustered_data()
+    exact, ivf = build(data, metric=metric, n_lists=32)
+    ivf.train()
+
+    recalls = [recall_at_k(exact, ivf, queries, k=10, nprobe=nprobe) for nprobe in (1, 4, 32)]
+
+    assert recalls == sorted(recalls)
+    assert recalls[1] >= 0.9
+    # Probing every list is an exact scan
+    assert recalls[2] == 1.0
+
+
+def test_search_trains_once_train_size_is_reached():
+    data, _ = clustered_data(n=400)
+    _, ivf = build(data, n_lists=8, train_size=400)
+
+    ivf.search(data[0], k=1)
+
+    assert ivf.is_trained
+    assert sum(len(rows) for rows in ivf._lists) == 400
+
+
+def test_vectors_added_after_training_are_searchable():
+    data, _ = clustered_data(n=500)
+    _, ivf = build(data[:400], n_lists=8)
+    ivf.train()
+    for i, vector in enumerate(data[400:], start=400):
+        ivf.add_vector(vector, {"id": i, "content": f"doc {i}"})
+
+    for i in (400, 450, 499):
+        doc, distance = ivf.search(data[i], k=1, nprobe=1)[0]
+        assert doc["id"] == i
+        assert distance == pytest.approx(0.0, abs=1e-5)
+
+
+def test_saved_index_keeps_its_lists(tmp_path):
+    data, queries = clustered_data(n=1000)
+    exact, ivf = build(data, n_lists=16)
+    ivf.train()
+    ivf.save(str(tmp_path))
+
+    loaded = IVFIndex.load(str(tmp_path), n_lists=16)
+
+    assert loaded.is_trained
+    # Loaded documents are fresh dicts, so recall has to match them by key
+    assert recall_at_k(ivf, loaded, queries, k=10, nprobe=4) == 1.0
+    assert recall_at_k(exact, loaded, queries, k=10, nprobe=16) == 1.0
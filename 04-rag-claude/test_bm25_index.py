@@ -0,0 +1,128 @@
+import math
+import random
+from collections import Counter
+
+import pytest
+
+from bm25_index import BM25Index
+
+VOCABULARY = [f"w{i}" for i in range(60)]
+
+
+def make_corpus(n, seed=0):
+    rng = random.Random(seed)
+    # Skewed term frequencies give MaxScore both common and rare terms to order
+    weights = [1 / (rank + 1) for rank in range(len(VOCABULARY))]
+    return [
+        {"id": i, "content": " ".join(rng.choices(VOCABULARY, weights, k=rng.randint(3, 40)))}
+        for i in range(n)
+    ]
+
+
+def make_queries(n, seed=1):
+    rng = random.Random(seed)
+    return [" ".join(rng.choices(VOCABULARY, k=rng.randint(1, 6))) for _ in range(n)]
+
+
+def brute_force_scores(documents, query, k1=1.5, b=0.75):
+    """Raw BM25 score of every live document, computed straight from the definition."""
+    tokenized = {i: doc["content"].split() for i, doc in enumerate(documents) if doc is not None}
+    n = len(tokenized)
+    avg_len = sum(len(tokens) for tokens in tokenized.values()) / n
+    doc_freq = Counter(term for tokens in tokenized.values() for term in set(tokens))
+    scores = {}
+    for doc_id, tokens in tokenized.items():
+        tf = Counter(tokens)
+        score = 0.0
+        for term, count in Counter(query.split()).items():
+            if tf[term] == 0:
+                continue
+            idf = math.log((n - doc_freq[term] + 0.5) / (doc_freq[term] + 0.5) + 1)
+            score += count * idf * tf[term] * (k1 + 1) / (
+                tf[term] + k1 * (1 - b + b * len(tokens) / avg_len) + 1e-9
+            )
+        if score > 1e-9:
+            scores[doc_id] = score
+    return scores
+
+
+def assert_matches_brute_force(index, documents, queries, k):
+    for query in queries:
+        expected = brute_force_scores(documents, query)
+        best = sorted(expected.values(), reverse=True)[:k]
+        results = index.search(query, k)
+
+        assert len(results) == len(best)
+        raw_scores = [-math.log(score) / 0.1 for _, score in results]
+        assert raw_scores == pytest.approx(best, rel=1e-6)
+        # Ties may be broken either way; every hit must carry its true score
+        for doc, raw in zip((doc for doc, _ in results), raw_scores):
+            assert expected[doc["id"]] == pytest.approx(raw, rel=1e-6)
+
+
+@pytest.mark.parametrize("k", [1, 5, 20])
+def test_top_k_matches_brute_force(k):
+    documents = make_corpus(400)
+    index = BM25Index()
+    for doc in documents:
+        index.add_document(doc)
+
+    assert_matches_brute_force(index, documents, make_queries(50), k)
+
+
+def test_repeated_query_terms_are_weighted():
+    documents = make_corpus(200)
+    index = BM25Index()
+    for doc in documents:
+        index.add_document(doc)
+
+    assert_matches_brute_force(index, documents, ["w1 w1 w40", "w50 w50 w50 w2"], 10)
+
+
+def test_unknown_terms_return_nothing():
+    index = BM25Index()
+    index.add_document({"content": "alpha beta"})
+
+    assert index.search("gamma", 3) == []
+    assert index.search("", 3) == []
+
+
+def test_removal_matches_rebuilt_statistics():
+    documents = make_corpus(400)
+    index = BM25Index()
+    for doc in documents:
+        index.add_document(doc)
+
+    rng = random.Random(2)
+    # Enough removals to push some terms past the compaction threshold
+    for doc_id in rng.sample(range(len(documents)), 250):
+        index.remove_document(doc_id)
+        documents[doc_id] = None
+
+    assert len(index) == 150
+    assert [doc is None for doc in index.documents] == [doc is None for doc in documents]
+    assert_matches_brute_force(index, documents, make_queries(50), 10)
+
+
+def test_update_appends_a_new_version():
+    index = BM25Index()
+    old_id = index.add_document({"id": 0, "content": "alpha beta"})
+    index.add_document({"id": 1, "content": "gamma"})
+
+    new_id = index.update_document(old_id, {"id": 2, "content": "delta"})
+
+    assert new_id == 2
+    assert index.documents[old_id] is None
+    assert index.search("alpha", 3) == []
+    assert [doc["id"] for doc, _ in index.search("delta", 3)] == [2]
+
+
+def test_removing_twice_raises():
+    index = BM25Index()
+    doc_id = index.add_document({"content": "alpha"})
+    index.remove_document(doc_id)
+
+    with pytest.raises(KeyError):
+        index.remove_document(doc_id)
+    with pytest.raises(KeyError):
+        index.update_document(5, {"content": "beta"})
@@ -0,0 +1,172 @@
+import random
+import re
+
+import pytest
+
+from chunking import (
+    SENTENCE_BOUNDARY,
+    TextSource,
+    chunk_by_char,
+    chunk_by_section,
+    chunk_by_sentence,
+    chunk_by_tokens,
+    count_tokens,
+    iter_chunk_by_char,
+    iter_chunk_by_section,
+    iter_chunk_by_sentence,
+    iter_chunk_by_tokens,
+    iter_documents,
+)
+
+
+def make_text(n_sections=6, seed=0):
+    rng = random.Random(seed)
+    words = ["data", "index", "vector", "query", "token", "chunk", "naïve", "café", "日本"]
+    sections = []
+    for s in range(n_sections):
+        sentences = [
+            " ".join(rng.choices(words, k=rng.randint(2, 12))).capitalize() + rng.choice(".!?")
+            for _ in range(rng.randint(1, 9))
+        ]
+        sections.append(f"Section {s}\n" + " ".join(sentences))
+    return "Intro line.\n## " + "\n## ".join(sections)
+
+
+@pytest.fixture
+def text_file(tmp_path):
+    path = tmp_path / "doc.md"
+    path.write_text(make_text(), encoding="utf-8")
+    return str(path)
+
+
+@pytest.mark.parametrize("chunk_size,chunk_overlap", [(150, 20), (10, 3), (1000, 0), (7, 6)])
+def test_char_chunks_match_the_list_version(chunk_size, chunk_overlap):
+    text = make_text()
+
+    chunks = [chunk.text for chunk in iter_chunk_by_char(text, chunk_size, chunk_overlap)]
+
+    assert chunks == chunk_by_char(text, chunk_size, chunk_overlap)
+
+
+@pytest.mark.parametrize("max_sentences,overlap", [(5, 1), (1, 0), (3, 2), (100, 0)])
+def test_sentence_chunks_match_the_list_version(max_sentences, overlap):
+    # Single spaces between sentences, so keeping the original whitespace changes nothing
+    text = make_text().replace("\n", " ")
+
+    chunks = [chunk.text for chunk in iter_chunk_by_sentence(text, max_sentences, overlap)]
+
+    assert chunks == chunk_by_sentence(text, max_sentences, overlap)
+
+
+def test_section_chunks_match_the_list_version():
+    text = make_text()
+
+    assert [chunk.text for chunk in iter_chunk_by_section(text)] == chunk_by_section(text)
+
+
+def test_file_source_matches_the_string(text_file):
+    text = make_text()
+    source = TextSource.from_file(text_file)
+
+    assert [c.text for c in iter_chunk_by_section(source)] == chunk_by_section(text)
+    assert [c.text for c in iter_chunk_by_sentence(source, 4, 1)] == [
+        c.text for c in iter_chunk_by_sentence(text, 4, 1)
+    ]
+
+
+def test_file_char_chunks_never_split_a_character(text_file):
+    source = TextSource.from_file(text_file)
+
+    chunks = list(iter_chunk_by_char(source, chunk_size=5, chunk_overlap=2))
+
+    assert all("�" not in chunk.text for chunk in chunks)
+    assert all(len(chunk.text.encode("utf-8")) == chunk.end - chunk.start for chunk in chunks)
+    assert chunks[0].start == 0 and chunks[-1].end == len(source)
+    # Consecutive chunks overlap or touch, so no byte is skipped
+    assert all(b.start <= a.end for a, b in zip(chunks, chunks[1:]))
+
+
+def test_empty_file(tmp_path):
+    path = tmp_path / "empty.txt"
+    path.write_text("")
+    source = TextSource.from_file(str(path))
+
+    assert list(iter_chunk_by_char(source)) == []
+    assert [c.text for c in iter_chunk_by_section(source)] == [""]
+
+
+def test_overlap_must_be_smaller_than_the_chunk():
+    with pytest.raises(ValueError):
+        list(iter_chunk_by_char("abc", chunk_size=3, chunk_overlap=3))
+    with pytest.raises(ValueError):
+        list(iter_chunk_by_sentence("A. B.", max_sentences_per_chunk=2, overlap_sentences=2))
+
+
+def test_documents_carry_offsets_and_metadata(text_file):
+    source = TextSource.from_file(text_file)
+
+    documents = list(iter_documents(iter_chunk_by_section(source), kind="guide"))
+
+    assert documents[1]["source"] == text_file
+    assert documents[1]["kind"] == "guide"
+    assert documents[1]["content"] == source.text(documents[1]["start"], documents[1]["end"])
+
+
+def greedy_sentence_packing(text, max_tokens):
+    """List-based reference: pack whole sentences into chunks without overlap."""
+    chunks, current = [], []
+    for sentence in re.split(SENTENCE_BOUNDARY, text):
+        if current and count_tokens(" ".join(current + [sentence])) > max_tokens:
+            chunks.append(" ".join(current))
+            current = []
+        current.append(sentence)
+    chunks.append(" ".join(current))
+    return chunks
+
+
+@pytest.mark.parametrize("max_tokens", [40, 64, 200, 10000])
+def test_token_chunks_match_greedy_packing(max_tokens):
+    text = make_text().replace("\n", " ")
+
+    assert chunk_by_tokens(text, max_tokens, overlap_tokens=0) == greedy_sentence_packing(text, max_tokens)
+
+
+@pytest.mark.parametrize("unit", ["sentence", "section"])
+@pytest.mark.parametrize("max_tokens,overlap_tokens", [(16, 4), (32, 8), (64, 0), (256, 32)])
+def test_token_chunks_stay_within_budget(unit, max_tokens, overlap_tokens):
+    text = make_text() + " " + "x" * 300 + ". Tail sentence."
+
+    chunks = list(iter_chunk_by_tokens(text, max_tokens, overlap_tokens, unit))
+
+    assert all(count_tokens(chunk.text) <= max_tokens for chunk in chunks)
+    assert chunks[0].start == 0 and chunks[-1].end == len(text)
+    # Chunks move forward and only skip the separators between units
+    for a, b in zip(chunks, chunks[1:]):
+        assert a.start < b.start
+        assert text[a.end : b.start].strip() in ("", "##")
+    assert [c.text for c in chunks] == chunk_by_tokens(text, max_tokens, overlap_tokens, unit)
+
+
+def test_token_chunks_overlap_by_whole_sentences():
+    text = " ".join(f"Sentence number {i} is here." for i in range(20))
+
+    chunks = chunk_by_tokens(text, max_tokens=30, overlap_tokens=12)
+
+    for previous, current in zip(chunks, chunks[1:]):
+        first_sentence = re.split(SENTENCE_BOUNDARY, current)[0]
+        assert previous.endswith(first_sentence)
+
+
+def test_file_token_chunks_match_the_string(text_file):
+    text = make_text()
+    source = TextSource.from_file(text_file)
+
+    for unit in ("sentence", "section"):
+        assert [c.text for c in iter_chunk_by_tokens(source, 24, 6, unit)] == chunk_by_tokens(text, 24, 6, unit)
+
+
+def test_token_budget_arguments_are_checked():
+    with pytest.raises(ValueError):
+        chunk_by_tokens("A. B.", max_tokens=8, overlap_tokens=8)
+    with pytest.raises(ValueError):
+        chunk_by_tokens("A. B.", unit="paragraph")
@@ -0,0 +1,112 @@
+import threading
+
+import pytest
+
+from embedding_service import EmbeddingCache, EmbeddingService
+
+
+class FakeEmbedder:
+    """Deterministic embed_fn that records each batch and can fail a few times first."""
+
+    def __init__(self, failures=0):
+        self.batches = []
+        self.failures = failures
+        self._lock = threading.Lock()
+
+    def __call__(self, texts):
+        with self._lock:
+            if self.failures:
+                self.failures -= 1
+                raise RuntimeError("rate limited")
+            self.batches.append(list(texts))
+        return [[float(len(text)), float(sum(map(ord, text)) % 97)] for text in texts]
+
+
+@pytest.fixture
+def cache(tmp_path):
+    cache = EmbeddingCache(str(tmp_path / "embeddings.sqlite"))
+    yield cache
+    cache.close()
+
+
+def test_duplicates_are_embedded_once_and_order_is_kept():
+    embedder = FakeEmbedder()
+    service = EmbeddingService(embedder)
+
+    vectors = service.embed(["b", "a", "b", "cc", "a"])
+
+    assert vectors == [embedder([t])[0] for t in ["b", "a", "b", "cc", "a"]]
+    assert embedder.batches[0] == ["b", "a", "cc"]
+
+
+def test_batches_respect_size_and_token_limits():
+    embedder = FakeEmbedder()
+    service = EmbeddingService(
+        embedder, max_batch_size=3, max_batch_tokens=10, token_counter=len, max_workers=4
+    )
+
+    texts = ["aaaa", "bbbb", "cc", "d", "eeeeeeeeeeee", "f", "g", "h", "i"]
+    vectors = service.embed(texts)
+
+    assert len(vectors) == len(texts)
+    assert sorted(t for batch in embedder.batches for t in batch) == sorted(texts)
+    for batch in embedder.batches:
+        # A single text over the token budget still goes out on its own
+        assert len(batch) <= 3
+        assert len(batch) == 1 or sum(map(len, batch)) <= 10
+
+
+def test_cached_texts_are_not_sent_again(cache):
+    embedder = FakeEmbedder()
+    first = EmbeddingService(embedder, cache=cache).embed(["x", "y"])
+
+    service = EmbeddingService(embedder, cache=cache)
+    second = service.embed(["y", "z", "x"])
+
+    assert second == [first[1], embedder(["z"])[0], first[0]]
+    assert embedder.batches[1] == ["z"]
+    assert service.stats()["cache_hits"] == 2
+
+
+def test_cache_is_keyed_by_model_and_input_type(cache):
+    embedder = FakeEmbedder()
+    EmbeddingService(embedder, cache=cache, input_type="document").embed(["x"])
+    EmbeddingService(embedder, cache=cache, input_type="query").embed(["x"])
+    EmbeddingService(embedder, cache=cache, model="other").embed(["x"])
+
+    assert len(embedder.batches) == 3
+
+
+def test_failed_batches_are_retried(monkeypatch):
+    monkeypatch.setattr("embedding_service.time.sleep", lambda seconds: None)
+    embedder = FakeEmbedder(failures=2)
+    service = EmbeddingService(embedder, max_retries=2, base_delay=0.0)
+
+    assert service.embed(["x"]) == [embedder(["x"])[0]]
+    assert service.stats()["api_calls"] == 3
+
+
+def test_retries_give_up_after_max_retries(monkeypatch):
+    monkeypatch.setattr("embedding_service.time.sleep", lambda seconds: None)
+    service = EmbeddingService(FakeEmbedder(failures=3), max_retries=2, base_delay=0.0)
+
+    with pytest.raises(RuntimeError):
+        service.embed(["x"])
+
+
+def test_wrong_number_of_vectors_raises():
+    service = EmbeddingService(lambda texts: [[1.0]])
+
+    with pytest.raises(ValueError):
+        service.embed(["a", "b"])
+
+
+def test_embed_documents_pairs_vectors_with_documents():
+    embedder = FakeEmbedder()
+    service = EmbeddingService(embedder)
+    documents = [{"content": str(i)} for i in range(5)]
+
+    pairs = list(service.embed_documents(iter(documents), batch_size=2))
+
+    assert [document for _, document in pairs] == documents
+    assert [vector for vector, _ in pairs] == [embedder([d["content"]])[0] for d in documents]
@@ -0,0 +1,110 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from bm25_index import BM25Index
+from hybrid_retriever import HybridRetriever, default_document_key
+from vector_index import VectorIndex
+
+WORDS = ["apple", "banana", "cherry", "date", "elder", "fig", "grape", "honeydew"]
+
+DOCUMENTS = [
+    {"id": i, "content": content, "lang": "en" if i % 2 else "de"}
+    for i, content in enumerate([
+        "apple banana apple",
+        "banana cherry",
+        "cherry date elder",
+        "fig grape",
+        "apple fig honeydew",
+        "grape grape banana",
+        "date elder fig apple",
+        "honeydew",
+    ])
+]
+
+
+def embed(text):
+    """Bag-of-words vector, enough to give the dense leg its own ranking."""
+    tokens = text.split()
+    return [float(tokens.count(word)) + 0.01 * i for i, word in enumerate(WORDS)]
+
+
+@pytest.fixture
+def retriever():
+    vector_index = VectorIndex(embedding_fn=embed)
+    bm25_index = BM25Index()
+    for document in DOCUMENTS:
+        vector_index.add_document(document)
+        bm25_index.add_document(document)
+    retriever = HybridRetriever(vector_index, bm25_index, max_workers=1)
+    yield retriever
+    retriever.close()
+
+
+def expected_rrf(retriever, query, candidates, rrf_k=60):
+    scores = {}
+    for results in (
+        retriever.vector_index.search(query, candidates),
+        retriever.bm25_index.search(query, candidates),
+    ):
+        for rank, (document, _) in enumerate(results, start=1):
+            scores[document["id"]] = scores.get(document["id"], 0.0) + 0.5 / (rrf_k + rank)
+    return scores
+
+
+@pytest.mark.parametrize("query", ["apple", "banana cherry", "fig grape honeydew"])
+def test_rrf_sums_reciprocal_ranks(retriever, query):
+    expected = expected_rrf(retriever, query, candidates=8)
+
+    results = retriever.search(query, k=3, candidates=8)
+
+    assert [score for _, score in results] == pytest.approx(sorted(expected.values(), reverse=True)[:3])
+    for document, score in results:
+        assert expected[document["id"]] == pytest.approx(score)
+
+
+def test_weighted_fusion_prefers_documents_both_legs_rank_first(retriever):
+    retriever.fusion = "weighted"
+
+    document, score = retriever.search("apple banana", k=1)[0]
+
+    assert document["id"] == 0
+    assert score == pytest.approx(1.0)
+
+
+def test_filter_applies_to_both_legs(retriever):
+    results = retriever.search("apple", k=8, filter={"lang": "de"})
+
+    assert results
+    assert all(document["lang"] == "de" for document, _ in results)
+
+
+def test_timings_are_recorded(retriever):
+    retriever.search("apple", k=2)
+
+    assert set(retriever.last_timings) == {"vector_ms", "bm25_ms", "fusion_ms", "total_ms"}
+
+
+def test_concurrent_callers_share_a_small_pool(retriever):
+    queries = ["apple", "banana", "cherry date", "grape"] * 10
+    expected = [retriever.search(q, k=3) for q in queries]
+
+    # More callers than pool threads: each caller runs its BM25 leg itself
+    with ThreadPoolExecutor(max_workers=8) as callers:
+        results = list(callers.map(lambda q: retriever.search(q, k=3), queries))
+
+    assert results == expected
+
+
+def test_default_document_key_prefers_id():
+    assert default_document_key({"id": 3, "content": "x"}) == 3
+    assert default_document_key({"content": "x"}) == "x"
+
+
+def test_invalid_arguments(retriever):
+    with pytest.raises(ValueError):
+        HybridRetriever(retriever.vector_index, retriever.bm25_index, fusion="max")
+    with pytest.raises(TypeError):
+        retriever.search(["apple"])
+    with pytest.raises(ValueError):
+        retriever.search("apple", k=0)
@@ -0,0 +1,111 @@
+import random
+
+import numpy as np
+import pytest
+
+from bm25_index import BM25Index
+from index_storage import LazyDocuments, write_documents
+from vector_index import VectorIndex
+
+WORDS = ["alpha", "beta", "gamma", "delta", "epsilon", "zeta", "eta", "theta", "iota", "kappa"]
+
+
+def make_bm25(n=300, seed=0):
+    rng = random.Random(seed)
+    index = BM25Index()
+    for i in range(n):
+        index.add_document({"id": i, "content": " ".join(rng.choices(WORDS, k=rng.randint(2, 20)))})
+    for doc_id in rng.sample(range(n), n // 3):
+        index.remove_document(doc_id)
+    return index
+
+
+def search_ids(index, queries, k=10):
+    return [[(doc["id"], round(score, 9)) for doc, score in index.search(q, k)] for q in queries]
+
+
+QUERIES = ["alpha", "beta gamma", "kappa kappa iota", "theta alpha zeta", "missing"]
+
+
+def test_documents_sidecar_round_trip(tmp_path):
+    documents = [{"content": "héllo"}, None, {"content": "x", "tags": ["a", "b"]}]
+    write_documents(str(tmp_path), documents)
+
+    loaded = LazyDocuments(str(tmp_path))
+    loaded.append({"content": "new"})
+    loaded[0] = None
+
+    assert list(loaded) == [None, None, {"content": "x", "tags": ["a", "b"]}, {"content": "new"}]
+    assert loaded[-1] == {"content": "new"}
+    with pytest.raises(IndexError):
+        loaded[4]
+
+
+def test_bm25_load_matches_the_saved_index(tmp_path):
+    index = make_bm25()
+    index.save(str(tmp_path))
+
+    loaded = BM25Index.load(str(tmp_path))
+
+    assert len(loaded) == len(index)
+    assert search_ids(loaded, QUERIES) == search_ids(index, QUERIES)
+    assert [doc is None for doc in loaded.documents] == [doc is None for doc in index.documents]
+
+
+def test_bm25_accepts_writes_after_load(tmp_path):
+    index = make_bm25()
+    index.save(str(tmp_path))
+    loaded = BM25Index.load(str(tmp_path))
+
+    for target in (index, loaded):
+        target.add_document({"id": "new", "content": "alpha omega"})
+        target.remove_document(next(i for i, doc in enumerate(target.documents) if doc is not None))
+
+    assert search_ids(loaded, QUERIES + ["omega"]) == search_ids(index, QUERIES + ["omega"])
+
+
+def test_bm25_can_be_saved_over_its_own_files(tmp_path):
+    index = make_bm25()
+    index.save(str(tmp_path))
+    loaded = BM25Index.load(str(tmp_path))
+    loaded.add_document({"id": "new", "content": "alpha omega"})
+    expected = search_ids(loaded, QUERIES + ["omega"])
+
+    # The loaded index still maps the files it is replacing
+    loaded.save(str(tmp_path))
+
+    assert search_ids(loaded, QUERIES + ["omega"]) == expected
+    assert search_ids(BM25Index.load(str(tmp_path)), QUERIES + ["omega"]) == expected
+    assert not [p for p in tmp_path.iterdir() if p.name.startswith(".")]
+
+
+def test_vector_index_load_is_memory_mapped(tmp_path):
+    rng = np.random.default_rng(0)
+    vectors = rng.normal(size=(100, 8)).astype(np.float32)
+    index = VectorIndex(distance_metric="euclidean")
+    for i, vector in enumerate(vectors):
+        index.add_vector(vector, {"id": i, "content": f"doc {i}"})
+    index.save(str(tmp_path))
+
+    loaded = VectorIndex.load(str(tmp_path))
+
+    assert isinstance(loaded.vectors, np.memmap)
+    assert loaded._distance_metric == "euclidean"
+    for query in vectors[:5]:
+        assert [doc["id"] for doc, _ in loaded.search(query, k=3)] == [
+            doc["id"] for doc, _ in index.search(query, k=3)
+        ]
+
+    # Adding to a loaded index copies the mapped matrix into memory
+    loaded.add_vector(vectors[0] + 100, {"id": "far", "content": "far"})
+    assert loaded.search(vectors[0] + 100, k=1)[0][0]["id"] == "far"
+    assert np.array_equal(VectorIndex.load(str(tmp_path)).vectors, vectors)
+
+
+def test_empty_vector_index_round_trip(tmp_path):
+    VectorIndex().save(str(tmp_path))
+
+    loaded = VectorIndex.load(str(tmp_path))
+
+    assert len(loaded) == 0
+    assert loaded.search([1.0, 2.0]) == []
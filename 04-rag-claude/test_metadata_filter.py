@@ -0,0 +1,99 @@
+import numpy as np
+import pytest
+
+from bm25_index import BM25Index
+from metadata_filter import MetadataIndex
+from vector_index import VectorIndex
+
+DOCUMENTS = [
+    {"content": "alpha report", "lang": "en", "tags": ["a", "b"], "date": "2024-01-05", "year": 2024},
+    {"content": "beta report", "lang": "de", "tags": ["b"], "date": "2024-03-01", "year": 2024},
+    {"content": "alpha memo", "lang": "en", "tags": [], "date": "2023-12-31", "year": 2023},
+    {"content": "gamma memo", "lang": "fr", "tags": ["a"], "date": "2025-02-10", "year": 2025},
+    {"content": "alpha beta", "lang": "en", "tags": ["c", "a"], "meta": {"nested": 1}},
+]
+
+
+def matching(filter):
+    index = MetadataIndex()
+    for doc_id, document in enumerate(DOCUMENTS):
+        index.add(doc_id, document)
+    return index.match(filter).tolist()
+
+
+@pytest.mark.parametrize(
+    "filter,expected",
+    [
+        ({"lang": "en"}, [0, 2, 4]),
+        ({"lang": ["de", "fr"]}, [1, 3]),
+        ({"tags": "a"}, [0, 3, 4]),
+        ({"tags": ["b", "c"]}, [0, 1, 4]),
+        ({"date": {"gte": "2024-01-01", "lt": "2025-01-01"}}, [0, 1]),
+        ({"year": {"gt": 2023}}, [0, 1, 3]),
+        ({"lang": "en", "tags": "a"}, [0, 4]),
+        ({"lang": "en", "year": {"lte": 2023}}, [2]),
+        ({"lang": "es"}, []),
+        ({"missing": "x"}, []),
+    ],
+)
+def test_filters_resolve_to_sorted_ids(filter, expected):
+    assert matching(filter) == expected
+
+
+def test_invalid_filters_raise():
+    index = MetadataIndex(fields=["lang"])
+    index.add(0, DOCUMENTS[0])
+
+    with pytest.raises(TypeError):
+        index.match({})
+    with pytest.raises(ValueError):
+        index.match({"year": 2024})
+    with pytest.raises(ValueError):
+        index.match({"lang": {"like": "e%"}})
+
+
+def test_only_listed_fields_are_indexed():
+    index = MetadataIndex(fields=["lang"])
+    for doc_id, document in enumerate(DOCUMENTS):
+        index.add(doc_id, document)
+
+    assert set(index._ids) == {"lang"}
+
+
+def test_save_and_load(tmp_path):
+    index = MetadataIndex()
+    for doc_id, document in enumerate(DOCUMENTS):
+        index.add(doc_id, document)
+    index.save(str(tmp_path))
+
+    loaded = MetadataIndex.load(str(tmp_path))
+
+    for filter in ({"lang": "en"}, {"tags": ["a", "b"]}, {"year": {"gte": 2024}}):
+        assert loaded.match(filter).tolist() == index.match(filter).tolist()
+    assert MetadataIndex.load(str(tmp_path / "absent")).fields is None
+
+
+def test_vector_index_only_scores_allowed_rows():
+    rng = np.random.default_rng(0)
+    index = VectorIndex()
+    for document in DOCUMENTS:
+        index.add_vector(rng.normal(size=4).tolist(), document)
+
+    query = rng.normal(size=4).tolist()
+    results = index.search(query, k=5, filter={"lang": "en"})
+    expected = [(d, s) for d, s in index.search(query, k=5) if d["lang"] == "en"]
+
+    assert results == expected
+    assert index.search_many([query], k=5, filter={"lang": "en"}) == [expected]
+    assert index.search(query, k=5, filter={"lang": "es"}) == []
+
+
+def test_bm25_index_skips_to_allowed_documents():
+    index = BM25Index()
+    for document in DOCUMENTS:
+        index.add_document(document)
+
+    results = index.search("alpha report", k=5, filter={"lang": "en"})
+
+    assert [d["content"] for d, _ in results] == ["alpha report", "alpha memo", "alpha beta"]
+    assert index.search("alpha", k=5, filter={"lang": "de"}) == []
@@ -0,0 +1,124 @@
+import numpy as np
+import pytest
+
+from ann_index import recall_at_k
+from quantized_index import Int8VectorIndex, PQVectorIndex
+from vector_index import VectorIndex
+
+
+def embedding_like_data(n=2000, dim=64, n_queries=30, seed=0):
+    rng = np.random.default_rng(seed)
+    basis = rng.normal(size=(16, dim))
+    scales = 1.0 / np.arange(1, 17)
+    data = (rng.normal(size=(n, 16)) * scales) @ basis + 0.05 * rng.normal(size=(n, dim))
+    queries = (rng.normal(size=(n_queries, 16)) * scales) @ basis + 0.05 * rng.normal(size=(n_queries, dim))
+    return data.astype(np.float32), queries.astype(np.float32)
+
+
+def build(index, data):
+    exact = VectorIndex()
+    for i, vector in enumerate(data):
+        document = {"id": i, "content": f"doc {i}"}
+        exact.add_vector(vector, document)
+        index.add_vector(vector, document)
+    return exact
+
+
+@pytest.fixture
+def int8_index():
+    index = Int8VectorIndex()
+    yield index
+    index.close()
+
+
+@pytest.fixture
+def pq_index():
+    index = PQVectorIndex(n_subvectors=32, n_centroids=64, rerank_factor=10)
+    yield index
+    index.close()
+
+
+def test_int8_recall_and_memory(int8_index):
+    data, queries = embedding_like_data()
+    exact = build(int8_index, data)
+
+    assert recall_at_k(exact, int8_index, queries, k=10, rerank=False) >= 0.9
+    assert recall_at_k(exact, int8_index, queries, k=10, rerank=True) >= 0.99
+    assert int8_index.memory_bytes() < exact.vectors.nbytes / 3
+
+
+def test_reranked_distances_are_exact(int8_index):
+    data, queries = embedding_like_data(n=300)
+    exact = build(int8_index, data)
+
+    for query in queries[:5]:
+        expected = {doc["id"]: d for doc, d in exact.search(query, k=300)}
+        for doc, distance in int8_index.search(query, k=5):
+            assert distance == pytest.approx(expected[doc["id"]], abs=1e-5)
+
+
+def test_pq_searches_exactly_until_trained(pq_index):
+    data, queries = embedding_like_data(n=500)
+    exact = build(pq_index, data)
+
+    assert not pq_index.is_trained
+    assert recall_at_k(exact, pq_index, queries, k=10, rerank=False) == 1.0
+
+
+def test_pq_recall_after_training(pq_index):
+    data, queries = embedding_like_data()
+    exact = build(pq_index, data)
+    pq_index.train()
+
+    approximate = recall_at_k(exact, pq_index, queries, k=10, rerank=False)
+    reranked = recall_at_k(exact, pq_index, queries, k=10, rerank=True)
+
+    assert approximate >= 0.5
+    assert reranked >= max(approximate, 0.95)
+    assert pq_index.memory_bytes() < exact.vectors.nbytes / 4
+
+
+def test_pq_encodes_vectors_added_after_training(pq_index):
+    data, _ = embedding_like_data(n=1200)
+    build(pq_index, data[:1000])
+    pq_index.train()
+    for i, vector in enumerate(data[1000:], start=1000):
+        pq_index.add_vector(vector, {"id": i, "content": f"doc {i}"})
+
+    doc, distance = pq_index.search(data[1100], k=1)[0]
+
+    assert doc["id"] == 1100
+    assert distance == pytest.approx(0.0, abs=1e-5)
+
+
+@pytest.mark.parametrize("cls", [Int8VectorIndex, PQVectorIndex])
+def test_save_and_load_round_trip(tmp_path, cls):
+    data, queries = embedding_like_data(n=600)
+    index = cls(n_subvectors=8, n_centroids=32) if cls is PQVectorIndex else cls()
+    build(index, data)
+    if cls is PQVectorIndex:
+        index.train()
+    index.save(str(tmp_path))
+
+    loaded = cls.load(str(tmp_path))
+    try:
+        for rerank in (False, True):
+            for query in queries:
+                expected = index.search(query, k=10, rerank=rerank)
+                results = loaded.search(query, k=10, rerank=rerank)
+                assert [doc["id"] for doc, _ in results] == [doc["id"] for doc, _ in expected]
+        # Appending to a loaded index copies the read-only vector file first
+        loaded.add_vector(data[0], {"id": "copy", "content": "copy"})
+        assert len(loaded) == len(data) + 1
+    finally:
+        loaded.close()
+        index.close()
+
+
+def test_loading_the_wrong_quantization_raises(tmp_path, int8_index):
+    data, _ = embedding_like_data(n=50)
+    build(int8_index, data)
+    int8_index.save(str(tmp_path))
+
+    with pytest.raises(ValueError):
+        PQVectorIndex.load(str(tmp_path))
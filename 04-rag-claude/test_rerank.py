@@ -0,0 +1,114 @@
+import pytest
+
+from rerank import LexicalOverlapScorer, LLMScorer, Reranker
+
+
+class RecordingScorer:
+    """Scores documents by their "score" field and records every batch it sees."""
+
+    def __init__(self):
+        self.calls = []
+
+    def score(self, query, documents):
+        self.calls.append([document["id"] for document in documents])
+        return [document["score"] for document in documents]
+
+
+def candidates(scores):
+    return [({"id": i, "content": f"doc {i}", "score": s}, 0.0) for i, s in enumerate(scores)]
+
+
+def test_reorders_best_first_and_cuts_to_k():
+    reranker = Reranker(RecordingScorer())
+
+    results = reranker.rerank("q", candidates([0.1, 0.9, 0.5]), k=2)
+
+    assert [(document["id"], score) for document, score in results] == [(1, 0.9), (2, 0.5)]
+
+
+def test_only_top_n_candidates_are_scored():
+    scorer = RecordingScorer()
+    reranker = Reranker(scorer, top_n=3)
+
+    reranker.rerank("q", candidates([0.1, 0.2, 0.3, 0.99, 0.98]))
+
+    assert scorer.calls == [[0, 1, 2]]
+
+
+def test_threshold_stops_after_a_batch_below_it():
+    scorer = RecordingScorer()
+    reranker = Reranker(scorer, threshold=0.5, batch_size=2)
+
+    results = reranker.rerank("q", candidates([0.9, 0.6, 0.2, 0.1, 0.8, 0.7]))
+
+    # The second batch scores below the threshold, so the third is never sent
+    assert scorer.calls == [[0, 1], [2, 3]]
+    assert [document["id"] for document, _ in results] == [0, 1]
+
+
+def test_cache_hits_skip_the_scorer():
+    scorer = RecordingScorer()
+    reranker = Reranker(scorer)
+    first = reranker.rerank("q", candidates([0.3, 0.7]))
+
+    second = reranker.rerank("q", candidates([0.3, 0.7]))
+    reranker.rerank("other", candidates([0.3, 0.7]))
+
+    assert second == first
+    assert len(scorer.calls) == 2
+    assert reranker.stats() == {"hits": 1, "misses": 2, "entries": 2}
+
+
+def test_cache_evicts_least_recently_used():
+    scorer = RecordingScorer()
+    reranker = Reranker(scorer, cache_size=2)
+    for query in ("a", "b"):
+        reranker.rerank(query, candidates([0.5]))
+    reranker.rerank("a", candidates([0.5]))  # "a" is now the most recent
+
+    reranker.rerank("c", candidates([0.5]))  # evicts "b"
+    reranker.rerank("a", candidates([0.5]))
+    reranker.rerank("b", candidates([0.5]))
+
+    assert len(scorer.calls) == 4
+    assert reranker.stats()["hits"] == 2
+
+
+def test_lexical_overlap_scores_terms_and_bigrams():
+    scorer = LexicalOverlapScorer(bigram_weight=1.0)
+
+    scores = scorer.score(
+        "red apple pie",
+        [{"content": "Red apple pie recipe"}, {"content": "pie with red apple"}, {"content": "banana"}],
+    )
+
+    assert scores == pytest.approx([1.0, 0.75, 0.0])
+
+
+class FakeChat:
+    def __init__(self, answer):
+        self.answer = answer
+        self.prompts = []
+
+    def send_message(self, prompt, system=None, max_tokens=None):
+        self.prompts.append(prompt)
+        return {"answer": self.answer}
+
+
+def test_llm_scorer_parses_one_batched_rating_list():
+    chat = FakeChat("Ratings: [10, 3, 14]")
+    scorer = LLMScorer(lambda: chat)
+
+    scores = scorer.score("q", [{"content": "a"}, {"content": "b"}, {"content": "c"}])
+
+    assert scores == pytest.approx([1.0, 0.3, 1.0])
+    assert len(chat.prompts) == 1
+    assert 'passage index="2"' in chat.prompts[0]
+
+
+@pytest.mark.parametrize("answer", ["no scores here", "[1, 2]"])
+def test_llm_scorer_rejects_unusable_answers(answer):
+    scorer = LLMScorer(lambda: FakeChat(answer))
+
+    with pytest.raises(ValueError):
+        scorer.score("q", [{"content": "a"}, {"content": "b"}, {"content": "c"}])
@@ -0,0 +1,122 @@
+import os
+import signal
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
+
+import numpy as np
+import pytest
+
+from sharded_index import ShardedIndex, build_shards, shard_of
+from vector_index import VectorIndex
+
+
+class SlowIndex(VectorIndex):
+    """VectorIndex whose searches take `delay` seconds, to hit the client timeout."""
+
+    def search(self, query, k=1, filter=None, delay=0.0):
+        time.sleep(delay)
+        return super().search(query, k, filter=filter)
+
+
+def make_data(n=400, dim=8, seed=0):
+    rng = np.random.default_rng(seed)
+    vectors = rng.normal(size=(n, dim)).astype(np.float32)
+    documents = [{"id": i, "content": f"doc {i}", "group": i % 3} for i in range(n)]
+    return documents, vectors
+
+
+def build(path, documents, vectors, n_shards=3, index_factory=VectorIndex):
+    build_shards(str(path), documents, n_shards, index_factory, vectors=vectors)
+    single = VectorIndex()
+    for document, vector in zip(documents, vectors):
+        single.add_vector(vector, document)
+    return single
+
+
+def test_shard_of_is_stable_and_in_range():
+    assert [shard_of(i, 4) for i in range(8)] == [shard_of(i, 4) for i in range(8)]
+    assert {shard_of(i, 4) for i in range(100)} == {0, 1, 2, 3}
+
+
+def test_scatter_gather_matches_a_single_index(tmp_path):
+    documents, vectors = make_data()
+    single = build(tmp_path, documents, vectors)
+    queries = vectors[:20] + 0.1
+
+    with ShardedIndex(str(tmp_path)) as index:
+        assert len(index) == len(documents)
+        assert sum(index.shard_sizes) == len(documents)
+        for query in queries[:5]:
+            assert [d["id"] for d, _ in index.search(query, k=7)] == [
+                d["id"] for d, _ in single.search(query, k=7)
+            ]
+        batched = index.search_many(queries, k=5)
+        with ThreadPoolExecutor(max_workers=8) as clients:
+            threaded = list(clients.map(lambda q: index.search(q, k=5), queries))
+
+    expected = [[d["id"] for d, _ in single.search(q, k=5)] for q in queries]
+    assert [[d["id"] for d, _ in results] for results in batched] == expected
+    assert [[d["id"] for d, _ in results] for results in threaded] == expected
+
+
+def test_keyword_arguments_reach_every_shard(tmp_path):
+    documents, vectors = make_data()
+    single = build(tmp_path, documents, vectors)
+
+    with ShardedIndex(str(tmp_path)) as index:
+        results = index.search(vectors[0], k=10, filter={"group": 1})
+
+    assert [d["id"] for d, _ in results] == [
+        d["id"] for d, _ in single.search(vectors[0], k=10, filter={"group": 1})
+    ]
+
+
+def test_shard_errors_fail_the_request(tmp_path):
+    documents, vectors = make_data(n=30)
+    build(tmp_path, documents, vectors)
+
+    with ShardedIndex(str(tmp_path)) as index:
+        with pytest.raises(RuntimeError, match="dimension mismatch"):
+            index.search([1.0, 2.0], k=1)
+        # The index keeps serving after a failed request
+        assert len(index.search(vectors[0], k=1)) == 1
+
+
+def test_timed_out_requests_are_forgotten(tmp_path):
+    documents, vectors = make_data(n=30)
+    build(tmp_path, documents, vectors, index_factory=SlowIndex)
+
+    with ShardedIndex(str(tmp_path), timeout=0.2) as index:
+        with pytest.raises(TimeoutError):
+            index.search(vectors[0], k=1, delay=1.0)
+        assert list(index._pending) == []
+        # The shards finish the abandoned search first; its late replies are dropped
+        time.sleep(1.0)
+        assert len(index.search(vectors[0], k=1)) == 1
+        assert list(index._pending) == []
+
+
+def test_a_dead_worker_fails_pending_and_later_requests(tmp_path):
+    documents, vectors = make_data(n=30)
+    build(tmp_path, documents, vectors, index_factory=SlowIndex)
+
+    with ShardedIndex(str(tmp_path), timeout=30.0) as index:
+        future = index.submit(vectors[0], k=1, delay=5.0)
+        os.kill(index._workers[0].pid, signal.SIGKILL)
+
+        start = time.monotonic()
+        with pytest.raises(RuntimeError, match="died"):
+            future.result(timeout=10)
+        assert time.monotonic() - start < 5.0
+        with pytest.raises(RuntimeError, match="died"):
+            index.search(vectors[0], k=1)
+
+
+def test_missing_shard_fails_at_startup(tmp_path):
+    documents, vectors = make_data(n=30)
+    build(tmp_path, documents, vectors)
+    for name in os.listdir(tmp_path / "shard-001"):
+        os.remove(tmp_path / "shard-001" / name)
+
+    with pytest.raises(RuntimeError, match="shard 1"):
+        ShardedIndex(str(tmp_path))
@@ -0,0 +1,80 @@
+import math
+
+import numpy as np
+import pytest
+
+from vector_index import VectorIndex
+
+
+def reference_distance(a, b, metric):
+    """Per-pair distance the way the original pure-Python VectorIndex computed it."""
+    if metric == "euclidean":
+        return math.sqrt(sum((x - y) ** 2 for x, y in zip(a, b)))
+    norm_a = math.sqrt(sum(x * x for x in a))
+    norm_b = math.sqrt(sum(y * y for y in b))
+    if norm_a == 0 and norm_b == 0:
+        return 0.0
+    if norm_a == 0 or norm_b == 0:
+        return 1.0
+    dot = sum(x * y for x, y in zip(a, b))
+    return 1.0 - max(-1.0, min(1.0, dot / (norm_a * norm_b)))
+
+
+def make_index(metric, n=300, dim=16, seed=0):
+    rng = np.random.default_rng(seed)
+    vectors = rng.normal(size=(n, dim)).astype(np.float32)
+    index = VectorIndex(distance_metric=metric)
+    for i, vector in enumerate(vectors):
+        index.add_vector(vector.tolist(), {"id": i, "content": f"doc {i}"})
+    return index, vectors, rng
+
+
+@pytest.mark.parametrize("metric", ["cosine", "euclidean"])
+def test_search_matches_reference(metric):
+    index, vectors, rng = make_index(metric)
+    for query in rng.normal(size=(20, vectors.shape[1])).astype(np.float32):
+        expected = sorted(reference_distance(query, v, metric) for v in vectors)[:5]
+        results = index.search(query.tolist(), k=5)
+
+        assert [distance for _, distance in results] == pytest.approx(expected, abs=1e-5)
+        for doc, distance in results:
+            assert reference_distance(query, vectors[doc["id"]], metric) == pytest.approx(distance, abs=1e-5)
+
+
+@pytest.mark.parametrize("metric", ["cosine", "euclidean"])
+def test_search_many_matches_search(metric):
+    index, vectors, rng = make_index(metric)
+    queries = rng.normal(size=(37, vectors.shape[1])).astype(np.float32)
+
+    # A small batch_size makes the blocks uneven
+    batched = index.search_many(queries, k=4, batch_size=8)
+
+    assert len(batched) == len(queries)
+    for query, results in zip(queries, batched):
+        single = index.search(query, k=4)
+        assert [doc["id"] for doc, _ in results] == [doc["id"] for doc, _ in single]
+        assert [d for _, d in results] == pytest.approx([d for _, d in single], abs=1e-6)
+
+
+def test_zero_vectors_keep_the_original_conventions():
+    index = VectorIndex()
+    index.add_vector([0.0, 0.0], {"content": "zero"})
+    index.add_vector([1.0, 0.0], {"content": "x"})
+
+    assert index.search([0.0, 0.0], k=2) == [({"content": "zero"}, 0.0), ({"content": "x"}, 1.0)]
+    assert [d for _, d in index.search([2.0, 0.0], k=2)] == pytest.approx([0.0, 1.0])
+
+
+def test_k_larger_than_the_index_returns_everything():
+    index, _, _ = make_index("cosine", n=3)
+
+    assert len(index.search([1.0] * 16, k=10)) == 3
+
+
+def test_dimension_mismatch_raises():
+    index, _, _ = make_index("cosine", n=3)
+
+    with pytest.raises(ValueError):
+        index.add_vector([1.0, 2.0], {"content": "short"})
+    with pytest.raises(ValueError):
+        index.search([1.0, 2.0])
@@ -0,0 +1,276 @@
+# VectorIndex implementation
+import os
+import numpy as np
+from typing import Optional, Any, List, Dict, Tuple
+
+from index_storage import LazyDocuments, read_json, write_array, write_documents, write_json
+from metadata_filter import MetadataIndex
+
+
+class VectorIndex:
+    def __init__(
+        self,
+        distance_metric: str = "cosine",
+        embedding_fn=None,
+        filter_fields: Optional[List[str]] = None,
+    ):
+        self.documents: List[Dict[str, Any]] = []
+        self._vector_dim: Optional[int] = None
+        # Rows beyond _count are spare capacity so appends stay amortized O(d)
+        self._vectors = np.empty((0, 0), dtype=np.float32)
+        self._norms = np.empty(0, dtype=np.float32)
+        self._count = 0
+        if distance_metric not in ["cosine", "euclidean"]:
+            raise ValueError("distance_metric must be 'cosine' or 'euclidean'")
+        self._distance_metric = distance_metric
+        self._embedding_fn = embedding_fn
+        self._metadata = MetadataIndex(filter_fields)
+
+    @property
+    def vectors(self) -> np.ndarray:
+        """Stored vectors as an (n, dim) float32 matrix view."""
+        return self._vectors[: self._count]
+
+    def add_document(self, document: Dict[str, Any]):
+        if not self._embedding_fn:
+            raise ValueError(
+                "Embedding function not provided during initialization."
+            )
+        if not isinstance(document, dict):
+            raise TypeError("Document must be a dictionary.")
+        if "content" not in document:
+            raise ValueError(
+                "Document dictionary must contain a 'content' key."
+            )
+
+        content = document["content"]
+        if not isinstance(content, str):
+            raise TypeError("Document 'content' must be a string.")
+
+        vector = self._embedding_fn(content)
+        self.add_vector(vector=vector, document=document)
+
+    def search(
+        self, query: Any, k: int = 1, filter: Optional[Dict[str, Any]] = None
+    ) -> List[Tuple[Dict[str, Any], float]]:
+        """k nearest documents; `filter` restricts them by metadata (see MetadataIndex)."""
+        if len(self) == 0:
+            return []
+
+        query_vector = self._prepare_query(query)
+
+        if k <= 0:
+            raise ValueError("k must be a positive integer.")
+
+        rows = self._filter_rows(filter)
+        if rows is not None and len(rows) == 0:
+            return []
+
+        distances = self._distances(query_vector, rows)
+        top = self._top_k(distances, k)
+        ids = top if rows is None else rows[top]
+        return [(self.documents[j], float(distances[i])) for i, j in zip(top, ids)]
+
+    def _filter_rows(self, filter: Optional[Dict[str, Any]]) -> Optional[np.ndarray]:
+        """Rows allowed by `filter`, resolved from the metadata index before any scoring."""
+        if filter is None:
+            return None
+        return self._metadata.match(filter)
+
+    def search_many(
+        self,
+        queries: Any,
+        k: int = 1,
+        batch_size: int = 256,
+        filter: Optional[Dict[str, Any]] = None,
+    ) -> List[List[Tuple[Dict[str, Any], float]]]:
+        """Answer a batch of queries with one matrix product per block of queries.
+
+        queries may be a list of strings, a list of vectors or an
+        (m, dim) array. batch_size bounds the (batch_size, n) distance
+        matrix held in memory at once. `filter` applies to every query.
+        """
+        if k <= 0:
+            raise ValueError("k must be a positive integer.")
+        rows = self._filter_rows(filter)
+        if len(self) == 0 or len(queries) == 0 or (rows is not None and len(rows) == 0):
+            return [[] for _ in queries]
+
+        query_matrix = np.stack([self._prepare_query(q) for q in queries])
+        results = []
+        for start in range(0, len(query_matrix), batch_size):
+            block = query_matrix[start : start + batch_size]
+            distances = self._distances_many(block, rows)
+            for row in distances:
+                top = self._top_k(row, k)
+                ids = top if rows is None else rows[top]
+                results.append([(self.documents[j], float(row[i])) for i, j in zip(top, ids)])
+        return results
+
+    def add_vector(self, vector, document: Dict[str, Any]):
+        if isinstance(vector, np.ndarray):
+            if vector.ndim != 1 or not np.issubdtype(vector.dtype, np.number):
+                raise TypeError("Vector must be a list of numbers.")
+        elif not isinstance(vector, list) or not all(
+            isinstance(x, (int, float)) for x in vector
+        ):
+            raise TypeError("Vector must be a list of numbers.")
+        if not isinstance(document, dict):
+            raise TypeError("Document must be a dictionary.")
+        if "content" not in document:
+            raise ValueError(
+                "Document dictionary must contain a 'content' key."
+            )
+
+        if len(self) == 0:
+            self._vector_dim = len(vector)
+        elif len(vector) != self._vector_dim:
+            raise ValueError(
+                f"Inconsistent vector dimension. Expected {self._vector_dim}, got {len(vector)}"
+            )
+
+        self._append_vector(np.asarray(vector, dtype=np.float32))
+        self.documents.append(document)
+        self._metadata.add(len(self.documents) - 1, document)
+
+    def _append_vector(self, vector: np.ndarray):
+        if self._count == len(self._vectors):
+            capacity = max(16, 2 * len(self._vectors))
+            vectors = np.empty((capacity, self._vector_dim), dtype=np.float32)
+            norms = np.empty(capacity, dtype=np.float32)
+            if self._count:
+                vectors[: self._count] = self._vectors[: self._count]
+                norms[: self._count] = self._norms[: self._count]
+            self._vectors, self._norms = vectors, norms
+
+        self._vectors[self._count] = vector
+        self._norms[self._count] = np.linalg.norm(vector)
+        self._count += 1
+
+    def _prepare_query(self, query: Any) -> np.ndarray:
+        if isinstance(query, str):
+            if not self._embedding_fn:
+                raise ValueError(
+                    "Embedding function not provided for string query."
+                )
+            query = self._embedding_fn(query)
+        elif isinstance(query, np.ndarray):
+            if query.ndim != 1:
+                raise TypeError(
+                    "Query must be either a string or a list of numbers."
+                )
+        elif not (
+            isinstance(query, list)
+            and all(isinstance(x, (int, float)) for x in query)
+        ):
+            raise TypeError(
+                "Query must be either a string or a list of numbers."
+            )
+
+        if len(query) != self._vector_dim:
+            raise ValueError(
+                f"Query vector dimension mismatch. Expected {self._vector_dim}, got {len(query)}"
+            )
+        return np.asarray(query, dtype=np.float32)
+
+    def _distances(
+        self, query_vector: np.ndarray, rows: Optional[np.ndarray] = None
+    ) -> np.ndarray:
+        """Distances from one query to every stored vector (or just `rows`)."""
+        return self._distances_many(query_vector[np.newaxis, :], rows)[0]
+
+    def _distances_many(
+        self, query_matrix: np.ndarray, rows: Optional[np.ndarray] = None
+    ) -> np.ndarray:
+        """(m, n) distance matrix between queries and stored vectors."""
+        vectors = self.vectors if rows is None else self.vectors[rows]
+        norms = self._norms[: self._count] if rows is None else self._norms[rows]
+        return self._dots_to_distances(query_matrix, query_matrix @ vectors.T, norms)
+
+    def _dots_to_distances(
+        self, query_matrix: np.ndarray, dots: np.ndarray, norms: np.ndarray
+    ) -> np.ndarray:
+        """Turn (m, n) dot products into the index's distance using the vector norms."""
+        query_norms = np.linalg.norm(query_matrix, axis=1)
+
+        if self._distance_metric == "euclidean":
+            squared = (
+                query_norms[:, np.newaxis] ** 2
+                - 2 * dots
+                + norms[np.newaxis, :] ** 2
+            )
+            return np.sqrt(np.maximum(squared, 0.0))
+
+        denominator = query_norms[:, np.newaxis] * norms[np.newaxis, :]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            similarity = np.clip(dots / denominator, -1.0, 1.0)
+        distances = 1.0 - similarity
+        # Match the zero-vector conventions of the original implementation
+        query_zero = (query_norms == 0)[:, np.newaxis]
+        stored_zero = (norms == 0)[np.newaxis, :]
+        distances = np.where(query_zero | stored_zero, 1.0, distances)
+        distances = np.where(query_zero & stored_zero, 0.0, distances)
+        return distances.astype(np.float32, copy=False)
+
+    def _top_k(self, distances: np.ndarray, k: int) -> np.ndarray:
+        """Indices of the k smallest distances, in ascending order."""
+        if k < len(distances):
+            candidates = np.argpartition(distances, k - 1)[:k]
+        else:
+            candidates = np.arange(len(distances))
+        return candidates[np.argsort(distances[candidates], kind="stable")]
+
+    def save(self, path: str):
+        """Write the index to a directory.
+
+        Vectors and norms are raw float32 files that `load` memory-maps;
+        documents go to a JSON lines sidecar with an offset table.
+        """
+        os.makedirs(path, exist_ok=True)
+        write_json(
+            os.path.join(path, "meta.json"),
+            {
+                "count": self._count,
+                "dim": self._vector_dim,
+                "distance_metric": self._distance_metric,
+            },
+        )
+        write_array(os.path.join(path, "vectors.f32"), self.vectors)
+        write_array(os.path.join(path, "norms.f32"), self._norms[: self._count])
+        write_documents(path, self.documents)
+        self._metadata.save(path)
+
+    @classmethod
+    def load(cls, path: str, embedding_fn=None, **kwargs) -> "VectorIndex":
+        """Open a saved index without reading it into memory.
+
+        Vectors are memory-mapped read-only and documents are parsed on
+        access. Adding vectors afterwards copies the matrix into memory.
+        """
+        meta = read_json(os.path.join(path, "meta.json"))
+        index = cls(distance_metric=meta["distance_metric"], embedding_fn=embedding_fn, **kwargs)
+        index._restore(path, meta)
+        return index
+
+    def _restore(self, path: str, meta: Dict[str, Any]):
+        self._count = meta["count"]
+        self._vector_dim = meta["dim"]
+        if self._count:
+            self._vectors = np.memmap(
+                os.path.join(path, "vectors.f32"),
+                dtype=np.float32,
+                mode="r",
+                shape=(self._count, self._vector_dim),
+            )
+            self._norms = np.memmap(
+                os.path.join(path, "norms.f32"), dtype=np.float32, mode="r", shape=(self._count,)
+            )
+        self.documents = LazyDocuments(path)
+        self._metadata = MetadataIndex.load(path)
+
+    def __len__(self) -> int:
+        return self._count
+
+    def __repr__(self) -> str:
+        has_embed_fn = "Yes" if self._embedding_fn else "No"
+        return f"VectorIndex(count={len(self)}, dim={self._vector_dim}, metric='{self._distance_metric}', has_embedding_fn='{has_embed_fn}')"
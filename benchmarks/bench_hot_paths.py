@@ -0,0 +1,254 @@
+# Benchmarks for the retrieval, chunking and grading hot paths
+"""Time the hot paths on synthetic data, fully offline.
+
+    python benchmarks/bench_hot_paths.py --scale 1k --output results.json
+    python benchmarks/bench_hot_paths.py --scale 1k --compare results.json --threshold 0.2
+
+Every operation is timed call by call (p50/p95/p99 latency and
+throughput), then run once more under tracemalloc for its peak Python
+memory. Embeddings come from a hash-seeded fake embedder and model calls
+from FakeAnthropic, so no API keys or network are needed. With
+--compare the run exits with status 1 if any latency percentile or peak
+memory grew by more than --threshold relative to the baseline file.
+"""
+import argparse
+import contextlib
+import importlib
+import io
+import json
+import os
+import platform
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [
+    os.path.join(ROOT, "02-prompt-engineering"),
+    os.path.join(ROOT, "04-rag-claude"),
+    os.path.dirname(os.path.abspath(__file__)),
+]
+
+import synthetic  # noqa: E402
+from metrics import Histogram  # noqa: E402
+
+SCALES = {"1k": 1_000, "100k": 100_000, "1m": 1_000_000}
+COMPARED_FIELDS = ("p50_ms", "p95_ms", "p99_ms", "peak_memory_bytes")
+
+
+def measure(call, calls, items_per_call=1, warmup=2):
+    """Time `calls` invocations of call(i), then measure one more under tracemalloc."""
+    for i in range(min(warmup, calls)):
+        call(i)
+
+    latencies = Histogram()
+    start = time.perf_counter()
+    for i in range(calls):
+        call_start = time.perf_counter()
+        call(i)
+        latencies.observe((time.perf_counter() - call_start) * 1000)
+    elapsed = time.perf_counter() - start
+
+    tracemalloc.start()
+    try:
+        call(0)
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+    return {
+        "calls": calls,
+        "mean_ms": latencies.total / calls,
+        "p50_ms": latencies.percentile(50),
+        "p95_ms": latencies.percentile(95),
+        "p99_ms": latencies.percentile(99),
+        "max_ms": latencies.percentile(100),
+        "throughput_per_s": calls * items_per_call / elapsed,
+        "peak_memory_bytes": peak,
+    }
+
+
+def bench_vector_search(n, args):
+    from vector_index import VectorIndex
+
+    embedder = synthetic.FakeEmbedder(args.dim)
+    vectors = synthetic.make_embeddings(n, args.dim, seed=args.seed)
+    index = VectorIndex(embedding_fn=embedder)
+    for i, vector in enumerate(vectors):
+        index.add_vector(vector, {"content": f"chunk {i}"})
+    queries = synthetic.make_queries(args.queries, seed=args.seed)
+    return lambda i: index.search(queries[i % len(queries)], args.k), args.queries, 1
+
+
+def bench_bm25_search(n, args):
+    from bm25_index import BM25Index
+
+    index = BM25Index()
+    for document in synthetic.make_corpus(n, seed=args.seed, sentences_per_document=3):
+        index.add_document(document)
+    queries = synthetic.make_queries(args.queries, seed=args.seed)
+    return lambda i: index.search(queries[i % len(queries)], args.k), args.queries, 1
+
+
+def bench_chunk_by_sentence(n, args):
+    from chunking import chunk_by_sentence
+
+    text = synthetic.make_text(n, seed=args.seed)
+    # Throughput is in sentences per second
+    return lambda i: chunk_by_sentence(text), 5, n
+
+
+def _code_based():
+    return importlib.import_module("code-based")
+
+
+def bench_code_grader(n, args):
+    code_based = _code_based()
+    pairs = synthetic.make_outputs(n, seed=args.seed)
+    return lambda i: code_based.code_grader(*pairs[i % len(pairs)]), min(n, 20000), 1
+
+
+def bench_generate_html_report(n, args):
+    from eval_report import generate_html_report
+
+    results = synthetic.make_results(max(1, n // 10), seed=args.seed)
+    # Throughput is in report rows per second
+    return lambda i: generate_html_report(results), 3, len(results)
+
+
+def bench_grade_case(n, args):
+    """End-to-end run_test_case (prompt, answer, model grade, code grade) on FakeAnthropic."""
+    code_based = _code_based()
+    code_based.client = synthetic.FakeAnthropic(latency=args.fake_latency)
+    cases = [test_case for _, test_case in synthetic.make_outputs(min(n, 1000), seed=args.seed)]
+    return lambda i: code_based.run_test_case(dict(cases[i % len(cases)]), stream=False), args.queries, 1
+
+
+def bench_eval_batch(n, args):
+    """run_eval_batch (both batches, joined and graded) against FakeAnthropic's batches endpoints."""
+    code_based = _code_based()
+    client = synthetic.FakeAnthropic(latency=args.fake_latency)
+    cases = [test_case for _, test_case in synthetic.make_outputs(min(n, 1000), seed=args.seed)]
+
+    def call(i):
+        # Batch progress and the score summary are printed; keep that out of the timings and the output
+        with contextlib.redirect_stdout(io.StringIO()):
+            code_based.run_eval_batch([dict(c) for c in cases], client=client, poll_interval=0)
+
+    # Throughput is in test cases per second
+    return call, 3, len(cases)
+
+
+OPERATIONS = {
+    "vector_search": bench_vector_search,
+    "bm25_search": bench_bm25_search,
+    "chunk_by_sentence": bench_chunk_by_sentence,
+    "code_grader": bench_code_grader,
+    "generate_html_report": bench_generate_html_report,
+    "grade_case": bench_grade_case,
+    "eval_batch": bench_eval_batch,
+}
+
+
+def run(args):
+    n = SCALES[args.scale]
+    results = {}
+    for name in args.ops:
+        print(f"{name} (n={n}) ...", flush=True)
+        setup_start = time.perf_counter()
+        try:
+            call, calls, items_per_call = OPERATIONS[name](n, args)
+            setup_s = time.perf_counter() - setup_start
+            results[name] = {"n": n, "setup_s": setup_s, **measure(call, calls, items_per_call)}
+        except Exception as e:
+            # Record the failure and keep going so the other operations' results are kept
+            results[name] = {"n": n, "error": f"{type(e).__name__}: {e}"}
+            print(f"  failed: {results[name]['error']}")
+            continue
+        r = results[name]
+        print(
+            f"  p50 {r['p50_ms']:.3f} ms  p95 {r['p95_ms']:.3f} ms  p99 {r['p99_ms']:.3f} ms  "
+            f"{r['throughput_per_s']:.1f}/s  peak {r['peak_memory_bytes'] / 2 ** 20:.1f} MB  "
+            f"(setup {setup_s:.1f}s)"
+        )
+    return {
+        "meta": {
+            "scale": args.scale,
+            "dim": args.dim,
+            "k": args.k,
+            "seed": args.seed,
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "platform": platform.platform(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        },
+        "operations": results,
+    }
+
+
+def compare(current, baseline, threshold):
+    """Print the change of each compared field; returns the list of regressions."""
+    regressions = []
+    for name, result in current["operations"].items():
+        if "error" in result:
+            print(f"{name}: failed ({result['error']})")
+            continue
+        before = baseline.get("operations", {}).get(name)
+        if before is None or before.get("n") != result["n"]:
+            print(f"{name}: no baseline at n={result['n']}")
+            continue
+        for field in COMPARED_FIELDS:
+            old, new = before.get(field), result.get(field)
+            if not old or new is None:
+                continue
+            change = new / old - 1
+            flag = "REGRESSION" if change > threshold else ""
+            print(f"{name:<22} {field:<18} {old:>14.3f} -> {new:>14.3f}  {change:+7.1%} {flag}")
+            if flag:
+                regressions.append((name, field, change))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark retrieval, chunking and grading hot paths offline")
+    parser.add_argument("--scale", choices=list(SCALES), default="1k", help="Corpus size")
+    parser.add_argument("--ops", default=",".join(OPERATIONS), help="Comma-separated operations to run")
+    parser.add_argument("--dim", type=int, default=256, help="Embedding dimension")
+    parser.add_argument("--k", type=int, default=10, help="Results per search")
+    parser.add_argument("--queries", type=int, default=200, help="Timed calls for the search and grading operations")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--fake-latency", type=float, default=0.0, help="Seconds FakeAnthropic waits per request")
+    parser.add_argument("--output", help="Write the results as JSON to this file")
+    parser.add_argument("--compare", help="Baseline JSON file from an earlier run")
+    parser.add_argument("--threshold", type=float, default=0.2, help="Allowed relative slowdown before --compare fails")
+    args = parser.parse_args(argv)
+    args.ops = [name.strip() for name in args.ops.split(",") if name.strip()]
+    unknown = set(args.ops) - set(OPERATIONS)
+    if unknown:
+        parser.error(f"unknown operations: {', '.join(sorted(unknown))}")
+
+    current = run(args)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(current, f, indent=2)
+        print(f"Results saved to {args.output}")
+    failed = [name for name, result in current["operations"].items() if "error" in result]
+
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = compare(current, baseline, args.threshold)
+        if regressions:
+            print(f"{len(regressions)} regression(s) beyond {args.threshold:.0%}")
+            return 1
+        print("No regressions")
+    if failed:
+        print(f"{len(failed)} operation(s) failed: {', '.join(failed)}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,228 @@
+# Deterministic synthetic data and offline fakes for the benchmarks
+import json
+import random
+import time
+import zlib
+from types import SimpleNamespace
+
+import numpy as np
+
+CONTENT_TYPES = ("json", "python", "regex")
+
+
+def make_vocabulary(size=20000):
+    return [f"term{i}" for i in range(size)]
+
+
+def make_sentence(rng, vocabulary, weights, min_words=8, max_words=20):
+    words = rng.choices(vocabulary, weights, k=rng.randint(min_words, max_words))
+    return " ".join(words).capitalize() + "."
+
+
+def make_corpus(n, seed=0, sentences_per_document=5, vocabulary_size=20000):
+    """n documents of Zipf-distributed words, with source/section metadata."""
+    rng = random.Random(seed)
+    vocabulary = make_vocabulary(vocabulary_size)
+    weights = [1 / (rank + 1) for rank in range(len(vocabulary))]
+    return [
+        {
+            "id": i,
+            "content": " ".join(
+                make_sentence(rng, vocabulary, weights) for _ in range(sentences_per_document)
+            ),
+            "source": f"doc{i % 100}.md",
+            "section": i % 10,
+        }
+        for i in range(n)
+    ]
+
+
+def make_queries(n, seed=1, words=4, vocabulary_size=20000):
+    """Short keyword queries drawn from the more frequent part of the vocabulary."""
+    rng = random.Random(seed)
+    vocabulary = make_vocabulary(vocabulary_size)[: vocabulary_size // 10]
+    return [" ".join(rng.choices(vocabulary, k=words)) for _ in range(n)]
+
+
+def make_text(n_sentences, seed=2, vocabulary_size=20000):
+    """One long document of n_sentences sentences."""
+    rng = random.Random(seed)
+    vocabulary = make_vocabulary(vocabulary_size)
+    weights = [1 / (rank + 1) for rank in range(len(vocabulary))]
+    return " ".join(make_sentence(rng, vocabulary, weights) for _ in range(n_sentences))
+
+
+class FakeEmbedder:
+    """Deterministic stand-in for an embedding model: same text, same unit vector."""
+
+    def __init__(self, dim=256):
+        self.dim = dim
+
+    def __call__(self, text):
+        rng = np.random.default_rng(zlib.crc32(text.encode("utf-8")))
+        vector = rng.standard_normal(self.dim).astype(np.float32)
+        return vector / np.linalg.norm(vector)
+
+    def embed_many(self, texts):
+        return np.stack([self(text) for text in texts])
+
+
+def make_embeddings(n, dim=256, seed=0, n_clusters=100):
+    """(n, dim) float32 vectors around n_clusters centres, like embeddings of related chunks."""
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((n_clusters, dim)).astype(np.float32)
+    out = np.empty((n, dim), dtype=np.float32)
+    # Generated in blocks so 1M x dim does not need float64 temporaries
+    for start in range(0, n, 65536):
+        stop = min(start + 65536, n)
+        block = centers[rng.integers(n_clusters, size=stop - start)]
+        block += 0.3 * rng.standard_normal((stop - start, dim), dtype=np.float32)
+        out[start:stop] = block
+    return out
+
+
+def make_outputs(n, seed=3):
+    """(output text, test case) pairs for code_grader, mixing valid and invalid answers."""
+    rng = random.Random(seed)
+    samples = {
+        "json": ['```json\n{"Version": "2012-10-17", "Statement": [{"Effect": "Allow"}]}\n```', '{"bucket": "logs", "ttl": }'],
+        "python": ["```python\ndef bucket_name(arn):\n    return arn.split(':::')[1]\n```", "```python\ndef broken(:\n```"],
+        "regex": ["The pattern is /^i-([0-9a-f]{8}|[0-9a-f]{17})$/", "Use /^(i-[0-9a-f/"],
+    }
+    pairs = []
+    for i in range(n):
+        content_type = CONTENT_TYPES[i % len(CONTENT_TYPES)]
+        output = samples[content_type][rng.random() < 0.2]
+        pairs.append((output, {"task": f"Task {i}", "type": content_type}))
+    return pairs
+
+
+def make_results(n, seed=4, output_chars=400):
+    """Evaluation result records shaped like code-based.py's build_result output."""
+    rng = random.Random(seed)
+    results = []
+    for i, (output, test_case) in enumerate(make_outputs(n, seed)):
+        model_score = rng.randint(1, 10)
+        code_score = rng.choice([0, 10])
+        final_score = round(model_score * 0.6 + code_score * 0.4, 2)
+        results.append(
+            {
+                "output": {"answer": (output + "\n") * max(1, output_chars // len(output))},
+                "test_case": test_case,
+                "model_evaluation": {
+                    "score": model_score,
+                    "reasoning": f"Reasoning for case {i} <with markup & entities>",
+                    "strengths": ["Correct structure"],
+                    "weaknesses": ["Missing edge cases"],
+                },
+                "code_evaluation": {"score": code_score, "feedback": "Valid" if code_score else "Invalid"},
+                "merged_score": {"final_score": final_score, "model_score": model_score, "code_score": code_score},
+                "final_score": final_score,
+            }
+        )
+    return results
+
+
+class _FakeStream:
+    def __init__(self, message, chunk_chars):
+        self._message = message
+        self._chunk_chars = chunk_chars
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    @property
+    def text_stream(self):
+        text = self._message.content[0].text
+        for start in range(0, len(text), self._chunk_chars):
+            yield text[start : start + self._chunk_chars]
+
+    def get_final_message(self):
+        return self._message
+
+
+class _FakeBatches:
+    """messages.batches stand-in: requests are answered on create and the batch has ended by its first retrieve."""
+
+    def __init__(self, client):
+        self._client = client
+        self._results = {}
+
+    def create(self, requests):
+        batch_id = f"msgbatch_{len(self._results) + 1:06d}"
+        self._results[batch_id] = [
+            SimpleNamespace(
+                custom_id=request["custom_id"],
+                result=SimpleNamespace(type="succeeded", message=self._client.respond(request["params"])),
+            )
+            for request in requests
+        ]
+        return self._batch(batch_id, "in_progress")
+
+    def retrieve(self, batch_id):
+        return self._batch(batch_id, "ended")
+
+    def results(self, batch_id):
+        return iter(self._results[batch_id])
+
+    def _batch(self, batch_id, status):
+        done = len(self._results[batch_id]) if status == "ended" else 0
+        counts = SimpleNamespace(processing=len(self._results[batch_id]) - done, succeeded=done, errored=0)
+        return SimpleNamespace(id=batch_id, processing_status=status, request_counts=counts)
+
+
+class _FakeMessages:
+    def __init__(self, client):
+        self._client = client
+        self.batches = _FakeBatches(client)
+
+    def create(self, **request):
+        return self._client.respond(request)
+
+    def stream(self, **request):
+        return _FakeStream(self._client.respond(request), self._client.chunk_chars)
+
+
+class FakeAnthropic:
+    """Offline stand-in for anthropic.Anthropic covering messages.create, messages.stream
+    and messages.batches (create/retrieve/results).
+
+    Solutions come back as a valid answer for the requested type and
+    grading requests (those prefilled with "```json") as a JSON grade,
+    after `latency` seconds.
+    """
+
+    def __init__(self, latency=0.0, chunk_chars=16):
+        self.latency = latency
+        self.chunk_chars = chunk_chars
+        self.messages = _FakeMessages(self)
+        self.requests = 0
+
+    def respond(self, request):
+        self.requests += 1
+        if self.latency:
+            time.sleep(self.latency)
+        messages = request["messages"]
+        prompt = json.dumps(messages[0]["content"])
+        if messages[-1]["role"] == "assistant":
+            text = json.dumps(
+                {"strengths": ["Clear"], "weaknesses": ["Terse"], "reasoning": "Meets the task.", "score": 8}
+            ) + "\n```"
+        elif "JSON output" in prompt:
+            text = '```json\n{"Effect": "Allow", "Action": ["s3:GetObject"]}\n```'
+        elif "Python code" in prompt:
+            text = "```python\ndef bucket_name(arn):\n    return arn.split(':::')[1]\n```"
+        else:
+            text = "/^i-([0-9a-f]{8}|[0-9a-f]{17})$/"
+        usage = SimpleNamespace(
+            input_tokens=len(prompt) // 4,
+            output_tokens=len(text) // 4,
+            cache_creation_input_tokens=0,
+            cache_read_input_tokens=0,
+        )
+        return SimpleNamespace(
+            content=[SimpleNamespace(type="text", text=text)], usage=usage, stop_reason="end_turn"
+        )
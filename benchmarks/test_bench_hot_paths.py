@@ -0,0 +1,57 @@
+import json
+
+import numpy as np
+
+import bench_hot_paths
+import synthetic
+
+
+def test_synthetic_data_is_deterministic():
+    assert synthetic.make_corpus(5, seed=3) == synthetic.make_corpus(5, seed=3)
+    assert synthetic.make_queries(4, seed=3) == synthetic.make_queries(4, seed=3)
+    assert np.array_equal(synthetic.make_embeddings(50, 16, seed=3), synthetic.make_embeddings(50, 16, seed=3))
+    embedder = synthetic.FakeEmbedder(16)
+    assert np.array_equal(embedder("same text"), embedder("same text"))
+    assert abs(np.linalg.norm(embedder("same text")) - 1) < 1e-6
+
+
+def test_every_operation_runs_offline_and_saves_results(tmp_path):
+    output = tmp_path / "results.json"
+
+    status = bench_hot_paths.main(["--scale", "1k", "--queries", "5", "--dim", "16", "--output", str(output)])
+
+    assert status == 0
+    results = json.loads(output.read_text(encoding="utf-8"))
+    assert set(results["operations"]) == set(bench_hot_paths.OPERATIONS)
+    for result in results["operations"].values():
+        assert result["p50_ms"] <= result["p95_ms"] <= result["p99_ms"] <= result["max_ms"]
+        assert result["throughput_per_s"] > 0 and result["peak_memory_bytes"] > 0
+
+
+def test_compare_flags_only_regressions_beyond_the_threshold():
+    def run(p50_ms, peak):
+        return {"operations": {"op": {"n": 1000, "p50_ms": p50_ms, "p95_ms": 1.0, "p99_ms": 1.0, "peak_memory_bytes": peak}}}
+
+    regressions = bench_hot_paths.compare(run(1.5, 100), run(1.0, 100), threshold=0.2)
+
+    assert [(name, field) for name, field, _ in regressions] == [("op", "p50_ms")]
+    assert bench_hot_paths.compare(run(1.1, 110), run(1.0, 100), threshold=0.2) == []
+
+
+def test_a_different_scale_has_no_baseline():
+    current = {"operations": {"op": {"n": 1000, "p50_ms": 10.0}}}
+    baseline = {"operations": {"op": {"n": 100000, "p50_ms": 1.0}}}
+
+    assert bench_hot_paths.compare(current, baseline, threshold=0.2) == []
+
+
+def test_compare_exits_with_status_1_on_a_regression(tmp_path):
+    baseline = tmp_path / "baseline.json"
+    baseline.write_text(
+        json.dumps({"operations": {"code_grader": {"n": 1000, "p50_ms": 1e-9, "p95_ms": 1e-9, "p99_ms": 1e-9}}}),
+        encoding="utf-8",
+    )
+
+    status = bench_hot_paths.main(["--ops", "code_grader", "--queries", "5", "--compare", str(baseline)])
+
+    assert status == 1
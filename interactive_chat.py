@@ -1,13 +1,16 @@
 # interactive_chat.py
 from chat_client import AnthropicChat
+from history import HistoryManager, claude_summarizer
 
 def main():
     # Create chat instance
-    chat = AnthropicChat()
+    # Older turns get summarized so each request stays roughly the same size
+    chat = AnthropicChat(history=HistoryManager(max_tokens=4000, window_turns=6, summarizer=claude_summarizer()))
     
     print("🤖 Interactive Chat Started!")
     print("Type 'quit' to exit, 'clear' to clear conversation history")
     print("Type 'stream on' to enable streaming, 'stream off' to disable")
+    print("Type 'pin' to always keep the last exchange in full")
     print("-" * 60)
     
     # Optional system prompt
@@ -29,6 +32,13 @@ def main():
             print("🧹 Conversation cleared!")
             continue
         
+        if user_input.lower() == 'pin':
+            if chat.history.pin_last_turn(chat.messages):
+                print("📌 Last exchange pinned!")
+            else:
+                print("📌 Nothing to pin yet.")
+            continue
+        
         if user_input.lower() == 'stream on':
             streaming_enabled = True
             print("🌊 Streaming enabled!")
@@ -47,15 +57,18 @@ def main():
                 user_input, 
                 system=system_prompt,
                 max_tokens=500,
-                stream=streaming_enabled  # Use streaming based on user choice
+                stream=streaming_enabled,  # Use streaming based on user choice
+                echo=streaming_enabled,
             )
             
-            # Only print this if NOT streaming (streaming already prints)
+            # Only print the answer if NOT streaming (streaming already prints)
             if not streaming_enabled:
                 print(f"🤖 Assistant: {response['answer']}")
-                print(f"   (Tokens: {response['input_tokens']} in, {response['output_tokens']} out)")
-            else:
-                print("   (Streaming mode - token count not available)")
+            print(f"   (Tokens: {response['input_tokens']} in, {response['output_tokens']} out)")
+            if streaming_enabled and chat.last_metrics['ttft_s'] is not None:
+                rate = chat.last_metrics['tokens_per_s']
+                rate_text = f", {rate:.0f} tokens/s" if rate is not None else ""
+                print(f"   (First token {chat.last_metrics['ttft_s']:.2f}s{rate_text})")
             
         except Exception as e:
             print(f"❌ Error: {e}")